@@ -1,7 +1,46 @@
 from django.contrib import admin
-from .models import OTP, LoginAttempt, AuditLog, NotificationLog
+from .models import OTP, LoginAttempt, LoginRollup, LoginFailureStreak, AuditLog, NotificationLog, ExportJob
 
 admin.site.register(OTP)
-admin.site.register(LoginAttempt)
-admin.site.register(AuditLog)
-admin.site.register(NotificationLog)
+
+
+@admin.register(LoginAttempt)
+class LoginAttemptAdmin(admin.ModelAdmin):
+    list_display = ['email', 'user', 'ip_address', 'success', 'timestamp']
+    list_filter = ['success']
+    list_select_related = ['user']
+    search_fields = ['email', 'ip_address']
+
+
+@admin.register(LoginRollup)
+class LoginRollupAdmin(admin.ModelAdmin):
+    list_display = ['hour', 'email', 'ip_address', 'success', 'count', 'lockouts']
+    list_filter = ['success']
+    search_fields = ['email', 'ip_address']
+
+
+@admin.register(LoginFailureStreak)
+class LoginFailureStreakAdmin(admin.ModelAdmin):
+    list_display = ['user', 'current', 'longest', 'last_failure_at', 'last_success_at']
+    list_select_related = ['user']
+
+
+@admin.register(AuditLog)
+class AuditLogAdmin(admin.ModelAdmin):
+    list_display = ['action', 'user', 'ip_address', 'timestamp']
+    list_select_related = ['user']
+    search_fields = ['action', 'details']
+
+
+@admin.register(NotificationLog)
+class NotificationLogAdmin(admin.ModelAdmin):
+    list_display = ['notification_type', 'user', 'subject', 'status', 'sent_at']
+    list_filter = ['status', 'notification_type']
+    list_select_related = ['user']
+
+
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = ['kind', 'requested_by', 'status', 'rows_done', 'rows_total', 'created_at', 'finished_at']
+    list_filter = ['status', 'kind']
+    list_select_related = ['requested_by']
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class AdminPanelConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'admin_panel'
+
+    def ready(self):
+        from django.core.signals import request_finished
+        from .audit import flush_on_request_finished
+        from . import signals  # noqa: F401
+
+        request_finished.connect(flush_on_request_finished, dispatch_uid='admin_panel.flush_audit_log')
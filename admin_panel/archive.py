@@ -0,0 +1,464 @@
+"""
+Compressed monthly archives of old log rows.
+
+Rows moved out of the log tables by the retention engine (retention.py) are
+kept in LOG_ARCHIVE_ROOT/<table>/ as gzip-compressed JSON lines, one object
+per row:
+  <YYYY-MM>.jsonl.gz             the month
+  <YYYY-MM>.<first>-<last>.part  one archived chunk not yet merged in
+
+A chunk is written to its part file (atomically, through a rename) before
+its rows are deleted, and parts are merged by appending their bytes to the
+month - gzip files concatenate into one valid stream - then removed. A crash
+at any step leaves the rows in the table, in a part or in the month, never
+nowhere; rows found twice are read once.
+
+A chunk is written as blocks of up to BLOCK_ROWS rows sorted by (date, id),
+each its own gzip member, so a block can be decompressed on its own. Next to
+each file a small sidecar (<file>.idx) records the size of the file it
+describes, and for every block its byte range, its lowest and highest
+(date, id) and the distinct values of the INDEX_COLUMNS the pages filter on.
+A read seeks straight to the blocks that can hold rows past its cursor and
+matching its filters, and merges them in order, decompressing a block only
+once the merge reaches it - a page stops after the rows it asked for,
+without decoding the rest of the month. A missing or stale sidecar (another
+size) means "scan the file", which rewrites it.
+
+archive_tail() plugs the archives into paginate_keyset(), so the audit log
+and login history pages carry on into archived months once the table runs out.
+"""
+import gzip
+import heapq
+import itertools
+import json
+import os
+import zlib
+from datetime import date
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import prefetch_related_objects
+from django.utils import timezone
+
+# rows per independently compressed block
+BLOCK_ROWS = 1000
+
+# bytes read at a time while scanning a file without a sidecar
+READ_SIZE = 1 << 16
+
+# columns with their distinct values in the sidecar of each archive file
+INDEX_COLUMNS = ('user_id', 'action_code', 'ip_address')
+
+
+def _json_default(value):
+    # full precision isoformat - DjangoJSONEncoder drops microseconds, and
+    # archived timestamps end up in pagination cursors
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+def archive_dir(model):
+    return Path(settings.LOG_ARCHIVE_ROOT) / model._meta.db_table
+
+
+def month_of(moment):
+    """First day of the (local) month `moment` falls in"""
+    return timezone.localtime(moment).date().replace(day=1)
+
+
+def month_path(model, month):
+    return archive_dir(model) / f'{month:%Y-%m}.jsonl.gz'
+
+
+def _parse_month(name):
+    try:
+        year, month = name[:7].split('-')
+        return date(int(year), int(month), 1)
+    except ValueError:
+        return None
+
+
+def archived_months(model):
+    """Months with archived rows of `model`, oldest first"""
+    folder = archive_dir(model)
+    if not folder.is_dir():
+        return []
+    months = {_parse_month(path.name) for path in folder.iterdir() if path.name.endswith(('.jsonl.gz', '.part'))}
+    return sorted(month for month in months if month)
+
+
+def _month_files(model, month):
+    folder = archive_dir(model)
+    files = [month_path(model, month)]
+    files += sorted(folder.glob(f'{month:%Y-%m}.*.part'))
+    return [path for path in files if path.exists()]
+
+
+def _write_atomic(path, data):
+    temp = path.with_name(path.name + '.tmp')
+    with open(temp, 'wb') as handle:
+        handle.write(data)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(temp, path)
+
+
+def _index_path(path):
+    return path.with_name(path.name + '.idx')
+
+
+def _column_values(rows):
+    """{column: set of values} of the INDEX_COLUMNS present in `rows`"""
+    values = {}
+    for row in rows:
+        for column in INDEX_COLUMNS:
+            if column in row:
+                values.setdefault(column, set()).add(row[column])
+    return values
+
+
+class Block:
+    """One gzip member of an archive file: its byte range, key range and column values"""
+
+    def __init__(self, offset, length, low, high, columns):
+        self.offset = offset
+        self.length = length
+        # lowest and highest (date, id) in the block
+        self.low = low
+        self.high = high
+        self.columns = columns
+
+    def moved(self, by):
+        return Block(self.offset + by, self.length, self.low, self.high, self.columns)
+
+
+def _block_of(offset, length, rows, model, date_field):
+    keys = [_key(model, date_field, row) for row in rows]
+    return Block(offset, length, min(keys), max(keys), _column_values(rows))
+
+
+def _key(model, date_field, row):
+    # the (date, id) order of the pages
+    value = row[date_field]
+    if isinstance(value, str):
+        value = model._meta.get_field(date_field).to_python(value)
+    return value, row['id']
+
+
+def _write_index(path, size, date_field, blocks):
+    index = {
+        'size': size,
+        'date_field': date_field,
+        'blocks': [
+            {
+                'offset': block.offset, 'length': block.length, 'low': block.low, 'high': block.high,
+                'columns': {column: list(found) for column, found in block.columns.items()},
+            }
+            for block in blocks
+        ],
+    }
+    _write_atomic(_index_path(path), json.dumps(index, default=_json_default).encode())
+
+
+def _read_index(path, model, date_field):
+    """The Blocks of `path` from its sidecar, None when missing or stale"""
+    field = model._meta.get_field(date_field)
+    try:
+        index = json.loads(_index_path(path).read_text())
+        if index['size'] != path.stat().st_size or index['date_field'] != date_field:
+            return None
+        return [
+            Block(
+                block['offset'], block['length'],
+                (field.to_python(block['low'][0]), block['low'][1]),
+                (field.to_python(block['high'][0]), block['high'][1]),
+                {column: set(found) for column, found in block['columns'].items()},
+            )
+            for block in index['blocks']
+        ]
+    except (OSError, ValueError, KeyError, TypeError, IndexError):
+        return None
+
+
+def _decode(data):
+    return [json.loads(line) for line in data.decode('utf-8').splitlines() if line]
+
+
+def _members(raw):
+    """(offset, length, decompressed bytes) of each gzip member of the open file `raw`"""
+    offset = 0
+    data = b''
+    while True:
+        if not data:
+            data = raw.read(READ_SIZE)
+            if not data:
+                return
+        member = zlib.decompressobj(wbits=31)
+        parts = []
+        length = 0
+        while True:
+            parts.append(member.decompress(data))
+            if member.eof:
+                length += len(data) - len(member.unused_data)
+                data = member.unused_data
+                break
+            length += len(data)
+            data = raw.read(READ_SIZE)
+            if not data:
+                raise EOFError(f'{raw.name} ends in the middle of a gzip member')
+        yield offset, length, b''.join(parts)
+        offset += length
+
+
+def _scan(path, model, date_field):
+    """Blocks of `path` worked out by decompressing it, one member at a time. Rewrites its sidecar."""
+    blocks = []
+    with open(path, 'rb') as raw:
+        # the size of the file read, even if it is replaced meanwhile
+        size = os.fstat(raw.fileno()).st_size
+        for offset, length, data in _members(raw):
+            rows = _decode(data)
+            if rows:
+                blocks.append(_block_of(offset, length, rows, model, date_field))
+    try:
+        _write_index(path, size, date_field, blocks)
+    except OSError:
+        pass
+    return blocks
+
+
+def _blocks(path, model, date_field):
+    blocks = _read_index(path, model, date_field)
+    return _scan(path, model, date_field) if blocks is None else blocks
+
+
+def _read_block(path, block):
+    """The rows of one block, read without touching the rest of the file"""
+    with open(path, 'rb') as raw:
+        raw.seek(block.offset)
+        return _decode(zlib.decompress(raw.read(block.length), wbits=31))
+
+
+def write_part(model, month, rows, date_field='timestamp'):
+    """
+    Store `rows` (dicts of column values, ordered by id) as a part of `month`.
+    Once this returns the rows are safely on disk and may be deleted.
+    """
+    folder = archive_dir(model)
+    folder.mkdir(parents=True, exist_ok=True)
+    path = folder / f"{month:%Y-%m}.{rows[0]['id']}-{rows[-1]['id']}.part"
+    ordered = sorted(rows, key=lambda row: _key(model, date_field, row))
+    data = b''
+    blocks = []
+    for start in range(0, len(ordered), BLOCK_ROWS):
+        chunk = ordered[start:start + BLOCK_ROWS]
+        lines = ''.join(json.dumps(row, default=_json_default) + '\n' for row in chunk)
+        member = gzip.compress(lines.encode(), compresslevel=6)
+        blocks.append(_block_of(len(data), len(member), chunk, model, date_field))
+        data += member
+    _write_atomic(path, data)
+    _write_index(path, len(data), date_field, blocks)
+    return path
+
+
+def merge_parts(model, date_field='timestamp'):
+    """Append every pending part to its month file. Returns the number of parts merged."""
+    merged = 0
+    for month in archived_months(model):
+        parts = sorted(archive_dir(model).glob(f'{month:%Y-%m}.*.part'))
+        if not parts:
+            continue
+        path = month_path(model, month)
+        files = ([path] if path.exists() else []) + parts
+        indexes = [_read_index(file, model, date_field) for file in files]
+        data = path.read_bytes() if path.exists() else b''
+        blocks = indexes[0] if path.exists() else []
+        for part, index in zip(parts, indexes[len(files) - len(parts):]):
+            if index is not None and blocks is not None:
+                blocks += [block.moved(len(data)) for block in index]
+            else:
+                blocks = None
+            data += part.read_bytes()
+        _write_atomic(path, data)
+        # the month's sidecar covers the parts too, unless one is missing
+        if blocks is not None:
+            _write_index(path, len(data), date_field, blocks)
+        for part in parts:
+            part.unlink()
+            _index_path(part).unlink(missing_ok=True)
+        merged += len(parts)
+    return merged
+
+
+def purge_months(model, before):
+    """Delete the archived months of `model` older than `before`. Returns the months removed."""
+    removed = []
+    for month in archived_months(model):
+        if month >= before:
+            break
+        for path in archive_dir(model).glob(f'{month:%Y-%m}.*'):
+            path.unlink()
+        removed.append(month)
+    return removed
+
+
+def _instance(model, fields, row):
+    # columns left out of the archive come back as their default
+    values = [
+        field.to_python(row[field.attname]) if field.attname in row else field.get_default()
+        for field in fields
+    ]
+    return model.from_db('default', [field.attname for field in fields], values)
+
+
+class _Reversed:
+    """Sort key turned around, for merging newest first"""
+    __slots__ = ('key',)
+
+    def __init__(self, key):
+        self.key = key
+
+    def __lt__(self, other):
+        return other.key < self.key
+
+    def __eq__(self, other):
+        return isinstance(other, _Reversed) and self.key == other.key
+
+
+def _may_match(values, lookups):
+    """Whether a block with these column values can hold rows matching `lookups`"""
+    for key, target in lookups.items():
+        name, _, operator = key.partition('__')
+        found = values.get(name)
+        if found is None:
+            continue
+        if operator in ('', 'exact') and target not in found:
+            return False
+        if operator == 'in' and found.isdisjoint(target):
+            return False
+    return True
+
+
+def _raw_match(row, lookups):
+    # equality on the indexed columns holds for the raw JSON values too
+    for key, target in lookups.items():
+        name, _, operator = key.partition('__')
+        if name not in INDEX_COLUMNS or name not in row:
+            continue
+        if operator in ('', 'exact') and row[name] != target:
+            return False
+        if operator == 'in' and row[name] not in target:
+            return False
+    return True
+
+
+def month_rows(model, month, date_field='timestamp', lookups=None, after=None, newest_first=False):
+    """
+    Archived rows of `model` in `month` matching `lookups`, as instances in
+    (date_field, id) order - newest first if asked - starting past the
+    (date, id) `after`. Rows are decoded a block at a time as the caller
+    iterates, so stopping early leaves the rest of the month unread.
+    """
+    lookups = lookups or {}
+    wrap = _Reversed if newest_first else (lambda key: key)
+    # past the cursor in the order read
+    past = (lambda key: key < after) if newest_first else (lambda key: key > after)
+    start = lookups.get(f'{date_field}__gte')
+    end = lookups.get(f'{date_field}__lt')
+
+    blocks = []
+    for path in _month_files(model, month):
+        for block in _blocks(path, model, date_field):
+            if after is not None and not past(block.low if newest_first else block.high):
+                continue
+            if (start and block.high[0] < start) or (end and block.low[0] >= end):
+                continue
+            if _may_match(block.columns, lookups):
+                blocks.append((path, block))
+    # in the order the merge reaches them
+    blocks.sort(key=lambda item: wrap(item[1].high if newest_first else item[1].low))
+
+    fields = model._meta.concrete_fields
+    heap = []
+    position = 0
+    last = None
+    while True:
+        # open every block that may hold a row coming before the next one in the heap
+        while position < len(blocks) and (
+            not heap or not heap[0][0] < wrap(blocks[position][1].high if newest_first else blocks[position][1].low)
+        ):
+            path, block = blocks[position]
+            for row in _read_block(path, block):
+                key = _key(model, date_field, row)
+                if (after is None or past(key)) and _raw_match(row, lookups):
+                    heapq.heappush(heap, (wrap(key), position, key, row))
+            position += 1
+        if not heap:
+            return
+        _, _, key, row = heapq.heappop(heap)
+        # a row archived twice (crash between merge and cleanup) is read once
+        if key == last:
+            continue
+        last = key
+        obj = _instance(model, fields, row)
+        if matches(obj, lookups):
+            yield obj
+
+
+_OPERATORS = {
+    'exact': lambda value, target: value == target,
+    'in': lambda value, target: value in target,
+    'gt': lambda value, target: value is not None and value > target,
+    'gte': lambda value, target: value is not None and value >= target,
+    'lt': lambda value, target: value is not None and value < target,
+    'lte': lambda value, target: value is not None and value <= target,
+}
+
+
+def matches(obj, lookups):
+    """Whether `obj` passes simple field lookups such as {'user_id__in': [...], 'timestamp__gte': ...}"""
+    for key, target in lookups.items():
+        name, _, operator = key.partition('__')
+        if not _OPERATORS[operator or 'exact'](getattr(obj, name), target):
+            return False
+    return True
+
+
+def archive_tail(model, lookups, select_related=()):
+    """
+    Archive source for paginate_keyset() over ('-timestamp', '-id'): archived
+    rows of `model` matching `lookups`, the same filters the queryset got.
+    None when the lookups cannot match anything.
+    """
+    if lookups is None:
+        return None
+    start = lookups.get('timestamp__gte')
+    end = lookups.get('timestamp__lt')
+
+    def tail(values, forward, limit):
+        # forward: rows after the cursor, newest first; back: before it, nearest first
+        months = archived_months(model)
+        if start:
+            months = [month for month in months if month >= month_of(start)]
+        if end:
+            months = [month for month in months if month <= month_of(end)]
+        cursor = tuple(values) if values else None
+        if cursor:
+            edge = month_of(cursor[0])
+            months = [month for month in months if (month <= edge if forward else month >= edge)]
+        if forward:
+            months.reverse()
+
+        found = []
+        for month in months:
+            found += itertools.islice(
+                month_rows(model, month, lookups=lookups, after=cursor, newest_first=forward), limit - len(found)
+            )
+            if len(found) >= limit:
+                break
+        if select_related and found:
+            prefetch_related_objects(found, *select_related)
+        return found
+
+    return tail
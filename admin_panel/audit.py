@@ -0,0 +1,191 @@
+"""
+Buffered writer for AuditLog rows.
+
+Entries are queued in-process and written with a single bulk_create once the
+buffer holds AUDIT_LOG_BUFFER_SIZE entries or the oldest entry has waited
+AUDIT_LOG_FLUSH_INTERVAL seconds. Entries are timestamped when they are
+queued, not when they are written. The thresholds are checked at the end of
+the requests that queued an entry - requests that log nothing never pay for
+a flush - and a timer armed by the first entry of a batch flushes it once
+the interval is up, so a quiet process does not sit on entries until the
+next request. Whatever is left is flushed when the process exits.
+
+Every entry also gets an action_code, the action text lowercased with runs of
+other characters turned into "_" ("Employee activated" -> employee_activated),
+which the audit log browser filters on through its composite index.
+"""
+import atexit
+import logging
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, connection, connections, transaction
+from django.utils import timezone
+
+from .models import AuditLog
+from .stats import AUDIT_LOG_VERSION, bump_data_version
+
+logger = logging.getLogger(__name__)
+
+ACTIONS_CACHE_KEY = 'audit_log:actions'
+
+
+def action_code(action):
+    return re.sub(r'[^a-z0-9]+', '_', (action or '').lower()).strip('_')[:64]
+
+
+def action_choices():
+    """[(code, label)] of the action codes in the audit log, cached"""
+    choices = cache.get(ACTIONS_CACHE_KEY)
+    if choices is None:
+        # loose index scan: one index seek per distinct code instead of a
+        # DISTINCT over every row
+        table = connection.ops.quote_name(AuditLog._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                WITH RECURSIVE codes(code) AS (
+                    SELECT MIN(action_code) FROM {table}
+                    UNION ALL
+                    SELECT (SELECT MIN(action_code) FROM {table} WHERE action_code > codes.code)
+                    FROM codes WHERE codes.code IS NOT NULL
+                )
+                SELECT code FROM codes WHERE code IS NOT NULL AND code <> ''
+            """)
+            choices = [(code, code.replace('_', ' ').title()) for code, in cursor.fetchall()]
+        cache.set(ACTIONS_CACHE_KEY, choices, timeout=getattr(settings, 'AUDIT_ACTIONS_CACHE_TIMEOUT', 3600))
+    return choices
+
+
+class AuditBuffer:
+    def __init__(self):
+        self._entries = []
+        self._oldest = None
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    @property
+    def max_size(self):
+        return getattr(settings, 'AUDIT_LOG_BUFFER_SIZE', 50)
+
+    @property
+    def flush_interval(self):
+        return getattr(settings, 'AUDIT_LOG_FLUSH_INTERVAL', 5)
+
+    def add(self, entry):
+        with self._lock:
+            if not self._entries:
+                self._oldest = time.monotonic()
+            self._entries.append(entry)
+            full = len(self._entries) >= self.max_size
+            if not full and self._timer is None:
+                self._timer = threading.Timer(self.flush_interval, self._flush_on_timer)
+                self._timer.daemon = True
+                self._timer.start()
+        if full:
+            self.flush()
+
+    def is_due(self):
+        with self._lock:
+            if not self._entries:
+                return False
+            if len(self._entries) >= self.max_size:
+                return True
+            return time.monotonic() - self._oldest >= self.flush_interval
+
+    def _flush_on_timer(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception('Could not flush audit log buffer')
+        finally:
+            # the timer thread opened its own connection
+            connections.close_all()
+
+    def flush_if_due(self):
+        if self.is_due():
+            self.flush()
+
+    def flush(self):
+        # swap the list out under the lock so other threads can keep queueing
+        with self._lock:
+            entries, self._entries = self._entries, []
+            self._oldest = None
+            timer, self._timer = self._timer, None
+        if timer is not None:
+            timer.cancel()
+        if not entries:
+            return 0
+
+        try:
+            with transaction.atomic():
+                AuditLog.objects.bulk_create(entries)
+                # audit log exports are reused until this moves
+                bump_data_version(AUDIT_LOG_VERSION)
+        except IntegrityError:
+            # usually an actor deleted before the flush - save the rest one by one
+            for entry in entries:
+                entry.pk = None
+                try:
+                    with transaction.atomic():
+                        entry.save()
+                except IntegrityError:
+                    entry.pk = None
+                    entry.user_id = None
+                    entry.save()
+            bump_data_version(AUDIT_LOG_VERSION)
+
+        # a new kind of action shows up in the browser's action filter right away
+        known = cache.get(ACTIONS_CACHE_KEY)
+        if known is not None and {entry.action_code for entry in entries} - {code for code, _ in known}:
+            cache.delete(ACTIONS_CACHE_KEY)
+        return len(entries)
+
+
+_buffer = AuditBuffer()
+# whether the current thread queued an entry since its last request ended
+_local = threading.local()
+
+
+def log_audit(user, action, details='', ip_address=None):
+    """Queue an AuditLog entry. It is written on the next flush."""
+    _local.queued = True
+    _buffer.add(AuditLog(
+        user_id=user.pk if user is not None else None,
+        action=action,
+        action_code=action_code(action),
+        details=details,
+        ip_address=ip_address,
+        timestamp=timezone.now(),
+    ))
+
+
+def flush_audit_log(force=True):
+    """Write queued entries now (or only if a threshold was hit when force=False)."""
+    if force:
+        return _buffer.flush()
+    _buffer.flush_if_due()
+
+
+def flush_on_request_finished(sender, **kwargs):
+    if not getattr(_local, 'queued', False):
+        return
+    _local.queued = False
+    try:
+        _buffer.flush_if_due()
+    except Exception:
+        logger.exception('Could not flush audit log buffer')
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        _buffer.flush()
+    except Exception:
+        logger.exception('Could not flush audit log buffer on shutdown')
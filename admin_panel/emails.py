@@ -0,0 +1,27 @@
+# email templates shared by the admin views and the bulk importer
+
+
+def welcome_email(user, temp_pass):
+    """Subject and body of the credentials email sent to a new account"""
+    body = f"""Welcome to EMS!
+
+Your account has been created successfully.
+
+Login Credentials:
+Employee ID: {user.employee_id}
+Username: {user.username}
+Temporary Password: {temp_pass}
+
+Please login at: http://127.0.0.1:8000/
+
+IMPORTANT: You will be required to change your password on first login.
+An OTP will be sent to this email for password verification.
+
+Name: {user.get_full_name()}
+Email: {user.email}
+Department: {user.department_name}
+Role: {user.role}
+
+Best regards,
+EMS Admin Team"""
+    return 'Welcome to EMS - Your Login Credentials', body
@@ -0,0 +1,100 @@
+"""
+Streaming CSV responses and the admin panel export rows.
+
+Rows are encoded and sent as they are produced, so an export holds one row
+in memory no matter how many it contains. `on_complete` runs once the last
+row has been written (with the number of data rows), which is where exports
+record their audit entry. The row generators read values_list projections
+with .iterator() and are shared with the background export jobs (jobs.py).
+"""
+import csv
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+CHUNK_SIZE = 2000
+
+EMPLOYEE_HEADER = [
+    'Employee ID', 'First Name', 'Last Name', 'Email', 'Phone', 'Role',
+    'Department', 'Salary', 'Date of Joining', 'Status', 'Account Locked',
+]
+
+AUDIT_LOG_HEADER = ['Timestamp', 'User', 'Action', 'Details', 'IP Address']
+
+
+class Echo:
+    """File-like object whose write() returns the value instead of storing it"""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(header, rows, on_complete=None):
+    writer = csv.writer(Echo())
+    yield writer.writerow(header)
+    count = 0
+    for row in rows:
+        yield writer.writerow(row)
+        count += 1
+    if on_complete:
+        on_complete(count)
+
+
+def streaming_csv_response(filename, header, rows, on_complete=None):
+    response = StreamingHttpResponse(csv_lines(header, rows, on_complete), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def employee_rows(employees):
+    """CSV rows (see EMPLOYEE_HEADER) of a user queryset"""
+    rows = employees.order_by('employee_id', 'id').values_list(
+        'employee_id', 'first_name', 'last_name', 'email', 'phone', 'role',
+        'department__name', 'salary', 'date_of_joining', 'is_active', 'account_locked',
+    )
+    for employee_id, first, last, email, phone, role, dept, salary, joined, active, locked in rows.iterator(
+        chunk_size=CHUNK_SIZE
+    ):
+        yield [
+            employee_id or 'N/A',
+            first,
+            last,
+            email,
+            phone or 'N/A',
+            role,
+            dept or 'N/A',
+            salary or 0,
+            joined.strftime('%Y-%m-%d') if joined else 'N/A',
+            'Active' if active else 'Inactive',
+            'Yes' if locked else 'No',
+        ]
+
+
+def _audit_log_row(timestamp, email, action, details, ip_address):
+    # as the audit log page shows it
+    return [timezone.localtime(timestamp).strftime('%Y-%m-%d %H:%M:%S'), email or 'N/A', action, details,
+            ip_address or 'N/A']
+
+
+def audit_log_rows(logs, archived=None):
+    """
+    CSV rows (see AUDIT_LOG_HEADER) of an AuditLog queryset, newest first like
+    the audit log page, continued by the `archived` source (archive.archive_tail)
+    """
+    rows = logs.order_by('-timestamp', '-id').values_list(
+        'timestamp', 'id', 'user__email', 'action', 'details', 'ip_address'
+    )
+    cursor = None
+    for timestamp, pk, email, action, details, ip_address in rows.iterator(chunk_size=CHUNK_SIZE):
+        yield _audit_log_row(timestamp, email, action, details, ip_address)
+        cursor = (timestamp, pk)
+    if archived is None:
+        return
+    while True:
+        chunk = archived(cursor, True, CHUNK_SIZE)
+        if not chunk:
+            break
+        for log in chunk:
+            yield _audit_log_row(log.timestamp, log.user.email if log.user else None, log.action, log.details,
+                                 log.ip_address)
+        cursor = (chunk[-1].timestamp, chunk[-1].pk)
@@ -0,0 +1,125 @@
+"""
+Filters shared by list pages and their exports.
+"""
+from datetime import date, datetime, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_ipv46_address
+from django.db.models import Q
+from django.utils import timezone
+
+from users.departments import parse_department
+from users.search import search_users
+
+from .archive import archive_tail
+from .audit import action_code
+from .models import AuditLog
+
+
+def parse_day(value):
+    """date from a YYYY-MM-DD query parameter, None when missing or invalid"""
+    try:
+        return date.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
+def filter_employees(params):
+    """Employees and HR matching the employee_list filters in `params` (request.GET)"""
+    filters = {key: params.get(key, '') for key in ('search', 'role', 'department', 'status')}
+    emps = get_user_model().objects.filter(role__in=['Employee', 'HR'])
+
+    # search part
+    search = filters['search'].strip()
+    if search:
+        # word prefixes of name, email and employee id, through the search index
+        emps = search_users(emps, search)
+
+    # filter by role
+    if filters['role']:
+        emps = emps.filter(role=filters['role'])
+
+    # filter by department id
+    department = parse_department(filters['department'])
+    if department:
+        emps = emps.filter(department_id=department)
+
+    # filter by status
+    status = filters['status']
+    if status == 'active':
+        emps = emps.filter(is_active=True, account_locked=False)
+    elif status == 'inactive':
+        emps = emps.filter(is_active=False)
+    elif status == 'locked':
+        emps = emps.filter(account_locked=True)
+
+    return emps, filters
+
+
+def parse_moment(value, end=False):
+    """
+    Aware datetime from a YYYY-MM-DD or YYYY-MM-DDTHH:MM[:SS] parameter in the
+    current time zone, None when missing or invalid. With end=True it is the
+    first instant after that day, minute or second - an exclusive upper bound.
+    """
+    try:
+        moment = datetime.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+    if moment is None:
+        return None
+    if end:
+        moment += {10: timedelta(days=1), 16: timedelta(minutes=1)}.get(len(value), timedelta(seconds=1))
+    return moment if timezone.is_aware(moment) else timezone.make_aware(moment)
+
+
+def audit_log_lookups(params):
+    """
+    (lookups, filters) for the audit log filters in `params`: the field
+    lookups, None when nothing can match, and the cleaned filter values.
+    Each of actor, action and ip leads one of the AuditLog (column,
+    timestamp, id) indexes, so a filtered page is an index range read
+    whatever the table size. The archive read path applies the same lookups.
+    """
+    filters = {key: params.get(key, '').strip() for key in ('actor', 'action', 'ip', 'start_date', 'end_date')}
+    lookups = {}
+
+    # actor by email, username or employee id - all unique columns. Resolved
+    # to ids first: an IN (subquery) would be read through the plain user_id
+    # index and sorted, instead of walking (user, timestamp, id) in order
+    actor = filters['actor']
+    if actor:
+        users = get_user_model().objects.filter(Q(email=actor) | Q(username=actor) | Q(employee_id=actor))
+        lookups['user_id__in'] = list(users.values_list('id', flat=True))
+
+    if filters['action']:
+        lookups['action_code'] = action_code(filters['action'])
+
+    # exact address - anything else cannot match a stored one
+    if filters['ip']:
+        try:
+            validate_ipv46_address(filters['ip'])
+        except ValidationError:
+            return None, filters
+        lookups['ip_address'] = filters['ip']
+
+    start = parse_moment(filters['start_date'])
+    if start:
+        lookups['timestamp__gte'] = start
+    end = parse_moment(filters['end_date'], end=True)
+    if end:
+        lookups['timestamp__lt'] = end
+    return lookups, filters
+
+
+def filter_audit_logs(params):
+    """
+    (logs, filters, archived) for the audit log filters in `params`: the
+    matching AuditLog entries, the filter values, and the archive source
+    (archive.archive_tail) carrying on with the same filters in the
+    archived months.
+    """
+    lookups, filters = audit_log_lookups(params)
+    logs = AuditLog.objects.filter(**lookups) if lookups is not None else AuditLog.objects.none()
+    return logs, filters, archive_tail(AuditLog, lookups, select_related=('user',))
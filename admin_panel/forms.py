@@ -1,30 +1,83 @@
 from django import forms
 from django.contrib.auth import get_user_model
+from django.utils.html import format_html, format_html_join
+
+from users.departments import department_name, get_departments, get_or_create_department, normalize
 
 User = get_user_model()
 
+# department name input suggesting the existing departments
+class DepartmentInput(forms.TextInput):
+    def render(self, name, value, attrs=None, renderer=None):
+        attrs = dict(attrs or {}, list=f'{name}_departments', autocomplete='off')
+        return format_html(
+            '{}<datalist id="{}_departments">{}</datalist>',
+            super().render(name, value, attrs, renderer),
+            name,
+            format_html_join('', '<option value="{}">', ((dept_name,) for _, dept_name in get_departments())),
+        )
+
+# department typed by name - cleaned to the normalized name, matched to an
+# existing department ignoring case and spacing (or created) only when the
+# form is saved, so spellings cannot drift apart again
+class DepartmentField(forms.CharField):
+    widget = DepartmentInput
+    
+    def __init__(self, **kwargs):
+        kwargs.setdefault('max_length', 100)
+        super().__init__(**kwargs)
+    
+    def prepare_value(self, value):
+        # model instances give the department id
+        if isinstance(value, int):
+            return department_name(value)
+        return value
+    
+    def clean(self, value):
+        return normalize(super().clean(value)) or None
+
+# model forms with a DepartmentField: the field is not a model field of the
+# form, the department is looked up or created by save()
+class DepartmentFormMixin:
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk:
+            self.initial.setdefault('department', self.instance.department_id)
+    
+    def save(self, commit=True):
+        self.instance.department = get_or_create_department(self.cleaned_data.get('department'))
+        return super().save(commit)
+
 # form for creating employees
-class EmployeeCreationForm(forms.ModelForm):
+class EmployeeCreationForm(DepartmentFormMixin, forms.ModelForm):
     first_name = forms.CharField(max_length=150, required=True)
     last_name = forms.CharField(max_length=150, required=False)
     phone = forms.CharField(max_length=15, required=True)
-    department = forms.CharField(max_length=100, required=True)
+    department = DepartmentField(required=True)
     salary = forms.DecimalField(max_digits=10, decimal_places=2, required=True)
     date_of_joining = forms.DateField(widget=forms.DateInput(attrs={'type': 'date'}), required=True)
     
     class Meta:
         model = User
-        fields = ['email', 'first_name', 'last_name', 'phone', 'role', 'department', 'salary', 'date_of_joining']
+        fields = ['email', 'first_name', 'last_name', 'phone', 'role', 'salary', 'date_of_joining']
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.fields['role'].choices = [('HR', 'HR'), ('Employee', 'Employee')]
 
+# row validation for the CSV import - email uniqueness is checked per chunk
+# by the importer instead of one query per row
+class EmployeeImportForm(EmployeeCreationForm):
+    def validate_unique(self):
+        pass
+
 # form for editing employees
-class EmployeeEditForm(forms.ModelForm):
+class EmployeeEditForm(DepartmentFormMixin, forms.ModelForm):
+    department = DepartmentField(required=False)
+    
     class Meta:
         model = User
-        fields = ['first_name', 'last_name', 'email', 'phone', 'department', 'salary', 'date_of_joining', 'is_active']
+        fields = ['first_name', 'last_name', 'email', 'phone', 'salary', 'date_of_joining', 'is_active']
         widgets = {
             'date_of_joining': forms.DateInput(attrs={'type': 'date'}),
         }
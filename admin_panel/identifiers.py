@@ -0,0 +1,72 @@
+"""
+Username, employee id and temporary password generation for new accounts.
+
+The next free suffix for a base value is resolved with one range query on the
+unique index instead of probing candidates with exists() until one is free.
+Callers that save the result should retry on IntegrityError, since another
+request may grab the same value between the lookup and the insert.
+"""
+import re
+import secrets
+import string
+
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+# sorts after anything that can follow the prefix
+PREFIX_END = '\U0010ffff'
+
+
+def username_base(first_name, last_name):
+    if last_name:
+        return f"{first_name.lower()}.{last_name.lower()}"
+    return f"{first_name.lower()}.ems"
+
+
+def employee_id_base(first_name, last_name, date_of_joining):
+    year = date_of_joining.year if date_of_joining else timezone.now().year
+    if last_name:
+        return f"{first_name.lower()}.{last_name.lower()}_{year}"
+    return f"{first_name.lower()}.ems_{year}"
+
+
+def allocate(field, base, count=1, sep=''):
+    """
+    Return `count` unused values of User.<field> derived from `base`:
+    the base itself if free, then base<sep>N continuing after the highest N in use.
+    """
+    User = get_user_model()
+    in_use = User.objects.filter(**{
+        f'{field}__gte': base,
+        f'{field}__lt': base + PREFIX_END,
+    }).values_list(field, flat=True)
+
+    suffix = re.compile(re.escape(base + sep) + r'(\d+)$')
+    base_taken = False
+    highest = 0
+    for value in in_use:
+        if value == base:
+            base_taken = True
+            continue
+        match = suffix.match(value)
+        if match:
+            highest = max(highest, int(match.group(1)))
+
+    values = [] if base_taken else [base]
+    while len(values) < count:
+        highest += 1
+        values.append(f"{base}{sep}{highest}")
+    return values
+
+
+def make_username(first_name, last_name):
+    return allocate('username', username_base(first_name, last_name))[0]
+
+
+def make_employee_id(first_name, last_name, date_of_joining):
+    return allocate('employee_id', employee_id_base(first_name, last_name, date_of_joining), sep='_')[0]
+
+
+def make_temp_password(length=10):
+    chars = string.ascii_letters + string.digits
+    return ''.join(secrets.choice(chars) for _ in range(length))
@@ -0,0 +1,218 @@
+"""
+Bulk employee onboarding from a CSV file.
+
+Rows are streamed from the file and validated with the create employee form
+rules. Valid rows are collected into chunks: temporary passwords for a chunk
+are hashed in a process pool, and the users and their queued welcome emails
+are inserted with bulk_create inside one transaction. The emails are delivered
+later by the outbox worker (send_queued_emails).
+
+Hashing is slow on purpose, so uploads from the import page are not imported
+in the request: they are queued as a background job (jobs.request_import) and
+imported by the run_export_jobs worker.
+"""
+import csv
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError, transaction
+
+from users.departments import get_or_create_department
+from users.search import index as index_users
+
+from .audit import log_audit
+from .emails import welcome_email
+from .forms import EmployeeImportForm
+from .identifiers import allocate, username_base, employee_id_base, make_temp_password
+from .models import NotificationLog
+from .outbox import build_notification
+from .stats import bump_version as bump_dashboard_version
+
+User = get_user_model()
+
+CSV_COLUMNS = ['first_name', 'last_name', 'email', 'phone', 'role', 'department', 'salary', 'date_of_joining']
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.errors = []  # (line number, message)
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_second(self):
+        return round(self.created / self.elapsed, 1) if self.elapsed else 0
+
+
+def _init_worker():
+    # needed when the pool spawns fresh interpreters (Windows/macOS)
+    import django
+    django.setup()
+
+
+def _normalize_row(row):
+    # accept "First Name" as well as "first_name" style headers
+    return {
+        (key or '').strip().lower().replace(' ', '_'): (value or '').strip()
+        for key, value in row.items()
+    }
+
+
+def _form_errors(form):
+    return '; '.join(
+        f"{field}: {' '.join(errors)}" if field != '__all__' else ' '.join(errors)
+        for field, errors in form.errors.items()
+    )
+
+
+def _assign_identifiers(users):
+    # one allocation query per distinct base, however many people share it
+    by_username = defaultdict(list)
+    by_employee_id = defaultdict(list)
+    for user in users:
+        by_username[username_base(user.first_name, user.last_name or '')].append(user)
+        by_employee_id[employee_id_base(user.first_name, user.last_name or '', user.date_of_joining)].append(user)
+
+    for base, group in by_username.items():
+        for user, value in zip(group, allocate('username', base, count=len(group))):
+            user.username = value
+    for base, group in by_employee_id.items():
+        for user, value in zip(group, allocate('employee_id', base, count=len(group), sep='_')):
+            user.employee_id = value
+    # bulk_create skips save(), which normally fills this in
+    for user in users:
+        user.search_text = user.build_search_text()
+
+
+def _assign_departments(users):
+    # inside the write transaction, so rows that never get written create no
+    # department; the names are looked up in the cached department list
+    departments = {}
+    for user in users:
+        name = user._department_name
+        if name not in departments:
+            departments[name] = get_or_create_department(name)
+        user.department = departments[name]
+
+
+def _reject_taken_emails(users, result):
+    # one query for the whole chunk instead of the form's per-row unique check
+    existing = set(User.objects.filter(
+        email__in=[user.email for _, user in users]
+    ).values_list('email', flat=True))
+    kept = []
+    for line_no, user in users:
+        if user.email in existing:
+            result.errors.append((line_no, f'email: User with this Email already exists ({user.email}).'))
+        else:
+            kept.append((line_no, user))
+    return kept
+
+
+def _import_chunk(rows, pool, seen_emails, result):
+    # drop emails that appear earlier in the file
+    users = []
+    for line_no, user in rows:
+        email = user.email.lower()
+        if email in seen_emails:
+            result.errors.append((line_no, f'email: User with this Email already exists ({user.email}).'))
+            continue
+        seen_emails.add(email)
+        users.append((line_no, user))
+    users = _reject_taken_emails(users, result)
+    if not users:
+        return
+
+    temp_passwords = [make_temp_password() for _ in users]
+    if pool is not None:
+        hashes = list(pool.map(make_password, temp_passwords, chunksize=max(len(users) // 32, 1)))
+    else:
+        hashes = [make_password(p) for p in temp_passwords]
+    for (_, user), temp_pass, hashed in zip(users, temp_passwords, hashes):
+        user.password = hashed
+        user.temp_password = temp_pass
+        user.must_change_password = True
+
+    for attempt in range(3):
+        chunk = [user for _, user in users]
+        _assign_identifiers(chunk)
+        try:
+            with transaction.atomic():
+                _assign_departments(chunk)
+                created = User.objects.bulk_create(chunk)
+                NotificationLog.objects.bulk_create([
+                    build_notification(
+                        user,
+                        'Account Creation',
+                        *welcome_email(user, user.temp_password),
+                        message=f'Temporary credentials sent. Username: {user.username}',
+                    )
+                    for user in created
+                ])
+                # bulk_create skips post_save, so index them for the directory search ourselves
+                index_users(created)
+            break
+        except IntegrityError:
+            # someone created a clashing username/id or one of the emails
+            # meanwhile - reject those rows and allocate again
+            for user in chunk:
+                user.pk = None
+            if attempt == 2:
+                raise
+            users = _reject_taken_emails(users, result)
+            if not users:
+                return
+
+    # bulk_create skips post_save, so invalidate the dashboard ourselves
+    bump_dashboard_version()
+    result.created += len(created)
+
+
+def import_employees(csv_file, actor=None, ip_address=None, chunk_size=500, workers=None, progress=None):
+    """
+    Create employees from an open text-mode CSV file with CSV_COLUMNS headers.
+    Returns an ImportResult with the created count and per-line errors.
+    `progress` is called with the number of rows read after every chunk.
+    """
+    result = ImportResult()
+    started = time.monotonic()
+    workers = os.cpu_count() if workers is None else workers
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) if workers > 1 else None
+    seen_emails = set()
+
+    try:
+        chunk = []
+        # line 1 is the header row
+        for line_no, row in enumerate(csv.DictReader(csv_file), start=2):
+            form = EmployeeImportForm(data=_normalize_row(row))
+            if not form.is_valid():
+                result.errors.append((line_no, _form_errors(form)))
+                continue
+            # the user without its department, see _assign_departments
+            user = form.instance
+            user._department_name = form.cleaned_data['department']
+            chunk.append((line_no, user))
+            if len(chunk) >= chunk_size:
+                _import_chunk(chunk, pool, seen_emails, result)
+                chunk = []
+                if progress:
+                    progress(line_no - 1)
+        if chunk:
+            _import_chunk(chunk, pool, seen_emails, result)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    result.errors.sort()
+    result.elapsed = time.monotonic() - started
+    log_audit(
+        user=actor,
+        action='Bulk Import Employees',
+        details=f'Imported {result.created} employees, {len(result.errors)} rows rejected',
+        ip_address=ip_address,
+    )
+    return result
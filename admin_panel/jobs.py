@@ -0,0 +1,292 @@
+"""
+Background CSV exports.
+
+A view calls request_export(), which records an ExportJob and returns at
+once; the run_export_jobs management command claims Pending jobs and writes
+the CSV into storage (MEDIA_ROOT/exports/) with the same row generators the
+streaming exports use, updating rows_done as it goes so the page can poll
+export_progress.
+
+Every job carries a fingerprint of its kind, cleaned filters and the data
+version at request time: the DataVersion counters (stats.py) that writes to
+the exported tables move, read from the database so that every web process
+and worker agrees on them without scanning the rows. A request whose
+fingerprint matches a finished job (or one still in progress) gets that job
+back instead of a new export. Jobs left Running by a worker that died are
+failed by the next run_pending() once EXPORT_JOB_STALE_AFTER has passed.
+
+Employee CSV uploads run through the same queue: request_import() stores the
+upload and records an employee_import job, which the worker imports with the
+password hashing spread over a process pool. Its file is the CSV of rejected
+rows and its result holds the counts shown on the job page.
+"""
+import csv
+import hashlib
+import io
+import json
+import logging
+import tempfile
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db.models import F
+from django.utils import timezone
+
+from hr_module.exports import ATTENDANCE_HEADER, attendance_queryset, attendance_range, attendance_rows
+
+from .exports import AUDIT_LOG_HEADER, EMPLOYEE_HEADER, audit_log_rows, csv_lines, employee_rows
+from .filters import filter_audit_logs, filter_employees
+from .importer import import_employees
+from .models import ExportJob
+from .stats import ATTENDANCE_VERSION, AUDIT_LOG_VERSION, USERS_VERSION, data_versions
+
+logger = logging.getLogger(__name__)
+
+# rows written between progress updates
+PROGRESS_EVERY = 1000
+
+
+class AttendanceExport:
+    roles = ('HR',)
+    header = ATTENDANCE_HEADER
+    return_url = 'hr_module:attendance_list'
+
+    def clean(self, params):
+        start, end, department = attendance_range(params)
+        return {'start_date': start.isoformat(), 'end_date': end.isoformat(), 'department': department}
+
+    def _range(self, params):
+        return date.fromisoformat(params['start_date']), date.fromisoformat(params['end_date']), params['department']
+
+    def queryset(self, params):
+        return attendance_queryset(*self._range(params))
+
+    def rows(self, params):
+        return attendance_rows(*self._range(params))
+
+    def data_version(self, params):
+        # names come from users
+        return ':'.join(map(str, data_versions(ATTENDANCE_VERSION, USERS_VERSION)))
+
+    def filename(self, params):
+        return f"attendance_{params['start_date']}_{params['end_date']}.csv"
+
+
+class EmployeeExport:
+    roles = ('Admin',)
+    header = EMPLOYEE_HEADER
+    return_url = 'admin_panel:employee_list'
+
+    def clean(self, params):
+        return filter_employees(params)[1]
+
+    def queryset(self, params):
+        return filter_employees(params)[0]
+
+    def rows(self, params):
+        return employee_rows(self.queryset(params))
+
+    def data_version(self, params):
+        # bumped whenever an exported user field changes (see stats.TRACKED_FIELDS)
+        return ':'.join(map(str, data_versions(USERS_VERSION)))
+
+    def filename(self, params):
+        return 'employees.csv'
+
+
+class AuditLogExport:
+    roles = ('Admin',)
+    header = AUDIT_LOG_HEADER
+    return_url = 'admin_panel:audit_logs'
+
+    def clean(self, params):
+        return filter_audit_logs(params)[1]
+
+    def queryset(self, params):
+        return filter_audit_logs(params)[0]
+
+    def rows(self, params):
+        logs, _, archived = filter_audit_logs(params)
+        return audit_log_rows(logs, archived)
+
+    def data_version(self, params):
+        # moved by flushes, archiving and purges; names come from users
+        return ':'.join(map(str, data_versions(AUDIT_LOG_VERSION, USERS_VERSION)))
+
+    def filename(self, params):
+        return 'audit_logs.csv'
+
+
+class EmployeeImport:
+    roles = ('Admin',)
+    header = ['Line', 'Error']
+    return_url = 'admin_panel:import_employees'
+    # rejected rows shown on the job page, the rest are in the file
+    shown_errors = 100
+
+    def filename(self, params):
+        return 'import_errors.csv'
+
+
+EXPORT_KINDS = {
+    'attendance': AttendanceExport(),
+    'employees': EmployeeExport(),
+    'audit_logs': AuditLogExport(),
+}
+
+# every kind of job the worker runs and the job pages show
+JOB_KINDS = {
+    **EXPORT_KINDS,
+    'employee_import': EmployeeImport(),
+}
+
+
+def fingerprint(kind, params, version):
+    payload = json.dumps([kind, params, version], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def request_export(kind, params, user):
+    """
+    (job, reused) for exporting `kind` with the filters in `params`.
+    Raises ValueError for invalid filters.
+    """
+    export = EXPORT_KINDS[kind]
+    params = export.clean(params)
+    key = fingerprint(kind, params, export.data_version(params))
+
+    stale = _stale_before()
+    for job in ExportJob.objects.filter(fingerprint=key).exclude(status='Failed').order_by('-id')[:5]:
+        if job.status == 'Completed' and job.file and job.file.storage.exists(job.file.name):
+            return job, True
+        if job.status in ('Pending', 'Running') and job.created_at >= stale:
+            return job, True
+
+    job = ExportJob.objects.create(kind=kind, params=params, fingerprint=key, requested_by=user)
+    return job, False
+
+
+def _stale_before():
+    # jobs still in progress after this long are assumed lost with their worker
+    return timezone.now() - timedelta(seconds=getattr(settings, 'EXPORT_JOB_STALE_AFTER', 3600))
+
+
+def fail_stale():
+    """Fail Running jobs whose worker has not finished them in time. Returns how many."""
+    return ExportJob.objects.filter(status='Running', started_at__lt=_stale_before()).update(
+        status='Failed', error='The worker stopped before the job finished', finished_at=timezone.now(),
+    )
+
+
+def request_import(upload, user, ip_address=None):
+    """Store an uploaded employee CSV and queue its import. Returns the job."""
+    storage = ExportJob._meta.get_field('file').storage
+    name = storage.save('imports/employees.csv', upload)
+    params = {'upload': name, 'filename': upload.name, 'ip_address': ip_address}
+    # never reused - every upload is imported
+    key = fingerprint('employee_import', params, timezone.now().isoformat())
+    return ExportJob.objects.create(kind='employee_import', params=params, fingerprint=key, requested_by=user)
+
+
+def run_job(job):
+    """Run a Pending job. Returns False if another worker claimed it first."""
+    claimed = ExportJob.objects.filter(pk=job.pk, status='Pending').update(
+        status='Running', started_at=timezone.now()
+    )
+    if not claimed:
+        return False
+
+    jobs = ExportJob.objects.filter(pk=job.pk)
+    try:
+        if job.kind == 'employee_import':
+            _run_import(job, jobs)
+        else:
+            _run_export(job, jobs)
+    except Exception as e:
+        logger.exception('%s job %s failed', job.get_kind_display(), job.pk)
+        jobs.update(status='Failed', error=str(e), finished_at=timezone.now())
+    return True
+
+
+def _save_file(job, export, lines):
+    # built in a local temporary file, then copied into storage in chunks
+    with tempfile.TemporaryFile() as handle:
+        for line in lines:
+            handle.write(line.encode('utf-8'))
+        handle.seek(0)
+        name = job.file.field.generate_filename(job, f'{job.pk}_{export.filename(job.params)}')
+        return job.file.storage.save(name, File(handle))
+
+
+def _run_export(job, jobs):
+    export = EXPORT_KINDS[job.kind]
+    jobs.update(rows_total=export.queryset(job.params).count())
+    written = 0
+
+    def finished(count):
+        nonlocal written
+        written = count
+
+    def lines():
+        for number, line in enumerate(csv_lines(export.header, export.rows(job.params), finished)):
+            if number and number % PROGRESS_EVERY == 0:
+                jobs.update(rows_done=number)
+            yield line
+
+    name = _save_file(job, export, lines())
+    jobs.update(status='Completed', file=name, rows_done=written, finished_at=timezone.now())
+
+
+def _run_import(job, jobs):
+    export = JOB_KINDS[job.kind]
+    storage = job.file.storage
+    try:
+        with storage.open(job.params['upload'], 'rb') as upload:
+            csv_file = io.TextIOWrapper(upload, encoding='utf-8-sig', newline='')
+            try:
+                # data rows, for the progress bar
+                jobs.update(rows_total=max(sum(1 for _ in csv.reader(csv_file)) - 1, 0))
+                csv_file.seek(0)
+                result = import_employees(
+                    csv_file,
+                    actor=job.requested_by,
+                    ip_address=job.params.get('ip_address'),
+                    workers=getattr(settings, 'EMPLOYEE_IMPORT_WORKERS', None),
+                    progress=lambda done: jobs.update(rows_done=done),
+                )
+            except (UnicodeDecodeError, csv.Error) as e:
+                jobs.update(status='Failed', error=f'Could not read the CSV file: {e}', finished_at=timezone.now())
+                return
+    finally:
+        # the upload holds personal data, keep only the outcome
+        storage.delete(job.params['upload'])
+
+    name = _save_file(job, export, csv_lines(export.header, result.errors)) if result.errors else ''
+    jobs.update(
+        status='Completed',
+        file=name,
+        rows_done=F('rows_total'),
+        result={
+            'created': result.created,
+            'rejected': len(result.errors),
+            'elapsed': round(result.elapsed, 1),
+            'rows_per_second': result.rows_per_second,
+            'errors': result.errors[:export.shown_errors],
+        },
+        finished_at=timezone.now(),
+    )
+
+
+def run_pending(limit=None):
+    """Run Pending jobs oldest first. Returns the number of jobs this worker ran."""
+    # a lost job would otherwise be handed out as in progress forever
+    fail_stale()
+    ran = 0
+    while limit is None or ran < limit:
+        job = ExportJob.objects.filter(status='Pending').order_by('id').first()
+        if job is None:
+            break
+        if run_job(job):
+            ran += 1
+    return ran
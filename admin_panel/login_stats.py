@@ -0,0 +1,169 @@
+"""
+Login analytics rollups.
+
+Every LoginAttempt adds one to its LoginRollup row (hour, email, IP and
+outcome - attempts on unknown accounts share the email '') and moves the account's LoginFailureStreak: a failure extends the
+current run, and the longest one with it, a success ends it. The login view
+calls record_lockout() when the attempt locked the account. The signal
+handler in signals.py covers LoginAttempt.save(); bulk_create() callers call
+record() themselves or catch up with `manage.py rebuild_login_stats`.
+
+The rollups outlive the attempts - archiving old LoginAttempt rows
+(retention.py) leaves them alone - and the report reads a window of them,
+a few rows per hour, however many attempts that hour saw.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Min, Q, Sum
+from django.db.models.functions import Coalesce, Greatest, TruncHour
+from django.utils import timezone
+
+from .models import AuditLog, LoginAttempt, LoginFailureStreak, LoginRollup
+
+# rows per table of the report
+TOP = 10
+
+
+def hour_of(moment):
+    """Start of the (local) hour `moment` falls in, as TruncHour() gives it"""
+    return timezone.localtime(moment).replace(minute=0, second=0, microsecond=0)
+
+
+def _bump(key, defaults, **deltas):
+    changes = {name: F(name) + value for name, value in deltas.items()}
+    if LoginRollup.objects.filter(**key).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            LoginRollup.objects.create(**key, **defaults, **deltas)
+    except IntegrityError:
+        # created by a concurrent login meanwhile
+        LoginRollup.objects.filter(**key).update(**changes)
+
+
+def _key(attempt, success):
+    return {
+        'hour': hour_of(attempt.timestamp),
+        # whatever was typed for unknown accounts shares one row per hour and IP,
+        # so random usernames cannot grow the rollups like the attempts
+        'email': attempt.email if attempt.user_id else '',
+        'ip_address': attempt.ip_address or '',
+        'success': success,
+    }
+
+
+def record(attempt):
+    """Count a new LoginAttempt"""
+    with transaction.atomic():
+        _bump(_key(attempt, attempt.success), {'user_id': attempt.user_id}, count=1)
+        if attempt.user_id:
+            _streak(attempt)
+
+
+def _streak(attempt):
+    if attempt.success:
+        changes = {'current': 0, 'last_success_at': attempt.timestamp}
+        created = {'last_success_at': attempt.timestamp}
+    else:
+        # both right hand sides see the stored current
+        changes = {
+            'current': F('current') + 1,
+            'longest': Greatest('longest', F('current') + 1),
+            'last_failure_at': attempt.timestamp,
+        }
+        created = {'current': 1, 'longest': 1, 'last_failure_at': attempt.timestamp}
+    if LoginFailureStreak.objects.filter(user_id=attempt.user_id).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            LoginFailureStreak.objects.create(user_id=attempt.user_id, **created)
+    except IntegrityError:
+        LoginFailureStreak.objects.filter(user_id=attempt.user_id).update(**changes)
+
+
+def record_lockout(attempt):
+    """Count the account lockout caused by a failed LoginAttempt"""
+    _bump(_key(attempt, False), {'user_id': attempt.user_id}, lockouts=1)
+
+
+def rebuild(start=None):
+    """
+    Recompute the rollups from `start` on - by default from the oldest
+    attempt still in the table, archived hours keep theirs - and the failure
+    streaks from the attempts in the table. Lockouts are recounted from the
+    'Account Locked' audit entries. Returns the number of rollup rows written.
+    """
+    attempts = LoginAttempt.objects.all()
+    if start is None:
+        start = attempts.aggregate(first=Min('timestamp'))['first']
+        if start is None:
+            return 0
+    start = hour_of(start)
+    attempts = attempts.filter(timestamp__gte=start)
+
+    cells = defaultdict(lambda: {'count': 0, 'lockouts': 0, 'user_id': None})
+    rows = attempts.annotate(hour=TruncHour('timestamp')).values(
+        'hour', 'user_id', 'email', 'ip_address', 'success'
+    ).annotate(total=Count('id')).order_by()
+    for row in rows.iterator():
+        email = row['email'] if row['user_id'] else ''
+        cell = cells[(row['hour'], email, row['ip_address'] or '', row['success'])]
+        cell['count'] += row['total']
+        cell['user_id'] = row['user_id']
+    lockouts = AuditLog.objects.filter(action_code='account_locked', timestamp__gte=start, user__isnull=False).annotate(
+        hour=TruncHour('timestamp')
+    ).values('hour', 'user_id', 'user__email', 'ip_address').annotate(total=Count('id')).order_by()
+    for row in lockouts.iterator():
+        cell = cells[(row['hour'], row['user__email'], row['ip_address'] or '', False)]
+        cell['lockouts'] += row['total']
+        cell['user_id'] = row['user_id']
+
+    streaks = {}
+    history = LoginAttempt.objects.filter(user__isnull=False).order_by('user_id', 'timestamp', 'id')
+    for user_id, success, moment in history.values_list('user_id', 'success', 'timestamp').iterator(chunk_size=5000):
+        streak = streaks.get(user_id)
+        if streak is None:
+            streak = streaks[user_id] = LoginFailureStreak(user_id=user_id)
+        if success:
+            streak.current = 0
+            streak.last_success_at = moment
+        else:
+            streak.current += 1
+            streak.longest = max(streak.longest, streak.current)
+            streak.last_failure_at = moment
+
+    with transaction.atomic():
+        LoginRollup.objects.filter(hour__gte=start).delete()
+        created = LoginRollup.objects.bulk_create([
+            LoginRollup(hour=hour, email=email, ip_address=ip_address, success=success, **cell)
+            for (hour, email, ip_address, success), cell in cells.items()
+        ], batch_size=1000)
+        LoginFailureStreak.objects.filter(user_id__in=list(streaks)).delete()
+        LoginFailureStreak.objects.bulk_create(streaks.values(), batch_size=1000)
+    return len(created)
+
+
+def report(days, limit=TOP):
+    """Login analytics of the last `days` days, read from the rollups"""
+    since = hour_of(timezone.now()) - timedelta(days=days)
+    window = LoginRollup.objects.filter(hour__gt=since)
+    failures = window.filter(success=False)
+    return {
+        'totals': window.aggregate(
+            attempts=Coalesce(Sum('count'), 0),
+            failures=Coalesce(Sum('count', filter=Q(success=False)), 0),
+            lockouts=Coalesce(Sum('lockouts'), 0),
+        ),
+        'top_ips': list(failures.values('ip_address').annotate(
+            failures=Sum('count'), accounts=Count('email', distinct=True), lockouts=Sum('lockouts'),
+        ).order_by('-failures', 'ip_address')[:limit]),
+        'top_accounts': list(failures.values('email', 'user_id').annotate(
+            failures=Sum('count'), ips=Count('ip_address', distinct=True), lockouts=Sum('lockouts'),
+        ).order_by('-failures', 'email')[:limit]),
+        # open runs of failures, longest first
+        'streaks': list(LoginFailureStreak.objects.filter(current__gt=0).select_related('user').order_by(
+            '-current', '-id'
+        )[:limit]),
+    }
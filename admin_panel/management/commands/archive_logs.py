@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from admin_panel.retention import CHUNK_SIZE, POLICIES, archive_expired, purge_archives
+
+
+class Command(BaseCommand):
+    help = 'Move old audit log, login attempt and notification rows to the compressed monthly archives'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--table', choices=sorted(POLICIES), action='append',
+                            help='Only this table (repeatable, default: all)')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                            help=f'Rows moved per transaction (default {CHUNK_SIZE})')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only count the rows that would be archived')
+        parser.add_argument('--vacuum', action='store_true',
+                            help='Give the freed pages back to the file system afterwards (SQLite)')
+
+    def handle(self, *args, **options):
+        for name in options['table'] or sorted(POLICIES):
+            policy = POLICIES[name]
+            started = time.perf_counter()
+            moved, months = archive_expired(policy, chunk_size=options['chunk_size'], dry_run=options['dry_run'])
+            if options['dry_run']:
+                self.stdout.write(f'{name}: {moved} rows older than {policy.hot_days} days would be archived')
+                continue
+            purged = purge_archives(policy)
+            self.stdout.write(self.style.SUCCESS(
+                f'{name}: archived {moved} rows into {months} months, purged {len(purged)} old months '
+                f'in {time.perf_counter() - started:.2f}s'
+            ))
+
+        if options['vacuum'] and not options['dry_run'] and connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('VACUUM')
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from admin_panel.importer import import_employees
+
+
+class Command(BaseCommand):
+    help = 'Create employee accounts in bulk from a CSV file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_path')
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='Rows inserted per transaction (default 500)')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Processes used to hash temporary passwords (default: CPU count)')
+
+    def handle(self, *args, **options):
+        try:
+            csv_file = open(options['csv_path'], encoding='utf-8-sig', newline='')
+        except OSError as e:
+            raise CommandError(f"Cannot open {options['csv_path']}: {e}")
+
+        with csv_file:
+            result = import_employees(csv_file, chunk_size=options['chunk_size'], workers=options['workers'])
+
+        for line_no, error in result.errors:
+            self.stderr.write(f'line {line_no}: {error}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {result.created} employees, rejected {len(result.errors)} rows '
+            f'in {result.elapsed:.1f}s ({result.rows_per_second} rows/s)'
+        ))
@@ -0,0 +1,25 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from admin_panel.login_stats import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Regenerate the login analytics rollups and failure streaks from LoginAttempt'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='start',
+                            help='First date to rebuild (YYYY-MM-DD, default: the oldest attempt in the table)')
+
+    def handle(self, *args, **options):
+        start = None
+        if options['start']:
+            try:
+                start = timezone.make_aware(datetime.strptime(options['start'], '%Y-%m-%d'))
+            except ValueError as e:
+                raise CommandError(f'Invalid date: {e}')
+
+        cells = rebuild(start)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {cells} login rollup rows'))
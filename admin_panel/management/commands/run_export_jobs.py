@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from admin_panel.jobs import run_pending
+
+
+class Command(BaseCommand):
+    help = 'Run queued background exports and employee imports'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=None,
+                            help='Stop after this many jobs (default: all pending)')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep running and poll for new jobs')
+        parser.add_argument('--interval', type=float, default=2,
+                            help='Seconds between polls with --loop (default 2)')
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.perf_counter()
+            ran = run_pending(options['limit'])
+            if ran or not options['loop']:
+                self.stdout.write(self.style.SUCCESS(
+                    f'Ran {ran} background jobs in {time.perf_counter() - started:.2f}s'
+                ))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
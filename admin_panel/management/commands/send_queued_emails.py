@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from admin_panel.outbox import drain
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued emails from the notification outbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100,
+                            help='Emails sent per SMTP connection (default 100)')
+        parser.add_argument('--max-attempts', type=int, default=5,
+                            help='Attempts before an email is marked Failed (default 5)')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep running and poll for new emails')
+        parser.add_argument('--interval', type=float, default=2,
+                            help='Seconds between polls with --loop (default 2)')
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                sent, failed, seconds = drain(options['batch_size'], options['max_attempts'], stdout=self.stdout)
+            except Exception as e:
+                # mail server unreachable - report and try again on the next poll
+                if not options['loop']:
+                    raise
+                self.stderr.write(f'Could not connect to mail server: {e}')
+            else:
+                if sent or failed or not options['loop']:
+                    rate = sent / seconds if seconds else 0
+                    self.stdout.write(self.style.SUCCESS(
+                        f'Sent {sent} emails, {failed} failed in {seconds:.2f}s ({rate:.1f} emails/s)'
+                    ))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,73 @@
+import socketserver
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+
+class SinkHandler(socketserver.StreamRequestHandler):
+    """Speaks just enough SMTP for Django's backend and discards every message"""
+
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self):
+        self.reply('220 ems-smtp-sink ready')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors='replace').strip().upper()
+            if command.startswith('EHLO'):
+                self.wfile.write(b'250-ems-smtp-sink\r\n250-8BITMIME\r\n250 SMTPUTF8\r\n')
+            elif command.startswith('DATA'):
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                while self.rfile.readline() not in (b'.\r\n', b'.\n', b''):
+                    pass
+                self.server.count_message()
+                self.reply('250 OK: queued')
+            elif command.startswith('QUIT'):
+                self.reply('221 Bye')
+                return
+            else:
+                # HELO, MAIL FROM, RCPT TO, RSET, NOOP ...
+                self.reply('250 OK')
+
+
+class SinkServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.received = 0
+        self._lock = threading.Lock()
+
+    def count_message(self):
+        with self._lock:
+            self.received += 1
+
+
+class Command(BaseCommand):
+    help = ('Run a local SMTP server that accepts and discards mail, for measuring outbox throughput. '
+            'Point EMAIL_HOST/EMAIL_PORT at it with EMAIL_USE_TLS=False.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=1025)
+
+    def handle(self, *args, **options):
+        server = SinkServer((options['host'], options['port']), SinkHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.stdout.write(f"SMTP sink listening on {options['host']}:{options['port']} (Ctrl+C to stop)")
+
+        last = 0
+        try:
+            while True:
+                time.sleep(1)
+                received = server.received
+                if received != last:
+                    self.stdout.write(f'{received} messages received ({received - last}/s)')
+                    last = received
+        except KeyboardInterrupt:
+            server.shutdown()
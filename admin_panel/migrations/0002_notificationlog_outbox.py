@@ -0,0 +1,49 @@
+# Generated by Django 5.2.11 on 2026-10-18 03:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_panel', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationlog',
+            name='attempts',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='notificationlog',
+            name='body',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='notificationlog',
+            name='delivered_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='notificationlog',
+            name='last_error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='notificationlog',
+            name='recipient',
+            field=models.EmailField(blank=True, max_length=254),
+        ),
+        migrations.AlterField(
+            model_name='notificationlog',
+            name='status',
+            field=models.CharField(choices=[('Queued', 'Queued'), ('Sent', 'Sent'), ('Failed', 'Failed')], default='Queued', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='notificationlog',
+            index=models.Index(fields=['status', 'id'], name='notification_status_idx'),
+        ),
+    ]
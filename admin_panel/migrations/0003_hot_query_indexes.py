@@ -0,0 +1,23 @@
+# Generated by Django 5.2.11 on 2026-10-18 03:41
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_panel', '0002_notificationlog_outbox'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['timestamp'], name='auditlog_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loginattempt',
+            index=models.Index(fields=['user', 'timestamp'], name='loginattempt_user_time_idx'),
+        ),
+    ]
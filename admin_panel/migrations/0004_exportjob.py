@@ -0,0 +1,37 @@
+# Generated by Django 5.2.11 on 2026-10-18 04:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_panel', '0003_hot_query_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('attendance', 'Attendance'), ('employees', 'Employees'), ('audit_logs', 'Audit Logs')], max_length=20)),
+                ('params', models.JSONField(default=dict)),
+                ('fingerprint', models.CharField(max_length=64)),
+                ('status', models.CharField(choices=[('Pending', 'Pending'), ('Running', 'Running'), ('Completed', 'Completed'), ('Failed', 'Failed')], default='Pending', max_length=20)),
+                ('rows_total', models.IntegerField(blank=True, null=True)),
+                ('rows_done', models.IntegerField(default=0)),
+                ('file', models.FileField(blank=True, upload_to='exports/')),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['fingerprint', 'status'], name='exportjob_fingerprint_idx'), models.Index(fields=['status', 'id'], name='exportjob_status_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.11 on 2026-10-18 04:28
+
+import re
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_action_codes(apps, schema_editor):
+    # same normalization as admin_panel.audit.action_code, one UPDATE per distinct action
+    AuditLog = apps.get_model('admin_panel', 'AuditLog')
+    for action in AuditLog.objects.values_list('action', flat=True).distinct().order_by():
+        code = re.sub(r'[^a-z0-9]+', '_', action.lower()).strip('_')[:64]
+        AuditLog.objects.filter(action=action).update(action_code=code)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_panel', '0004_exportjob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='auditlog',
+            name='auditlog_timestamp_idx',
+        ),
+        migrations.AddField(
+            model_name='auditlog',
+            name='action_code',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.RunPython(fill_action_codes, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['timestamp', 'id'], name='auditlog_time_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['action_code', 'timestamp', 'id'], name='auditlog_action_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['user', 'timestamp', 'id'], name='auditlog_user_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['ip_address', 'timestamp', 'id'], name='auditlog_ip_time_idx'),
+        ),
+    ]
@@ -0,0 +1,90 @@
+# Generated by Django 5.2.11 on 2026-10-18 04:47
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncHour
+
+
+def fill_login_rollups(apps, schema_editor):
+    LoginAttempt = apps.get_model('admin_panel', 'LoginAttempt')
+    AuditLog = apps.get_model('admin_panel', 'AuditLog')
+    LoginRollup = apps.get_model('admin_panel', 'LoginRollup')
+    LoginFailureStreak = apps.get_model('admin_panel', 'LoginFailureStreak')
+
+    cells = {}
+    rows = LoginAttempt.objects.annotate(hour=TruncHour('timestamp')).values(
+        'hour', 'user_id', 'email', 'ip_address', 'success'
+    ).annotate(total=Count('id')).order_by()
+    for row in rows.iterator():
+        # unknown accounts share one row per hour and IP
+        key = (row['hour'], row['email'] if row['user_id'] else '', row['ip_address'] or '', row['success'])
+        cell = cells.setdefault(key, LoginRollup(hour=key[0], email=key[1], ip_address=key[2], success=key[3],
+                                                 user_id=row['user_id']))
+        cell.count += row['total']
+    lockouts = AuditLog.objects.filter(action_code='account_locked', user__isnull=False).annotate(
+        hour=TruncHour('timestamp')
+    ).values('hour', 'user_id', 'user__email', 'ip_address').annotate(total=Count('id')).order_by()
+    for row in lockouts.iterator():
+        key = (row['hour'], row['user__email'], row['ip_address'] or '', False)
+        cell = cells.setdefault(key, LoginRollup(hour=key[0], email=key[1], ip_address=key[2], success=False,
+                                                 user_id=row['user_id']))
+        cell.lockouts += row['total']
+    LoginRollup.objects.bulk_create(cells.values(), batch_size=1000)
+
+    streaks = {}
+    history = LoginAttempt.objects.filter(user__isnull=False).order_by('user_id', 'timestamp', 'id')
+    for user_id, success, moment in history.values_list('user_id', 'success', 'timestamp').iterator(chunk_size=5000):
+        streak = streaks.setdefault(user_id, LoginFailureStreak(user_id=user_id))
+        if success:
+            streak.current = 0
+            streak.last_success_at = moment
+        else:
+            streak.current += 1
+            streak.longest = max(streak.longest, streak.current)
+            streak.last_failure_at = moment
+    LoginFailureStreak.objects.bulk_create(streaks.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_panel', '0005_auditlog_action_code'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoginFailureStreak',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('current', models.IntegerField(default=0)),
+                ('longest', models.IntegerField(default=0)),
+                ('last_failure_at', models.DateTimeField(blank=True, null=True)),
+                ('last_success_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='login_failure_streak', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['current'], name='loginstreak_current_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='LoginRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('email', models.EmailField(blank=True, max_length=254)),
+                ('ip_address', models.CharField(blank=True, max_length=45)),
+                ('success', models.BooleanField()),
+                ('count', models.IntegerField(default=0)),
+                ('lockouts', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['success', 'hour'], name='loginrollup_outcome_hour_idx')],
+                'constraints': [models.UniqueConstraint(fields=('hour', 'email', 'ip_address', 'success'), name='loginrollup_key_unique')],
+            },
+        ),
+        migrations.RunPython(fill_login_rollups, migrations.RunPython.noop),
+    ]
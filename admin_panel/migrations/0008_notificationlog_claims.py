@@ -0,0 +1,28 @@
+# Generated by Django 5.2.11 on 2026-10-18 05:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_panel', '0007_auditlog_timestamp_default'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationlog',
+            name='claimed_by',
+            field=models.CharField(blank=True, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='notificationlog',
+            name='next_attempt_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='notificationlog',
+            name='status',
+            field=models.CharField(choices=[('Queued', 'Queued'), ('Sending', 'Sending'), ('Sent', 'Sent'), ('Failed', 'Failed')], default='Queued', max_length=20),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.11 on 2026-10-18 05:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_panel', '0009_dataversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exportjob',
+            name='result',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AlterField(
+            model_name='exportjob',
+            name='kind',
+            field=models.CharField(choices=[('attendance', 'Attendance'), ('employees', 'Employees'), ('audit_logs', 'Audit Logs'), ('employee_import', 'Employee Import')], max_length=20),
+        ),
+    ]
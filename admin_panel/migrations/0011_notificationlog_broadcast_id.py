@@ -0,0 +1,24 @@
+# Generated by Django 5.2.11 on 2026-10-18 05:53
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_panel', '0010_exportjob_employee_import'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationlog',
+            name='broadcast_id',
+            field=models.CharField(blank=True, max_length=32),
+        ),
+        migrations.AddIndex(
+            model_name='notificationlog',
+            index=models.Index(fields=['broadcast_id', 'status'], name='notification_broadcast_idx'),
+        ),
+    ]
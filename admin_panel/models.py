@@ -34,28 +34,168 @@ class LoginAttempt(models.Model):
     success = models.BooleanField(default=False)
     timestamp = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'timestamp'], name='loginattempt_user_time_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.email} - {'Success' if self.success else 'Failed'}"
 
+# login attempts per hour, email, ip and outcome - kept in step with LoginAttempt by login_stats.py
+class LoginRollup(models.Model):
+    hour = models.DateTimeField()  # start of the hour
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    # '' for attempts on unknown accounts
+    email = models.EmailField(blank=True)
+    # '' when unknown - NULLs never collide in the unique key
+    ip_address = models.CharField(max_length=45, blank=True)
+    success = models.BooleanField()
+    count = models.IntegerField(default=0)
+    # failed attempts that locked the account
+    lockouts = models.IntegerField(default=0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['hour', 'email', 'ip_address', 'success'], name='loginrollup_key_unique'),
+        ]
+        indexes = [
+            # the login analytics report reads the failures of a recent window
+            models.Index(fields=['success', 'hour'], name='loginrollup_outcome_hour_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.hour:%Y-%m-%d %H:00} {self.email} {self.ip_address or '-'} - {'Success' if self.success else 'Failed'}: {self.count}"
+
+# failed logins in a row per account, ended by a successful one
+class LoginFailureStreak(models.Model):
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='login_failure_streak')
+    current = models.IntegerField(default=0)
+    longest = models.IntegerField(default=0)
+    last_failure_at = models.DateTimeField(null=True, blank=True)
+    last_success_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['current'], name='loginstreak_current_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id}: {self.current} failed in a row (longest {self.longest})"
+
 # audit log for admin actions
 class AuditLog(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
     action = models.CharField(max_length=255)
+    # normalized action (see audit.action_code) - what the audit log browser filters on
+    action_code = models.CharField(max_length=64, blank=True, default='')
     details = models.TextField(blank=True)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # set when the entry is queued (audit.log_audit), not when the buffer is written
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
+    
+    class Meta:
+        indexes = [
+            # the audit log browser pages by (timestamp, id), alone or after one of the filters
+            models.Index(fields=['timestamp', 'id'], name='auditlog_time_id_idx'),
+            models.Index(fields=['action_code', 'timestamp', 'id'], name='auditlog_action_time_idx'),
+            models.Index(fields=['user', 'timestamp', 'id'], name='auditlog_user_time_idx'),
+            models.Index(fields=['ip_address', 'timestamp', 'id'], name='auditlog_ip_time_idx'),
+        ]
     
     def __str__(self):
         return f"{self.action} by {self.user} at {self.timestamp}"
 
-# notification log
+# notification log - also the outbox for emails waiting to be delivered
 class NotificationLog(models.Model):
+    STATUS_CHOICES = (
+        ('Queued', 'Queued'),
+        ('Sending', 'Sending'),
+        ('Sent', 'Sent'),
+        ('Failed', 'Failed'),
+    )
+    
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     notification_type = models.CharField(max_length=50)
     subject = models.CharField(max_length=255)
     message = models.TextField()
     sent_at = models.DateTimeField(auto_now_add=True)
-    status = models.CharField(max_length=20, default='Sent')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Queued')
+    # outbox fields - body is cleared once delivered since it may hold credentials
+    recipient = models.EmailField(blank=True)
+    body = models.TextField(blank=True)
+    attempts = models.IntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+    # Queued: not before this time (retry backoff); Sending: the claim expires then
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
+    # the worker that claimed the row for sending
+    claimed_by = models.CharField(max_length=32, blank=True)
+    # shared by the rows of one broadcast, for its delivery progress
+    broadcast_id = models.CharField(max_length=32, blank=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'id'], name='notification_status_idx'),
+            models.Index(fields=['broadcast_id', 'status'], name='notification_broadcast_idx'),
+        ]
     
     def __str__(self):
         return f"{self.notification_type} to {self.user.email}"
+
+# background CSV export or employee import - see admin_panel/jobs.py
+class ExportJob(models.Model):
+    KIND_CHOICES = (
+        ('attendance', 'Attendance'),
+        ('employees', 'Employees'),
+        ('audit_logs', 'Audit Logs'),
+        ('employee_import', 'Employee Import'),
+    )
+    
+    STATUS_CHOICES = (
+        ('Pending', 'Pending'),
+        ('Running', 'Running'),
+        ('Completed', 'Completed'),
+        ('Failed', 'Failed'),
+    )
+    
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    params = models.JSONField(default=dict)
+    # hash of kind, params and the data version - equal fingerprints mean an identical file
+    fingerprint = models.CharField(max_length=64)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Pending')
+    requested_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    rows_total = models.IntegerField(null=True, blank=True)
+    rows_done = models.IntegerField(default=0)
+    file = models.FileField(upload_to='exports/', blank=True)
+    error = models.TextField(blank=True)
+    # what the job reports back besides its file (import counts and first errors)
+    result = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['fingerprint', 'status'], name='exportjob_fingerprint_idx'),
+            models.Index(fields=['status', 'id'], name='exportjob_status_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_kind_display()} export #{self.pk} - {self.status}"
+    
+    @property
+    def progress(self):
+        if self.status == 'Completed':
+            return 100
+        if not self.rows_total:
+            return 0
+        return min(int(self.rows_done * 100 / self.rows_total), 99)
+
+# counters shared by every process, see stats.bump_version
+class DataVersion(models.Model):
+    name = models.CharField(max_length=50, unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.name} v{self.version}"
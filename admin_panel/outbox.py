@@ -0,0 +1,190 @@
+"""
+Database-backed email outbox.
+
+Views queue emails as NotificationLog rows with status 'Queued' instead of
+talking to the mail server inside the request. The send_queued_emails
+management command drains the queue in batches over one reused SMTP
+connection. A batch is claimed before it is sent: one UPDATE moves the due
+rows from 'Queued' to 'Sending' under a token of this worker, so two workers
+never send the same row. Delivered rows become 'Sent'. A failed row goes back
+to the queue with next_attempt_at pushed out (EMAIL_RETRY_DELAY, doubling per
+attempt), or becomes 'Failed' once it runs out of attempts. Attempts are
+counted when a row is claimed, so a row whose worker died while sending it
+(claimable again after EMAIL_SENDING_TIMEOUT seconds) runs out of attempts
+too instead of being retried forever.
+Broadcasts to many users are queued with one bulk_create, tagged with a
+broadcast id for their delivery progress, and delivered by the same worker.
+"""
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from .models import NotificationLog
+
+# backoff between attempts never grows past this (seconds)
+MAX_RETRY_DELAY = 86400
+
+
+def build_notification(user, notification_type, subject, body, message=None):
+    """Unsaved outbox row, for callers that bulk_create many at once"""
+    return NotificationLog(
+        user=user,
+        notification_type=notification_type,
+        subject=subject,
+        message=message if message is not None else body,
+        recipient=user.email,
+        body=body,
+        status='Queued',
+    )
+
+
+def queue_email(user, notification_type, subject, body, message=None):
+    """
+    Queue an email to `user`. `message` is the text kept in the notification
+    log after delivery and defaults to the body itself.
+    """
+    notification = build_notification(user, notification_type, subject, body, message)
+    notification.save()
+    return notification
+
+
+def retry_delay(attempts):
+    """Seconds to wait after the `attempts`-th failed attempt"""
+    delay = getattr(settings, 'EMAIL_RETRY_DELAY', 60) * 2 ** (attempts - 1)
+    return min(delay, MAX_RETRY_DELAY)
+
+
+def claim(batch_size, now=None, max_attempts=5):
+    """
+    Claim up to `batch_size` due emails for sending, oldest first, counting
+    the attempt. Rows another worker claimed in the meantime are not returned.
+    """
+    now = now or timezone.now()
+    # left behind by a worker that died while sending
+    abandoned = Q(status='Sending', next_attempt_at__lt=now)
+    NotificationLog.objects.filter(abandoned, attempts__gte=max_attempts).update(
+        status='Failed', claimed_by='', next_attempt_at=None, last_error='Sending did not finish',
+    )
+    due = NotificationLog.objects.filter(
+        Q(status='Queued') & (Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now)) | abandoned
+    )
+    ids = list(due.order_by('id').values_list('id', flat=True)[:batch_size])
+    if not ids:
+        return []
+    token = uuid.uuid4().hex
+    # the same conditions again - only rows nobody claimed since the select move
+    due.filter(id__in=ids).update(
+        status='Sending',
+        claimed_by=token,
+        attempts=F('attempts') + 1,
+        next_attempt_at=now + timedelta(seconds=getattr(settings, 'EMAIL_SENDING_TIMEOUT', 600)),
+    )
+    return list(NotificationLog.objects.filter(id__in=ids, status='Sending', claimed_by=token).order_by('id'))
+
+
+def send_queued(batch_size=100, max_attempts=5, connection=None):
+    """
+    Claim and deliver up to `batch_size` queued emails over a single connection.
+    Returns (sent, failed) counts.
+    """
+    pending = claim(batch_size, max_attempts=max_attempts)
+    if not pending:
+        return 0, 0
+
+    connection = connection or get_connection()
+    sent_ids = []
+    failed = []
+    try:
+        connection.open()
+    except Exception:
+        # nothing was sent - give the claim and the attempt back
+        NotificationLog.objects.filter(id__in=[n.id for n in pending]).update(
+            status='Queued', claimed_by='', next_attempt_at=None, attempts=F('attempts') - 1,
+        )
+        raise
+    try:
+        for notification in pending:
+            email = EmailMessage(
+                notification.subject,
+                notification.body,
+                settings.EMAIL_HOST_USER,
+                [notification.recipient],
+                connection=connection,
+            )
+            try:
+                email.send()
+                sent_ids.append(notification.id)
+            except Exception as e:
+                failed.append((notification, str(e)))
+    finally:
+        connection.close()
+
+    now = timezone.now()
+    NotificationLog.objects.filter(id__in=sent_ids).update(
+        status='Sent',
+        delivered_at=now,
+        body='',
+        claimed_by='',
+        next_attempt_at=None,
+    )
+    for notification, error in failed:
+        # the attempt was counted by claim()
+        notification.last_error = error
+        notification.claimed_by = ''
+        if notification.attempts >= max_attempts:
+            notification.status = 'Failed'
+            notification.next_attempt_at = None
+        else:
+            notification.status = 'Queued'
+            notification.next_attempt_at = now + timedelta(seconds=retry_delay(notification.attempts))
+        notification.save(update_fields=['last_error', 'status', 'claimed_by', 'next_attempt_at'])
+
+    return len(sent_ids), len(failed)
+
+
+def drain(batch_size=100, max_attempts=5, stdout=None):
+    """
+    Send batches until no email is due - failed ones wait for their next
+    attempt. Returns (sent, failed, seconds).
+    """
+    started = time.monotonic()
+    total_sent = total_failed = 0
+    while True:
+        sent, failed = send_queued(batch_size, max_attempts)
+        total_sent += sent
+        total_failed += failed
+        if stdout and (sent or failed):
+            stdout.write(f'batch: {sent} sent, {failed} failed')
+        # stop when empty, or when a whole batch failed (server down)
+        if sent == 0:
+            break
+    return total_sent, total_failed, time.monotonic() - started
+
+
+def queue_broadcast(recipients, notification_type, subject, body):
+    """
+    Queue one email to many users with one bulk_create. The worker delivers
+    them like any other queued email. Returns the broadcast id of the rows.
+    """
+    broadcast_id = uuid.uuid4().hex
+    notifications = []
+    for user in recipients:
+        notification = build_notification(user, notification_type, subject, body)
+        notification.broadcast_id = broadcast_id
+        notifications.append(notification)
+    NotificationLog.objects.bulk_create(notifications, batch_size=500)
+    return broadcast_id
+
+
+def delivery_progress(broadcast_id):
+    """{status: count} of the rows of a queued broadcast, and the latest error"""
+    rows = NotificationLog.objects.filter(broadcast_id=broadcast_id)
+    counts = dict(rows.values_list('status').annotate(total=Count('id')).order_by())
+    progress = {status: counts.get(status, 0) for status, _ in NotificationLog.STATUS_CHOICES}
+    error = rows.exclude(last_error='').order_by('-id').values_list('last_error', flat=True).first()
+    return progress, error
@@ -0,0 +1,131 @@
+"""
+Keyset (cursor) pagination.
+
+Pages are selected with a WHERE on the ordering columns instead of OFFSET,
+so fetching page 1000 costs the same as page 1 as long as the ordering is
+backed by an index. Cursors are opaque url-safe strings holding the
+ordering values of the first/last row of a page.
+
+An `archive` source can continue the queryset with rows kept outside the
+database (see archive.archive_tail) - rows that all sort after the last row
+of the queryset.
+"""
+import base64
+import json
+
+from django.db.models import Q
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+def _json_default(value):
+    # full precision isoformat - DjangoJSONEncoder drops microseconds
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+def _encode(values):
+    raw = json.dumps(values, default=_json_default).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def _decode(cursor, model, fields):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if len(values) != len(fields):
+            return None
+        return [model._meta.get_field(name).to_python(value) for name, value in zip(fields, values)]
+    except Exception:
+        # tampered or stale cursor - start from the first page
+        return None
+
+
+def _seek(fields, descending, values, forward):
+    # (a, b) after (x, y) is  a > x OR (a = x AND b > y), flipped for descending fields
+    condition = None
+    for name, desc, value in reversed(list(zip(fields, descending, values))):
+        lookup = 'lt' if desc == forward else 'gt'
+        step = Q(**{f'{name}__{lookup}': value})
+        if condition is not None:
+            step |= Q(**{name: value}) & condition
+        condition = step
+    # the redundant a >= x lets the database start the index range at the
+    # cursor instead of reading from the first row and discarding
+    if len(fields) > 1:
+        lookup = 'lte' if descending[0] == forward else 'gte'
+        condition &= Q(**{f'{fields[0]}__{lookup}': values[0]})
+    return condition
+
+
+def paginate_keyset(queryset, ordering, after=None, before=None, per_page=50, archive=None):
+    """
+    Return a KeysetPage of `queryset` ordered by `ordering`, e.g.
+    ('-date_joined', '-id'). The last field must be unique so that rows with
+    equal leading values are not skipped. Pass the `after` cursor of the
+    previous page to go forward, or `before` to go back.
+
+    `archive(values, forward, limit)` returns up to `limit` rows after the
+    cursor `values` (None: from the start) in page order, or before it
+    nearest first when going back.
+    """
+    fields = [f.lstrip('-') for f in ordering]
+    descending = [f.startswith('-') for f in ordering]
+    model = queryset.model
+
+    forward = True
+    values = _decode(after, model, fields) if after else None
+    if values is None and before:
+        values = _decode(before, model, fields)
+        forward = values is None
+
+    if values is not None:
+        queryset = queryset.filter(_seek(fields, descending, values, forward))
+    if forward:
+        rows = list(queryset.order_by(*ordering)[:per_page + 1])
+        if archive and len(rows) <= per_page:
+            rows += archive(values, True, per_page + 1 - len(rows))
+    else:
+        # the archive holds the far end, so going back it comes first
+        rows = archive(values, False, per_page + 1) if archive else []
+        if len(rows) <= per_page:
+            reversed_ordering = [f[1:] if f.startswith('-') else f'-{f}' for f in ordering]
+            rows += list(queryset.order_by(*reversed_ordering)[:per_page + 1 - len(rows)])
+
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if not forward:
+        rows.reverse()
+
+    def cursor(obj):
+        return _encode([getattr(obj, name) for name in fields])
+
+    # going forward there is a previous page whenever we started from a cursor,
+    # going back there is always a next page (the one we came from)
+    has_next = more if forward else True
+    has_previous = values is not None if forward else more
+    return KeysetPage(
+        rows,
+        next_cursor=cursor(rows[-1]) if rows and has_next else None,
+        previous_cursor=cursor(rows[0]) if rows and has_previous else None,
+    )
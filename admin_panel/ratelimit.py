@@ -0,0 +1,79 @@
+"""
+Sliding-window rate limiting for login attempts, backed by Django's cache.
+
+Each window is split into two fixed buckets (the current one and the one
+before it). A count is the current bucket plus the previous bucket weighted
+by how much of it still overlaps the sliding window, which is the usual
+approximation used by cache-based limiters. Buckets are bumped with
+cache.add() + cache.incr(), both atomic on every shipped backend.
+"""
+import hashlib
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+class SlidingWindowLimiter:
+    def __init__(self, scope, limit, window):
+        self.scope = scope
+        self.limit = limit
+        self.window = window
+
+    def _key(self, ident, bucket):
+        # hash the identifier so any username/ip is a valid cache key
+        digest = hashlib.sha256(str(ident).encode()).hexdigest()[:32]
+        return f'ratelimit:{self.scope}:{digest}:{bucket}'
+
+    def _buckets(self, now):
+        bucket = int(now // self.window)
+        elapsed = (now % self.window) / self.window
+        return bucket, elapsed
+
+    def count(self, ident):
+        bucket, elapsed = self._buckets(time.time())
+        values = cache.get_many([self._key(ident, bucket), self._key(ident, bucket - 1)])
+        current = values.get(self._key(ident, bucket), 0)
+        previous = values.get(self._key(ident, bucket - 1), 0)
+        return current + previous * (1 - elapsed)
+
+    def hit(self, ident):
+        """Record one event and return the updated count."""
+        bucket, elapsed = self._buckets(time.time())
+        key = self._key(ident, bucket)
+        # keep the bucket around long enough to act as "previous" next window
+        cache.add(key, 0, timeout=self.window * 2)
+        try:
+            current = cache.incr(key)
+        except ValueError:
+            # expired between add() and incr()
+            cache.set(key, 1, timeout=self.window * 2)
+            current = 1
+        previous = cache.get(self._key(ident, bucket - 1), 0)
+        return current + previous * (1 - elapsed)
+
+    def is_limited(self, ident):
+        return self.count(ident) >= self.limit
+
+    def remaining(self, count):
+        return max(self.limit - math.ceil(count), 0)
+
+    def reset(self, ident):
+        bucket, _ = self._buckets(time.time())
+        cache.delete_many([self._key(ident, bucket), self._key(ident, bucket - 1)])
+
+
+# failed logins per username - crossing the limit locks the account
+username_limiter = SlidingWindowLimiter(
+    'login-user',
+    getattr(settings, 'LOGIN_MAX_FAILED_ATTEMPTS', 5),
+    getattr(settings, 'LOGIN_FAILURE_WINDOW', 900),
+)
+
+# failed logins per client ip - crossing the limit only rejects requests
+ip_limiter = SlidingWindowLimiter(
+    'login-ip',
+    getattr(settings, 'LOGIN_IP_MAX_FAILED_ATTEMPTS', 30),
+    getattr(settings, 'LOGIN_IP_FAILURE_WINDOW', 300),
+)
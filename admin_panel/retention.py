@@ -0,0 +1,115 @@
+"""
+Tiered retention for the log tables.
+
+  hot      rows younger than the policy's <NAME>_HOT_DAYS stay in the table
+  archive  older rows move to the monthly gzip archives (archive.py), where
+           the audit log and login history pages still find them
+  purged   archived months older than LOG_ARCHIVE_KEEP_MONTHS are deleted
+           (0 keeps them forever)
+
+`manage.py archive_logs` runs the policies. Rows move in id order, a chunk at
+a time: each chunk is written to the archive before it is deleted, so an
+interrupted run loses nothing and the next one carries on.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import archive
+from .models import AuditLog, LoginAttempt, NotificationLog
+from .stats import AUDIT_LOG_VERSION, bump_data_version
+
+CHUNK_SIZE = 5000
+
+
+class RetentionPolicy:
+    def __init__(self, model, setting, default_days, date_field='timestamp', exclude=None, skip_fields=(),
+                 version=None):
+        self.model = model
+        self.setting = setting
+        self.default_days = default_days
+        self.date_field = date_field
+        self.exclude = exclude or {}
+        # columns not worth (or not safe) keeping once a row is archived
+        self.fields = [
+            field.attname for field in model._meta.concrete_fields if field.name not in skip_fields
+        ]
+        # DataVersion counter of the exports reading these rows (stats.bump_data_version)
+        self.version = version
+
+    @property
+    def hot_days(self):
+        return getattr(settings, self.setting, self.default_days)
+
+    def cutoff(self, now=None):
+        return (now or timezone.now()) - timedelta(days=self.hot_days)
+
+    def expired(self, now=None):
+        """Rows past the hot period"""
+        rows = self.model.objects.filter(**{f'{self.date_field}__lt': self.cutoff(now)})
+        if self.exclude:
+            rows = rows.exclude(**self.exclude)
+        return rows
+
+
+POLICIES = {
+    'audit_log': RetentionPolicy(AuditLog, 'AUDIT_LOG_HOT_DAYS', 365, version=AUDIT_LOG_VERSION),
+    'login_attempt': RetentionPolicy(LoginAttempt, 'LOGIN_ATTEMPT_HOT_DAYS', 180),
+    # queued mail is still to be sent; bodies may carry one-time credentials
+    'notification_log': RetentionPolicy(
+        NotificationLog, 'NOTIFICATION_LOG_HOT_DAYS', 90, date_field='sent_at',
+        exclude={'status__in': ('Queued', 'Sending')}, skip_fields=('body',),
+    ),
+}
+
+
+def archive_expired(policy, now=None, chunk_size=CHUNK_SIZE, dry_run=False):
+    """
+    Move the rows of `policy` past their hot period to the archive.
+    Returns (rows moved, months touched); with dry_run only counts them.
+    """
+    expired = policy.expired(now)
+    if dry_run:
+        return expired.count(), 0
+
+    moved = 0
+    months = set()
+    last = 0
+    while True:
+        rows = list(expired.filter(id__gt=last).order_by('id').values(*policy.fields)[:chunk_size])
+        if not rows:
+            break
+        last = rows[-1]['id']
+
+        by_month = defaultdict(list)
+        for row in rows:
+            by_month[archive.month_of(row[policy.date_field])].append(row)
+        for month, month_rows in by_month.items():
+            archive.write_part(policy.model, month, month_rows, date_field=policy.date_field)
+
+        # on disk now - only then drop them from the table
+        with transaction.atomic():
+            policy.model.objects.filter(id__in=[row['id'] for row in rows]).delete()
+            if policy.version:
+                bump_data_version(policy.version)
+        moved += len(rows)
+        months.update(by_month)
+
+    archive.merge_parts(policy.model, date_field=policy.date_field)
+    return moved, len(months)
+
+
+def purge_archives(policy, now=None):
+    """Delete archived months older than LOG_ARCHIVE_KEEP_MONTHS. Returns the months removed."""
+    keep = getattr(settings, 'LOG_ARCHIVE_KEEP_MONTHS', 0)
+    if not keep:
+        return []
+    month = archive.month_of(now or timezone.now())
+    total = month.year * 12 + month.month - 1 - keep
+    removed = archive.purge_months(policy.model, month.replace(year=total // 12, month=total % 12 + 1))
+    if removed and policy.version:
+        bump_data_version(policy.version)
+    return removed
@@ -0,0 +1,43 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from users.models import Department
+
+from . import login_stats
+from .models import LoginAttempt
+from .stats import TRACKED_FIELDS, bump_version
+
+User = get_user_model()
+
+
+# invalidate the cached dashboard numbers when a user changes
+@receiver(post_save, sender=User, dispatch_uid='admin_panel.user_saved')
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    if created or update_fields is None or TRACKED_FIELDS & set(update_fields):
+        bump_version()
+
+
+@receiver(post_delete, sender=User, dispatch_uid='admin_panel.user_deleted')
+def user_deleted(sender, instance, **kwargs):
+    bump_version()
+
+
+# department names are shown on the dashboard, in exports and the HR picker;
+# deleting one also clears it from its employees without user signals
+@receiver(post_save, sender=Department, dispatch_uid='admin_panel.department_saved')
+def department_saved(sender, instance, created, **kwargs):
+    if not created:
+        bump_version()
+
+
+@receiver(post_delete, sender=Department, dispatch_uid='admin_panel.department_deleted')
+def department_deleted(sender, instance, **kwargs):
+    bump_version()
+
+
+# login analytics rollups follow every recorded attempt
+@receiver(post_save, sender=LoginAttempt, dispatch_uid='admin_panel.login_attempt_saved')
+def login_attempt_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        login_stats.record(instance)
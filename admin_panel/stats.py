@@ -0,0 +1,112 @@
+"""
+Cached admin dashboard statistics.
+
+The counts and salary total come from one conditional aggregate, and the
+result (with the department breakdown and recent joiners) is cached under a
+versioned key. Saving or deleting a user bumps the version (see signals.py),
+so in steady state a dashboard hit never touches the users table.
+
+Each bump also moves the 'users' DataVersion row. Unlike the cache (per
+process with the default LocMemCache) every process reads the same row, so
+export reuse (jobs.py) and the HR employee picker, which must agree across
+processes, key on data_version() instead. Attendance and audit log writes
+move their own DataVersion rows (bump_data_version), so an export's reuse
+fingerprint is a few single-row reads rather than an aggregate over the rows
+it exports.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+
+from .models import DataVersion
+
+VERSION_KEY = 'admin_dashboard:version'
+
+# DataVersion rows
+USERS_VERSION = 'users'
+ATTENDANCE_VERSION = 'attendance'
+AUDIT_LOG_VERSION = 'audit_log'
+
+# fields the dashboard, the employee exports and the HR employee picker show -
+# saves that only touch others (e.g. last_login) are ignored. The version also
+# keys export reuse (jobs.py) and the picker index (hr_module/picker.py).
+TRACKED_FIELDS = {
+    'role', 'is_active', 'salary', 'department', 'account_locked', 'employee_id',
+    'first_name', 'last_name', 'email', 'date_joined', 'phone', 'date_of_joining', 'username',
+}
+
+
+def _fresh_version():
+    # time based so a version lost from the cache can never match old entries
+    return int(time.time() * 1000)
+
+
+def get_version():
+    cache.add(VERSION_KEY, _fresh_version(), timeout=None)
+    return cache.get(VERSION_KEY)
+
+
+def bump_version():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, _fresh_version(), timeout=None)
+    bump_data_version(USERS_VERSION)
+
+
+def bump_data_version(name):
+    """Move the DataVersion counter `name` on, in the caller's transaction"""
+    rows = DataVersion.objects.filter(name=name)
+    if rows.update(version=F('version') + 1):
+        return
+    try:
+        with transaction.atomic():
+            DataVersion.objects.create(name=name, version=1)
+    except IntegrityError:
+        # created by a concurrent bump meanwhile
+        rows.update(version=F('version') + 1)
+
+
+def data_version(name=USERS_VERSION):
+    """A DataVersion counter as stored in the database, the same in every process"""
+    return DataVersion.objects.filter(name=name).values_list('version', flat=True).first() or 0
+
+
+def data_versions(*names):
+    """Several DataVersion counters in one query, as a tuple in the order given"""
+    versions = dict(DataVersion.objects.filter(name__in=names).values_list('name', 'version'))
+    return tuple(versions.get(name, 0) for name in names)
+
+
+def compute_stats():
+    User = get_user_model()
+    totals = User.objects.aggregate(
+        total_employees=Count('id', filter=Q(role='Employee')),
+        active_employees=Count('id', filter=Q(role='Employee', is_active=True)),
+        total_hr=Count('id', filter=Q(role='HR')),
+        total_salary=Sum('salary', filter=Q(role='Employee')),
+    )
+    totals['total_salary'] = totals['total_salary'] or 0
+    totals['departments'] = [
+        {'department': name, 'count': count}
+        for name, count in User.objects.filter(role='Employee').values_list('department__name').annotate(
+            count=Count('id')
+        ).order_by()
+    ]
+    totals['recent_employees'] = list(
+        User.objects.filter(role__in=['Employee', 'HR']).select_related('department').order_by('-date_joined')[:5]
+    )
+    return totals
+
+
+def get_dashboard_stats():
+    key = f'admin_dashboard:stats:{get_version()}'
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute_stats()
+        cache.set(key, stats, timeout=getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 3600))
+    return stats
@@ -1,3 +1,1059 @@
-from django.test import TestCase
+import io
+import tempfile
+import unittest
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from smtplib import SMTPException
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from ems.testing import QueryPlanAssertions
+from hr_module.models import Attendance
+from users import departments
+from users.models import Department
+
+from . import archive, audit, importer, login_stats, retention
+from .audit import (
+    ACTIONS_CACHE_KEY, action_choices, action_code, flush_audit_log, flush_on_request_finished, log_audit,
+)
+from .filters import filter_audit_logs, filter_employees
+from .forms import EmployeeEditForm
+from .identifiers import allocate, make_username
+from .importer import import_employees
+from .jobs import request_export, run_pending
+from .models import AuditLog, ExportJob, LoginAttempt, LoginFailureStreak, LoginRollup, NotificationLog
+from .outbox import claim, delivery_progress, drain, queue_broadcast, queue_email, retry_delay, send_queued
+from .ratelimit import SlidingWindowLimiter, username_limiter
+from .stats import VERSION_KEY, bump_version, data_version, get_dashboard_stats, get_version
+
+User = get_user_model()
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN output is SQLite specific')
+class QueryPlanTests(QueryPlanAssertions, TestCase):
+    """Hot admin panel queries must not fall back to a full table scan"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = User.objects.bulk_create([
+            User(username=f'user{i}', email=f'user{i}@example.com', role='Employee')
+            for i in range(10)
+        ])
+        LoginAttempt.objects.bulk_create([
+            LoginAttempt(user=user, email=user.email, ip_address='10.0.0.1', success=n % 4 != 0)
+            for user in cls.users for n in range(20)
+        ])
+        AuditLog.objects.bulk_create([
+            AuditLog(user=cls.users[n % 10], action='Login', details='', ip_address='10.0.0.1')
+            for n in range(200)
+        ])
+
+    def test_login_history(self):
+        # employee_detail login history
+        qs = LoginAttempt.objects.filter(user=self.users[0]).order_by('-timestamp')[:50]
+        self.assertIndexed(qs, 'admin_panel_loginattempt')
+
+    def test_recent_audit_logs(self):
+        qs = AuditLog.objects.order_by('-timestamp')[:100]
+        self.assertIndexed(qs, 'admin_panel_auditlog')
+
+    def test_audit_log_browser_pages(self):
+        # every filter walks its (column, timestamp, id) index in page order - no sort of the matches
+        for params in ({}, {'action': 'login'}, {'actor': 'user3'}, {'ip': '10.0.0.1'},
+                       {'start_date': '2024-01-01', 'end_date': '2024-01-31T12:00'}):
+            with self.subTest(params=params):
+                qs = filter_audit_logs(params)[0].order_by('-timestamp', '-id')[:51]
+                self.assertIndexed(qs, 'admin_panel_auditlog')
+                self.assertNotSorted(qs)
+
+    def test_login_analytics_report(self):
+        # the report reads a window of rollups and the open streaks, never LoginAttempt
+        since = timezone.now() - timedelta(days=7)
+        failures = LoginRollup.objects.filter(success=False, hour__gt=since)
+        self.assertIndexed(failures.values('ip_address').annotate(total=Sum('count')), 'admin_panel_loginrollup')
+        self.assertIndexed(LoginRollup.objects.filter(hour__gt=since), 'admin_panel_loginrollup')
+        streaks = LoginFailureStreak.objects.filter(current__gt=0).order_by('-current', '-id')[:10]
+        self.assertIndexed(streaks, 'admin_panel_loginfailurestreak')
+        self.assertNotSorted(streaks)
+
+    def test_employee_directory_page(self):
+        # employee_list keyset pagination over each filter
+        department = Department.objects.create(name='IT')
+        for params in ({}, {'role': 'HR'}, {'department': str(department.pk)}, {'status': 'active'}):
+            with self.subTest(params=params):
+                qs = filter_employees(params)[0].order_by('-date_joined', '-id')[:51]
+                self.assertIndexed(qs, 'users_customuser')
+
+
+@override_settings(AUDIT_LOG_BUFFER_SIZE=1)
+class IdentifierTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(username='admin', email='admin@example.com', role='Admin')
+        for username in ('ann.lee', 'ann.lee2', 'ann.leex'):
+            User.objects.create(username=username, email=f'{username}@example.com')
+
+    def test_allocate_continues_after_the_highest_suffix(self):
+        self.assertEqual(allocate('username', 'ann.lee', count=2), ['ann.lee3', 'ann.lee4'])
+        self.assertEqual(allocate('username', 'bob.ray'), ['bob.ray'])
+
+    def test_create_employee_retries_a_taken_username(self):
+        # another admin took the allocated name between the lookup and the insert
+        allocated = ['ann.lee2']
+        with mock.patch('admin_panel.views.make_username',
+                        side_effect=lambda *args: allocated.pop() if allocated else make_username(*args)) as patched:
+            self.client.force_login(self.admin)
+            response = self.client.post(reverse('admin_panel:create_employee'), {
+                'email': 'ann@example.com', 'first_name': 'Ann', 'last_name': 'Lee', 'phone': '555',
+                'role': 'Employee', 'department': 'IT', 'salary': '1000', 'date_of_joining': '2024-03-01',
+            })
+        self.assertRedirects(response, reverse('admin_panel:employee_list'), fetch_redirect_response=False)
+        self.assertEqual(patched.call_count, 2)
+        self.assertEqual(User.objects.get(email='ann@example.com').username, 'ann.lee3')
+
+
+@override_settings(AUDIT_LOG_BUFFER_SIZE=1, PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class EmployeeImportTests(TestCase):
+    HEADER = 'first_name,last_name,email,phone,role,department,salary,date_of_joining\n'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(username='admin', email='admin@example.com', role='Admin')
+        Department.objects.create(name='IT')
+
+    def csv(self, *emails):
+        return io.StringIO(self.HEADER + ''.join(
+            f'Ann,Lee,{email},555,Employee,IT,1000,2024-03-01\n' for email in emails
+        ))
+
+    def test_bad_rows_are_reported_by_line(self):
+        result = import_employees(self.csv('a@example.com', 'admin@example.com', 'not-an-email', 'A@example.com',
+                                           'b@example.com'), workers=1)
+        self.assertEqual(result.created, 2)
+        self.assertEqual([line_no for line_no, _ in result.errors], [3, 4, 5])
+        self.assertEqual(
+            list(User.objects.filter(role='Employee').order_by('username').values_list('username', 'email')),
+            [('ann.lee', 'a@example.com'), ('ann.lee1', 'b@example.com')],
+        )
+        self.assertEqual(NotificationLog.objects.filter(status='Queued').count(), 2)
+
+    def test_email_taken_during_the_import_rejects_the_row(self):
+        assign = importer._assign_identifiers
+
+        def concurrent_create(users):
+            # another admin creates one of the employees between the check and the insert
+            if not User.objects.filter(email='b@example.com').exists():
+                User.objects.create(username='other', email='b@example.com')
+            assign(users)
+
+        with mock.patch('admin_panel.importer._assign_identifiers', side_effect=concurrent_create):
+            result = import_employees(self.csv('a@example.com', 'b@example.com'), workers=1)
+        self.assertEqual(result.created, 1)
+        self.assertEqual(result.errors, [(3, 'email: User with this Email already exists (b@example.com).')])
+
+    @override_settings(EMPLOYEE_IMPORT_WORKERS=1)
+    def test_upload_is_imported_by_the_job_worker(self):
+        self.enterContext(override_settings(MEDIA_ROOT=self.enterContext(tempfile.TemporaryDirectory())))
+        self.client.force_login(self.admin)
+        upload = SimpleUploadedFile('staff.csv', self.csv('a@example.com', 'admin@example.com').getvalue().encode())
+        with mock.patch('admin_panel.importer.make_password') as hasher:
+            response = self.client.post(reverse('admin_panel:import_employees'), {'csv_file': upload})
+        # nothing is hashed or created in the request
+        hasher.assert_not_called()
+        job = ExportJob.objects.get(kind='employee_import')
+        self.assertRedirects(response, reverse('admin_panel:export_job', args=[job.pk]))
+        self.assertFalse(User.objects.filter(email='a@example.com').exists())
+
+        self.assertEqual(run_pending(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.rows_done, job.rows_total, job.progress), ('Completed', 2, 2, 100))
+        self.assertEqual((job.result['created'], job.result['rejected']), (1, 1))
+        self.assertEqual(job.result['errors'][0][0], 3)
+        self.assertTrue(User.objects.get(email='a@example.com').must_change_password)
+        self.assertEqual(AuditLog.objects.get(action='Bulk Import Employees').user, self.admin)
+        # the upload is gone, the rejected rows can be downloaded
+        self.assertFalse(job.file.storage.exists(job.params['upload']))
+        response = self.client.get(reverse('admin_panel:download_export', args=[job.pk]))
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'Line,Error')
+        self.assertTrue(lines[1].startswith('3,email:'))
+        self.assertContains(self.client.get(reverse('admin_panel:export_job', args=[job.pk])), '1</strong> employees created')
+
+    def test_unreadable_upload_fails_the_job(self):
+        self.enterContext(override_settings(MEDIA_ROOT=self.enterContext(tempfile.TemporaryDirectory())))
+        self.client.force_login(self.admin)
+        upload = SimpleUploadedFile('staff.csv', b'\xff\xfe\x00bad')
+        self.client.post(reverse('admin_panel:import_employees'), {'csv_file': upload})
+        run_pending()
+        job = ExportJob.objects.get(kind='employee_import')
+        self.assertEqual(job.status, 'Failed')
+        self.assertIn('Could not read the CSV file', job.error)
+
+
+class FailingEmailBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        raise SMTPException('mailbox unavailable')
+
+
+class OutboxTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [User.objects.create(username=f'user{i}', email=f'user{i}@example.com') for i in range(3)]
+
+    def setUp(self):
+        for user in self.users:
+            queue_email(user, 'Test', 'Hello', 'Secret body')
+
+    def test_queued_emails_are_sent(self):
+        self.assertEqual(send_queued(), (3, 0))
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), [user.email for user in self.users])
+        self.assertEqual(set(NotificationLog.objects.values_list('status', 'body', 'claimed_by')), {('Sent', '', '')})
+
+    def test_rows_claimed_by_another_worker_are_skipped(self):
+        claimed = claim(2)
+        self.assertEqual(len(claimed), 2)
+        self.assertEqual(send_queued(), (1, 0))
+        self.assertEqual(mail.outbox[0].to, [self.users[2].email])
+        self.assertEqual(NotificationLog.objects.filter(status='Sending').count(), 2)
+        # until the other worker's claim runs out
+        later = timezone.now() + timedelta(seconds=settings.EMAIL_SENDING_TIMEOUT + 1)
+        self.assertEqual([n.id for n in claim(10, now=later)], [n.id for n in claimed])
+
+    @override_settings(EMAIL_BACKEND='admin_panel.tests.FailingEmailBackend', EMAIL_RETRY_DELAY=60)
+    def test_failed_emails_back_off(self):
+        started = timezone.now()
+        # one attempt per drain - the retries wait for their next_attempt_at
+        self.assertEqual(drain(max_attempts=3)[:2], (0, 3))
+        row = NotificationLog.objects.order_by('id').first()
+        self.assertEqual((row.status, row.attempts, row.last_error), ('Queued', 1, 'mailbox unavailable'))
+        self.assertGreaterEqual(row.next_attempt_at, started + timedelta(seconds=60))
+        self.assertEqual(claim(10), [])
+
+        self.assertEqual(retry_delay(2), 120)
+        for _ in range(2):
+            NotificationLog.objects.update(next_attempt_at=timezone.now())
+            self.assertEqual(send_queued(max_attempts=3), (0, 3))
+        self.assertEqual(set(NotificationLog.objects.values_list('status', 'attempts')), {('Failed', 3)})
+
+    def test_claim_is_released_when_the_server_is_down(self):
+        connection = mock.Mock(**{'open.side_effect': OSError('connection refused')})
+        with self.assertRaises(OSError):
+            send_queued(connection=connection)
+        self.assertEqual(set(NotificationLog.objects.values_list('status', 'claimed_by', 'attempts')), {('Queued', '', 0)})
+
+    def test_rows_of_a_dead_worker_run_out_of_attempts(self):
+        now = timezone.now()
+        for attempt in range(1, 4):
+            # claimed, then the worker dies while sending
+            self.assertEqual(len(claim(10, now=now, max_attempts=3)), 3)
+            self.assertEqual(set(NotificationLog.objects.values_list('attempts', flat=True)), {attempt})
+            now += timedelta(seconds=settings.EMAIL_SENDING_TIMEOUT + 1)
+        self.assertEqual(claim(10, now=now, max_attempts=3), [])
+        self.assertEqual(set(NotificationLog.objects.values_list('status', 'attempts')), {('Failed', 3)})
+
+
+@override_settings(AUDIT_LOG_BUFFER_SIZE=1)
+class BroadcastTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(username='admin', email='admin@example.com', role='Admin')
+        it = Department.objects.create(name='IT')
+        for i, (role, department) in enumerate([('Employee', it), ('HR', it), ('Employee', None)]):
+            User.objects.create(username=f'user{i}', email=f'user{i}@example.com', role=role, department=department)
+
+    def test_broadcast_is_queued_for_the_worker(self):
+        self.client.force_login(self.admin)
+        url = reverse('admin_panel:broadcast_notification')
+        response = self.client.post(url, {'department': Department.objects.get().pk, 'subject': 'Hi', 'message': 'Hello'})
+        broadcast_id, = set(NotificationLog.objects.values_list('broadcast_id', flat=True))
+        self.assertRedirects(response, f'{url}?broadcast={broadcast_id}')
+        # nothing is sent in the request, and the worker sends each email once
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(drain()[:2], (2, 0))
+        self.assertEqual(drain()[:2], (0, 0))
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), ['user0@example.com', 'user1@example.com'])
+
+        response = self.client.get(response.url)
+        self.assertEqual(response.context['progress'], {'Queued': 0, 'Sending': 0, 'Sent': 2, 'Failed': 0})
+
+    def test_progress_counts_only_its_own_broadcast(self):
+        users = list(User.objects.filter(role__in=['Employee', 'HR']).order_by('id'))
+        first = queue_broadcast(users[:2], 'Broadcast', 'One', 'Body')
+        second = queue_broadcast(users, 'Broadcast', 'Two', 'Body')
+        # the first broadcast's rows are sent, the second's still queued
+        NotificationLog.objects.filter(subject='One').update(status='Sent')
+        self.assertEqual(delivery_progress(first)[0], {'Queued': 0, 'Sending': 0, 'Sent': 2, 'Failed': 0})
+        self.assertEqual(delivery_progress(second)[0], {'Queued': 3, 'Sending': 0, 'Sent': 0, 'Failed': 0})
+
+
+class DashboardStatsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.it = Department.objects.create(name='IT')
+        cls.emp = User.objects.create(username='emp', email='emp@example.com', role='Employee',
+                                      department=cls.it, salary=1000)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_stats_are_served_from_the_cache(self):
+        self.assertEqual(get_dashboard_stats()['total_employees'], 1)
+        with self.assertNumQueries(0):
+            get_dashboard_stats()
+
+    def test_user_changes_invalidate_the_stats(self):
+        get_dashboard_stats()
+        User.objects.create(username='new', email='new@example.com', role='Employee', salary=500)
+        stats = get_dashboard_stats()
+        self.assertEqual((stats['total_employees'], stats['total_salary']), (2, 1500))
+
+        self.emp.is_active = False
+        self.emp.save(update_fields=['is_active'])
+        self.assertEqual(get_dashboard_stats()['active_employees'], 1)
+
+        self.emp.delete()
+        self.assertEqual(get_dashboard_stats()['total_employees'], 1)
+
+    def test_untracked_saves_keep_the_stats(self):
+        version = get_version()
+        self.emp.last_login = timezone.now()
+        self.emp.save(update_fields=['last_login'])
+        self.assertEqual(get_version(), version)
+
+    def test_department_rename_invalidates_the_stats(self):
+        get_dashboard_stats()
+        self.it.name = 'Engineering'
+        self.it.save()
+        self.assertEqual(get_dashboard_stats()['departments'], [{'department': 'Engineering', 'count': 1}])
+
+    def test_a_lost_version_never_reuses_old_entries(self):
+        with mock.patch('admin_panel.stats.time.time', return_value=1000.0):
+            get_version()
+            bump_version()
+            bumped = get_version()
+        cache.delete(VERSION_KEY)
+        with mock.patch('admin_panel.stats.time.time', return_value=1001.0):
+            self.assertGreater(get_version(), bumped)
+
+
+class SlidingWindowLimiterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.limiter = SlidingWindowLimiter('test', limit=3, window=100)
+        clock = mock.patch('admin_panel.ratelimit.time.time', return_value=1000.0)
+        self.clock = clock.start()
+        self.addCleanup(clock.stop)
+
+    def test_limit_is_reached_within_the_window(self):
+        self.assertEqual([self.limiter.hit('ann') for _ in range(3)], [1, 2, 3])
+        self.assertTrue(self.limiter.is_limited('ann'))
+        self.assertFalse(self.limiter.is_limited('bob'))
+        self.assertEqual(self.limiter.remaining(self.limiter.count('ann')), 0)
+
+    def test_previous_bucket_fades_out(self):
+        for _ in range(3):
+            self.limiter.hit('ann')
+        # half way through the next bucket half of the previous one still counts
+        self.clock.return_value = 1150.0
+        self.assertEqual(self.limiter.count('ann'), 1.5)
+        self.assertFalse(self.limiter.is_limited('ann'))
+        self.assertEqual(self.limiter.hit('ann'), 2.5)
+        self.assertEqual(self.limiter.remaining(2.5), 0)
+        # two buckets later the first hits are gone
+        self.clock.return_value = 1300.0
+        self.assertEqual(self.limiter.count('ann'), 0)
+
+    def test_reset(self):
+        for _ in range(3):
+            self.limiter.hit('ann')
+        self.limiter.reset('ann')
+        self.assertEqual(self.limiter.count('ann'), 0)
+
+
+@override_settings(AUDIT_LOG_BUFFER_SIZE=1)
+class EmployeeExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(username='admin', email='admin@example.com', role='Admin')
+        cls.it = Department.objects.create(name='IT')
+        sales = Department.objects.create(name='Sales')
+        for i, (role, department, active) in enumerate([
+            ('Employee', cls.it, True), ('Employee', cls.it, False), ('Employee', sales, True), ('HR', cls.it, True),
+        ]):
+            User.objects.create(
+                username=f'user{i}', email=f'user{i}@example.com', first_name='User', last_name=str(i),
+                employee_id=f'EMP{i:03d}', role=role, department=department, is_active=active,
+            )
+
+    def export(self, **params):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('admin_panel:export_employees_csv'), params)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        return [line.split(',')[0] for line in lines[1:]]
+
+    def test_applies_the_employee_list_filters(self):
+        self.assertEqual(self.export(), ['EMP000', 'EMP001', 'EMP002', 'EMP003'])
+        self.assertEqual(self.export(role='Employee', department=self.it.pk), ['EMP000', 'EMP001'])
+        self.assertEqual(self.export(status='active', department=self.it.pk), ['EMP000', 'EMP003'])
+        self.assertEqual(self.export(search='emp002'), ['EMP002'])
+
+    def test_audit_entry_counts_the_streamed_rows(self):
+        self.export(department=self.it.pk)
+        self.assertEqual(
+            AuditLog.objects.get(action='Export Employees').details, 'Exported 3 employees (department=IT)'
+        )
+
+
+@override_settings(AUDIT_LOG_BUFFER_SIZE=1)
+class DirectorySearchTests(QueryPlanAssertions, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Department.objects.create(name='IT')
+        cls.ann = User.objects.create(username='ann.lee', email='ann.lee@example.com', first_name='Ann',
+                                      last_name='Lee', employee_id='EMP001', role='Employee')
+        User.objects.create(username='bob', email='bob@example.com', first_name='Bob', last_name='Leeds',
+                            employee_id='EMP002', role='HR')
+
+    def search(self, query):
+        return sorted(filter_employees({'search': query})[0].values_list('username', flat=True))
+
+    def test_every_word_matches_the_start_of_a_word(self):
+        self.assertEqual(self.search('lee'), ['ann.lee', 'bob'])
+        self.assertEqual(self.search('ann lee'), ['ann.lee'])
+        self.assertEqual(self.search('Bob@exa'), ['bob'])
+        self.assertEqual(self.search('emp00'), ['ann.lee', 'bob'])
+        self.assertEqual(self.search('nn'), [])
+
+    def test_index_follows_saves_deletes_and_imports(self):
+        self.ann.last_name = 'Smith'
+        self.ann.save()
+        self.assertEqual(self.search('smith'), ['ann.lee'])
+        self.assertEqual(self.search('ann lee'), ['ann.lee'])  # still in the email
+        self.ann.delete()
+        self.assertEqual(self.search('ann'), [])
+
+        import_employees(io.StringIO(
+            EmployeeImportTests.HEADER + 'Cara,Jones,cara@example.com,555,Employee,IT,1000,2024-03-01\n'
+        ), workers=1)
+        self.assertEqual(self.search('jones'), ['cara.jones'])
+
+    @unittest.skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN output is SQLite specific')
+    def test_search_reads_the_index(self):
+        qs = filter_employees({'search': 'ann'})[0]
+        self.assertIn('users_customuser_search VIRTUAL TABLE', qs.explain())
+        self.assertIndexed(qs, 'users_customuser')
+
+
+@override_settings(AUDIT_LOG_BUFFER_SIZE=1)
+class ExportJobTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(username='admin', email='admin@example.com', role='Admin')
+        cls.hr = User.objects.create(username='hr', email='hr@example.com', role='HR')
+        cls.it = Department.objects.create(name='IT')
+        cls.sales = Department.objects.create(name='Sales')
+        User.objects.bulk_create([
+            User(username=f'user{i}', email=f'user{i}@example.com', employee_id=f'EMP{i:03d}',
+                 role='Employee', department=[cls.it, cls.sales][i % 2])
+            for i in range(10)
+        ])
+
+    def setUp(self):
+        media_root = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+
+    def test_job_runs_and_is_downloadable(self):
+        self.client.force_login(self.admin)
+        response = self.client.post(reverse('admin_panel:start_export', args=['employees']), {'department': self.it.pk})
+        job = ExportJob.objects.get()
+        self.assertRedirects(response, reverse('admin_panel:export_job', args=[job.pk]))
+        self.assertEqual(self.client.get(reverse('admin_panel:export_progress', args=[job.pk])).json()['status'], 'Pending')
+
+        self.assertEqual(run_pending(), 1)
+        progress = self.client.get(reverse('admin_panel:export_progress', args=[job.pk])).json()
+        self.assertEqual((progress['status'], progress['rows_done'], progress['progress']), ('Completed', 5, 100))
+
+        response = self.client.get(reverse('admin_panel:download_export', args=[job.pk]))
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 6)
+
+    def test_finished_file_is_reused_until_the_data_changes(self):
+        job, reused = request_export('employees', {'department': str(self.it.pk)}, self.admin)
+        self.assertFalse(reused)
+        # in progress and finished jobs are both handed out again
+        self.assertEqual(request_export('employees', {'department': str(self.it.pk)}, self.admin), (job, True))
+        run_pending()
+        self.assertEqual(request_export('employees', {'department': str(self.it.pk)}, self.admin), (job, True))
+        self.assertFalse(request_export('employees', {'department': str(self.sales.pk)}, self.admin)[1])
+
+        user = User.objects.get(username='user0')
+        user.phone = '555 0100'
+        user.save()
+        self.assertFalse(request_export('employees', {'department': str(self.it.pk)}, self.admin)[1])
+
+    def test_processes_agree_on_the_data_version(self):
+        job, _ = request_export('employees', {}, self.admin)
+        # another process: its own (empty) cache, the same database
+        cache.clear()
+        self.assertEqual(request_export('employees', {}, self.admin), (job, True))
+
+        version = data_version()
+        User.objects.filter(username='user1').get().save()
+        cache.clear()
+        self.assertEqual(data_version(), version + 1)
+        self.assertFalse(request_export('employees', {}, self.admin)[1])
+
+    def test_versions_come_from_counters_not_the_exported_rows(self):
+        params = {'start_date': '2024-03-01', 'end_date': '2024-03-31'}
+        job, _ = request_export('attendance', params, self.hr)
+        audit_job, _ = request_export('audit_logs', {}, self.admin)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(request_export('attendance', params, self.hr), (job, True))
+            self.assertEqual(request_export('audit_logs', {}, self.admin), (audit_job, True))
+        tables = ' '.join(query['sql'] for query in queries)
+        self.assertNotIn('hr_module_attendance', tables)
+        self.assertNotIn('admin_panel_auditlog', tables)
+
+        Attendance.objects.create(user=User.objects.get(username='user0'), date=date(2024, 3, 4), status='Present')
+        self.assertFalse(request_export('attendance', params, self.hr)[1])
+        log_audit(self.admin, 'Export checked')
+        self.assertFalse(request_export('audit_logs', {}, self.admin)[1])
+
+    def test_worker_fails_jobs_left_running(self):
+        job, _ = request_export('employees', {}, self.admin)
+        # claimed by a worker that died
+        ExportJob.objects.filter(pk=job.pk).update(status='Running', started_at=timezone.now() - timedelta(hours=2))
+        self.assertEqual(run_pending(), 0)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'Failed')
+
+        fresh, reused = request_export('employees', {}, self.admin)
+        self.assertFalse(reused)
+        self.assertEqual(run_pending(), 1)
+        fresh.refresh_from_db()
+        self.assertEqual(fresh.status, 'Completed')
+
+    def test_other_roles_cannot_read_the_job(self):
+        job, _ = request_export('employees', {}, self.admin)
+        run_pending()
+        self.client.force_login(self.hr)
+        self.assertEqual(self.client.get(reverse('admin_panel:export_progress', args=[job.pk])).status_code, 403)
+        self.assertRedirects(
+            self.client.get(reverse('admin_panel:download_export', args=[job.pk])), reverse('login'),
+            fetch_redirect_response=False,
+        )
+
+
+@override_settings(AUDIT_LOG_BUFFER_SIZE=1)
+class DepartmentTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.it = Department.objects.create(name='IT')
+        cls.emp = User.objects.create(username='emp', email='emp@example.com', role='Employee', department=cls.it)
+
+    def test_list_is_cached_until_a_department_changes(self):
+        departments.get_departments()
+        with self.assertNumQueries(0):
+            self.assertEqual(departments.get_departments(), [(self.it.pk, 'IT')])
+            self.assertEqual(self.emp.department_name, 'IT')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            sales = Department.objects.create(name='Sales')
+        self.assertEqual(departments.get_departments(), [(self.it.pk, 'IT'), (sales.pk, 'Sales')])
+
+    def test_version_moves_only_once_the_change_commits(self):
+        version = departments.get_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                Department.objects.create(name='Sales')
+                # other processes would still read the old list
+                self.assertEqual(departments.get_version(), version)
+        self.assertNotEqual(departments.get_version(), version)
+
+    def test_names_match_ignoring_case_and_spacing(self):
+        self.assertEqual(departments.get_or_create_department('  it ').pk, self.it.pk)
+        created = departments.get_or_create_department('Human   Resources')
+        self.assertEqual(created.name, 'Human Resources')
+        self.assertEqual(departments.get_or_create_department('human resources').pk, created.pk)
+        self.assertIsNone(departments.get_or_create_department(' '))
+
+    def test_edit_form_shows_and_resolves_names(self):
+        self.assertIn('value="IT"', str(EmployeeEditForm(instance=self.emp)['department']))
+        form = EmployeeEditForm(
+            {'first_name': 'E', 'email': 'emp@example.com', 'department': 'it', 'is_active': True}, instance=self.emp
+        )
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.save().department_id, self.it.pk)
+
+    def test_only_saved_forms_and_imported_rows_create_departments(self):
+        form = EmployeeEditForm({'first_name': 'E', 'email': 'not-an-email', 'department': 'Legal'}, instance=self.emp)
+        self.assertFalse(form.is_valid())
+        import_employees(io.StringIO(
+            EmployeeImportTests.HEADER + 'Ann,Lee,emp@example.com,555,Employee,Legal,1000,2024-03-01\n'
+        ), workers=1)
+        self.assertFalse(Department.objects.filter(name='Legal').exists())
+
+        import_employees(io.StringIO(
+            EmployeeImportTests.HEADER + 'Ann,Lee,ann@example.com,555,Employee, legal ,1000,2024-03-01\n'
+        ), workers=1)
+        self.assertEqual(User.objects.get(email='ann@example.com').department.name, 'legal')
+
+
+class DepartmentMigrationTests(TransactionTestCase):
+    # the attendance summary is still labelled with the free text then
+    before = [('users', '0003_customuser_search_text'), ('hr_module', '0004_dailyattendancesummary')]
+    after = [('users', '0004_department'), ('hr_module', '0004_dailyattendancesummary')]
+
+    def setUp(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.before)
+        self.old_apps = executor.loader.project_state(self.before).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_free_text_departments_are_normalized(self):
+        OldUser = self.old_apps.get_model('users', 'CustomUser')
+        for i, department in enumerate(['IT', 'IT', ' it', 'Human  Resources', '', None]):
+            OldUser.objects.create(username=f'user{i}', email=f'user{i}@example.com', department=department)
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.after)
+        apps = executor.loader.project_state(self.after).apps
+
+        NewUser = apps.get_model('users', 'CustomUser')
+        self.assertEqual(
+            list(NewUser.objects.order_by('username').values_list('department__name', flat=True)),
+            ['IT', 'IT', 'IT', 'Human Resources', None, None],
+        )
+        self.assertEqual(apps.get_model('users', 'Department').objects.count(), 2)
+
+    def test_attendance_summary_is_relabelled(self):
+        OldUser = self.old_apps.get_model('users', 'CustomUser')
+        OldSummary = self.old_apps.get_model('hr_module', 'DailyAttendanceSummary')
+        for i, department in enumerate(['IT', ' it', '  ']):
+            OldUser.objects.create(username=f'user{i}', email=f'user{i}@example.com', department=department)
+        day = date(2024, 3, 1)
+        OldSummary.objects.bulk_create([
+            OldSummary(date=day, department=department, status='Present', count=count)
+            for department, count in [('IT', 3), (' it', 2), ('IT ', 1), ('  ', 4), ('', 5)]
+        ])
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.after)
+        apps = executor.loader.project_state(self.after).apps
+
+        Summary = apps.get_model('hr_module', 'DailyAttendanceSummary')
+        self.assertEqual(sorted(Summary.objects.values_list('department', 'count')), [('', 9), ('IT', 6)])
+
+
+@override_settings(AUDIT_LOG_BUFFER_SIZE=3, AUDIT_LOG_FLUSH_INTERVAL=5)
+class AuditBufferTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(username='admin', email='admin@example.com', role='Admin')
+
+    def setUp(self):
+        flush_audit_log()
+        self.addCleanup(flush_audit_log)
+
+    def test_flushes_when_full(self):
+        log_audit(self.admin, 'One')
+        log_audit(self.admin, 'Two')
+        self.assertEqual(AuditLog.objects.count(), 0)
+        log_audit(self.admin, 'Three')
+        self.assertEqual(list(AuditLog.objects.order_by('id').values_list('action', flat=True)), ['One', 'Two', 'Three'])
+
+    def test_flushes_after_the_interval_at_the_end_of_a_logging_request(self):
+        with mock.patch('admin_panel.audit.time.monotonic', return_value=100.0) as clock:
+            log_audit(self.admin, 'One')
+            flush_on_request_finished(None)
+            self.assertEqual(AuditLog.objects.count(), 0)
+
+            clock.return_value = 105.0
+            # a request that queued nothing leaves the flush to one that did
+            audit._local.queued = False
+            flush_on_request_finished(None)
+            self.assertEqual(AuditLog.objects.count(), 0)
+
+            log_audit(self.admin, 'Two')
+            flush_on_request_finished(None)
+            self.assertEqual(AuditLog.objects.count(), 2)
+
+    def test_entries_keep_the_time_they_were_queued(self):
+        log_audit(self.admin, 'One')
+        queued = timezone.now()
+        flush_audit_log()
+        self.assertLessEqual(AuditLog.objects.get().timestamp, queued)
+
+
+@override_settings(AUDIT_LOG_BUFFER_SIZE=10)
+class AuditBufferFallbackTests(TransactionTestCase):
+    def test_entries_of_deleted_users_are_kept(self):
+        admin = User.objects.create(username='admin', email='admin@example.com', role='Admin')
+        gone = User.objects.create(username='gone', email='gone@example.com')
+        log_audit(admin, 'Kept')
+        log_audit(gone, 'Orphaned')
+        gone.delete()
+        # the batch fails on the foreign key, the rows are saved one by one
+        self.assertEqual(flush_audit_log(), 2)
+        self.assertEqual(
+            list(AuditLog.objects.order_by('id').values_list('action', 'user_id')),
+            [('Kept', admin.id), ('Orphaned', None)],
+        )
+
+    @override_settings(AUDIT_LOG_FLUSH_INTERVAL=0.05)
+    def test_a_lone_entry_is_flushed_once_the_interval_is_up(self):
+        admin = User.objects.create(username='admin', email='admin@example.com', role='Admin')
+        log_audit(admin, 'Quiet')
+        timer = audit._buffer._timer
+        self.assertIsNotNone(timer)
+        # no later request comes along to flush it
+        timer.join(5)
+        self.assertEqual(list(AuditLog.objects.values_list('action', flat=True)), ['Quiet'])
+        self.assertEqual(len(audit._buffer), 0)
+
+
+class AuditLogBrowserTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(username='admin', email='admin@example.com', role='Admin')
+        cls.emp = User.objects.create(username='emp', email='emp@example.com', employee_id='EMP001')
+        AuditLog.objects.bulk_create([
+            AuditLog(user=[cls.admin, cls.emp][n % 2], action=action, action_code=action_code(action),
+                     ip_address=f'10.0.0.{n % 3}')
+            for n, action in enumerate(['User Login', 'Employee Created', 'User Login'] * 40)
+        ])
+        # one entry a minute from 2024-03-01 10:00, in creation order
+        start = timezone.make_aware(datetime(2024, 3, 1, 10, 0))
+        for n, pk in enumerate(AuditLog.objects.order_by('id').values_list('id', flat=True)):
+            AuditLog.objects.filter(pk=pk).update(timestamp=start + timedelta(minutes=n, seconds=30))
+
+    def setUp(self):
+        cache.delete(ACTIONS_CACHE_KEY)
+
+    def count(self, **params):
+        return filter_audit_logs(params)[0].count()
+
+    def test_log_audit_sets_the_action_code(self):
+        log_audit(self.admin, 'Employee activated')
+        flush_audit_log()
+        self.assertEqual(AuditLog.objects.latest('id').action_code, 'employee_activated')
+
+    def test_filters(self):
+        self.assertEqual(self.count(action='user_login'), 80)
+        self.assertEqual(self.count(action='User Login'), 80)
+        self.assertEqual(self.count(actor='EMP001'), 60)
+        self.assertEqual(self.count(actor='emp', action='employee_created'), 20)
+        self.assertEqual(self.count(actor='nobody'), 0)
+        self.assertEqual(self.count(ip='10.0.0.1'), 40)
+        self.assertEqual(self.count(ip='10.0.0'), 0)
+        # minute precision, the end minute included
+        self.assertEqual(self.count(start_date='2024-03-01T10:05', end_date='2024-03-01T10:09'), 5)
+        self.assertEqual(self.count(start_date='2024-03-01', end_date='2024-03-01'), 120)
+
+    def test_pages_walk_newest_first(self):
+        self.client.force_login(self.admin)
+        url = reverse('admin_panel:audit_logs')
+        params = {'action': 'user_login'}
+        seen = []
+        while True:
+            page = self.client.get(url, params).context['page']
+            seen += [log.pk for log in page]
+            if not page.has_next:
+                break
+            params['after'] = page.next_cursor
+        self.assertEqual(seen, list(
+            AuditLog.objects.filter(action_code='user_login').order_by('-timestamp', '-id').values_list('id', flat=True)
+        ))
+
+    def test_action_filter_lists_new_actions(self):
+        self.assertEqual(action_choices(), [('employee_created', 'Employee Created'), ('user_login', 'User Login')])
+        log_audit(self.admin, 'Bulk Unlock')
+        flush_audit_log()
+        self.assertIn(('bulk_unlock', 'Bulk Unlock'), action_choices())
+
+
+class LogRetentionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(username='admin', email='admin@example.com', role='Admin')
+        cls.emp = User.objects.create(username='emp', email='emp@example.com', role='Employee')
+        AuditLog.objects.bulk_create([
+            AuditLog(user=[cls.admin, cls.emp][n % 2], action='User Login', action_code='user_login',
+                     details=f'entry {n}', ip_address='10.0.0.1')
+            for n in range(120)
+        ])
+        LoginAttempt.objects.bulk_create([
+            LoginAttempt(user=cls.emp, email=cls.emp.email, ip_address='10.0.0.2', success=n % 3 != 0)
+            for n in range(120)
+        ])
+        # one row a day from 2024-01-01 10:00, in creation order
+        start = timezone.make_aware(datetime(2024, 1, 1, 10, 0))
+        for model in (AuditLog, LoginAttempt):
+            for n, pk in enumerate(model.objects.order_by('id').values_list('id', flat=True)):
+                model.objects.filter(pk=pk).update(timestamp=start + timedelta(days=n, microseconds=n))
+        cls.now = timezone.make_aware(datetime(2024, 5, 1))
+
+    def setUp(self):
+        self.root = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(
+            LOG_ARCHIVE_ROOT=self.root, AUDIT_LOG_HOT_DAYS=30, LOGIN_ATTEMPT_HOT_DAYS=30,
+            NOTIFICATION_LOG_HOT_DAYS=30,
+        ))
+
+    def run_policy(self, name, **kwargs):
+        return retention.archive_expired(retention.POLICIES[name], now=self.now, chunk_size=20, **kwargs)
+
+    def test_rows_move_to_monthly_archives(self):
+        before = {log.pk: log for log in AuditLog.objects.filter(timestamp__lt=timezone.make_aware(datetime(2024, 4, 1)))}
+        self.assertEqual(self.run_policy('audit_log', dry_run=True), (91, 0))
+        self.assertEqual(AuditLog.objects.count(), 120)
+
+        self.assertEqual(self.run_policy('audit_log'), (91, 3))
+        self.assertEqual(AuditLog.objects.count(), 29)
+        self.assertEqual(archive.archived_months(AuditLog), [date(2024, 1, 1), date(2024, 2, 1), date(2024, 3, 1)])
+        # parts are merged into one file per month, with its sidecar index
+        self.assertEqual(sorted(path.name for path in (Path(self.root) / 'admin_panel_auditlog').iterdir()), [
+            '2024-01.jsonl.gz', '2024-01.jsonl.gz.idx', '2024-02.jsonl.gz', '2024-02.jsonl.gz.idx',
+            '2024-03.jsonl.gz', '2024-03.jsonl.gz.idx',
+        ])
+
+        archived = [log for month in archive.archived_months(AuditLog) for log in archive.month_rows(AuditLog, month)]
+        self.assertEqual(len(archived), 91)
+        for log in archived:
+            original = before[log.pk]
+            self.assertEqual((log.user_id, log.action, log.details, log.ip_address, log.timestamp),
+                             (original.user_id, original.action, original.details, original.ip_address, original.timestamp))
+
+        # nothing left to move
+        self.assertEqual(self.run_policy('audit_log'), (0, 0))
+
+    def test_interrupted_run_archives_rows_once(self):
+        # a chunk written to the archive but not deleted before a crash
+        rows = list(AuditLog.objects.order_by('id').values(*retention.POLICIES['audit_log'].fields)[:5])
+        archive.write_part(AuditLog, date(2024, 1, 1), rows)
+        self.run_policy('audit_log')
+        january = list(archive.month_rows(AuditLog, date(2024, 1, 1)))
+        self.assertEqual(len(january), 31)
+        self.assertEqual(len({log.pk for log in january}), 31)
+
+    def test_queued_notifications_stay(self):
+        NotificationLog.objects.bulk_create([
+            NotificationLog(user=self.emp, notification_type='welcome', subject='Welcome', message='m',
+                            status=status, body='password: secret')
+            for status in ('Queued', 'Sent', 'Failed')
+        ])
+        NotificationLog.objects.update(sent_at=timezone.make_aware(datetime(2024, 1, 15)))
+        self.assertEqual(self.run_policy('notification_log'), (2, 1))
+        self.assertEqual(list(NotificationLog.objects.values_list('status', flat=True)), ['Queued'])
+        archived = list(archive.month_rows(NotificationLog, date(2024, 1, 1), date_field='sent_at'))
+        self.assertEqual(sorted(log.status for log in archived), ['Failed', 'Sent'])
+        # bodies are never archived
+        self.assertEqual({log.body for log in archived}, {''})
+
+    def test_old_months_are_purged(self):
+        self.run_policy('audit_log')
+        with override_settings(LOG_ARCHIVE_KEEP_MONTHS=2):
+            removed = retention.purge_archives(retention.POLICIES['audit_log'], now=self.now)
+        self.assertEqual(removed, [date(2024, 1, 1), date(2024, 2, 1)])
+        self.assertEqual(archive.archived_months(AuditLog), [date(2024, 3, 1)])
+
+    def walk(self, url, params=None):
+        params = dict(params or {})
+        pages = []
+        while True:
+            page = self.client.get(url, params).context['page']
+            pages.append([row.pk for row in page])
+            if not page.has_next:
+                return pages, page
+            params['after'] = page.next_cursor
+
+    def test_audit_log_pages_continue_into_the_archive(self):
+        expected = list(AuditLog.objects.filter(user=self.emp).order_by('-timestamp', '-id').values_list('id', flat=True))
+        self.run_policy('audit_log')
+        self.client.force_login(self.admin)
+        url = reverse('admin_panel:audit_logs')
+
+        pages, last = self.walk(url, {'actor': 'emp'})
+        self.assertEqual(sum(pages, []), expected)
+        self.assertEqual(self.client.get(url, {'actor': 'emp'}).context['logs'].object_list[0].user, self.emp)
+
+        # and back again from the oldest page
+        params = {'actor': 'emp', 'before': last.previous_cursor}
+        back = [pages[-1]]
+        while params['before']:
+            page = self.client.get(url, params).context['page']
+            back.insert(0, [row.pk for row in page])
+            params['before'] = page.previous_cursor
+        self.assertEqual(back, pages)
+
+        # filters apply to archived months too
+        response = self.client.get(url, {'start_date': '2024-02-03', 'end_date': '2024-02-05'})
+        self.assertEqual(len(response.context['page']), 3)
+
+    def test_selective_filters_only_decode_matching_months(self):
+        AuditLog.objects.create(user=self.admin, action='Password Reset', action_code='password_reset', details='',
+                                timestamp=timezone.make_aware(datetime(2024, 2, 10)))
+        self.run_policy('audit_log')
+        self.client.force_login(self.admin)
+        url = reverse('admin_panel:audit_logs')
+
+        def decoded_months(params):
+            with mock.patch('admin_panel.archive._read_block', wraps=archive._read_block) as read, \
+                    mock.patch('admin_panel.archive._scan', wraps=archive._scan) as scan:
+                page = self.client.get(url, params).context['page']
+            months = lambda calls: sorted({call.args[0].name[:7] for call in calls.call_args_list})
+            return len(page), months(read), months(scan)
+
+        self.assertEqual(decoded_months({'action': 'password_reset'}), (1, ['2024-02'], []))
+        self.assertEqual(decoded_months({'actor': 'nobody'}), (0, [], []))
+        # without sidecars every month is scanned once, which writes them again
+        for path in (Path(self.root) / 'admin_panel_auditlog').glob('*.idx'):
+            path.unlink()
+        self.assertEqual(decoded_months({'action': 'password_reset'}),
+                         (1, ['2024-02'], ['2024-01', '2024-02', '2024-03']))
+        self.assertEqual(decoded_months({'action': 'password_reset'}), (1, ['2024-02'], []))
+
+    def test_pages_read_only_the_blocks_they_need(self):
+        self.enterContext(mock.patch.object(archive, 'BLOCK_ROWS', 5))
+        self.run_policy('audit_log')
+        expected = [log.pk for month in reversed(archive.archived_months(AuditLog))
+                    for log in archive.month_rows(AuditLog, month, newest_first=True)]
+        tail = archive.archive_tail(AuditLog, {})
+
+        with mock.patch('admin_panel.archive._read_block', wraps=archive._read_block) as read:
+            first = tail(None, True, 6)
+        self.assertEqual([log.pk for log in first], expected[:6])
+        # the two newest blocks of March (entries 90, and 85-89) hold them
+        self.assertEqual(read.call_count, 2)
+
+        # a cursor in the middle of January seeks straight to its block
+        cursor = next(log for log in archive.month_rows(AuditLog, date(2024, 1, 1)) if log.details == 'entry 15')
+        with mock.patch('admin_panel.archive._read_block', wraps=archive._read_block) as read:
+            older = tail((cursor.timestamp, cursor.pk), True, 3)
+            newer = tail((cursor.timestamp, cursor.pk), False, 2)
+        self.assertEqual([log.details for log in older], ['entry 14', 'entry 13', 'entry 12'])
+        self.assertEqual([log.details for log in newer], ['entry 16', 'entry 17'])
+        self.assertEqual(read.call_count, 2)
+
+    def test_audit_export_matches_the_pages(self):
+        self.enterContext(override_settings(MEDIA_ROOT=self.root))
+        self.run_policy('audit_log')
+        self.client.force_login(self.admin)
+        pages, _ = self.walk(reverse('admin_panel:audit_logs'), {'actor': 'emp'})
+        expected = sum(pages, [])
+
+        job, _ = request_export('audit_logs', {'actor': 'emp'}, self.admin)
+        run_pending()
+        job.refresh_from_db()
+        with job.file.open('rb') as handle:
+            lines = handle.read().decode().splitlines()[1:]
+        self.assertEqual(len(lines), len(expected))
+        self.assertEqual([line.split(',')[3] for line in lines[:2]], ['entry 119', 'entry 117'])
+        self.assertEqual(lines[-1].split(',')[:4], ['2024-01-02 10:00:00', 'emp@example.com', 'User Login', 'entry 1'])
+
+    def test_login_history_continues_into_the_archive(self):
+        expected = list(LoginAttempt.objects.order_by('-timestamp', '-id').values_list('id', flat=True))
+        self.run_policy('login_attempt')
+        self.assertEqual(LoginAttempt.objects.count(), 29)
+        self.client.force_login(self.admin)
+        pages, _ = self.walk(reverse('admin_panel:employee_login_history', args=[self.emp.id]))
+        self.assertEqual(pages[0], expected[:50])
+        self.assertEqual(sum(pages, []), expected)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'], AUDIT_LOG_BUFFER_SIZE=1)
+class LoginStatsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(username='admin', email='admin@example.com', role='Admin')
+        cls.emp = User.objects.create_user(username='emp', email='emp@example.com', password='right-password',
+                                           role='Employee')
+
+    def setUp(self):
+        # rate limiter buckets
+        cache.clear()
+
+    def attempt(self, password, ip='10.0.0.1', username='emp'):
+        self.client.post(reverse('login'), {'username': username, 'password': password}, REMOTE_ADDR=ip)
+        self.client.logout()
+
+    def rollups(self):
+        return sorted(LoginRollup.objects.values_list('email', 'ip_address', 'success', 'count', 'lockouts'))
+
+    def test_attempts_are_rolled_up_on_write(self):
+        self.attempt('wrong')
+        self.attempt('wrong', ip='10.0.0.2')
+        self.attempt('right-password')
+        self.attempt('wrong')
+        self.attempt('wrong', username='nobody')
+        self.attempt('wrong', username='nobody-else')
+        self.assertEqual(self.rollups(), [
+            # unknown accounts share one row
+            ('', '10.0.0.1', False, 2, 0),
+            ('emp@example.com', '10.0.0.1', False, 2, 0),
+            ('emp@example.com', '10.0.0.1', True, 1, 0),
+            ('emp@example.com', '10.0.0.2', False, 1, 0),
+        ])
+        streak = LoginFailureStreak.objects.get(user=self.emp)
+        self.assertEqual((streak.current, streak.longest), (1, 2))
+
+    def test_lockouts_are_counted(self):
+        limit = username_limiter.limit
+        for _ in range(limit):
+            self.attempt('wrong')
+        self.assertEqual(self.rollups(), [('emp@example.com', '10.0.0.1', False, limit, 1)])
+        self.assertEqual(LoginFailureStreak.objects.get(user=self.emp).current, limit)
+
+        # the rebuild counts the same from LoginAttempt and the audit log
+        expected = self.rollups()
+        LoginRollup.objects.all().delete()
+        LoginFailureStreak.objects.all().delete()
+        self.assertEqual(login_stats.rebuild(), 1)
+        self.assertEqual(self.rollups(), expected)
+        self.assertEqual(LoginFailureStreak.objects.get(user=self.emp).longest, limit)
+
+    def test_report(self):
+        now = timezone.now()
+        LoginRollup.objects.bulk_create([
+            LoginRollup(hour=login_stats.hour_of(now), email='emp@example.com', ip_address='10.0.0.9',
+                        success=False, count=40, lockouts=2, user=self.emp),
+            LoginRollup(hour=login_stats.hour_of(now - timedelta(hours=3)), email='x@example.com',
+                        ip_address='10.0.0.9', success=False, count=5),
+            LoginRollup(hour=login_stats.hour_of(now), email='emp@example.com', ip_address='10.0.0.8',
+                        success=False, count=7, user=self.emp),
+            LoginRollup(hour=login_stats.hour_of(now), email='emp@example.com', ip_address='10.0.0.8',
+                        success=True, count=100, user=self.emp),
+            # outside the last 24 hours
+            LoginRollup(hour=login_stats.hour_of(now - timedelta(days=3)), email='old@example.com',
+                        ip_address='10.0.0.7', success=False, count=500),
+        ])
+        LoginFailureStreak.objects.create(user=self.emp, current=12, longest=12)
+        LoginFailureStreak.objects.create(user=self.admin, current=0, longest=3)
+
+        self.client.force_login(self.admin)
+        context = self.client.get(reverse('admin_panel:login_analytics'), {'days': 1}).context
+        self.assertEqual(context['totals'], {'attempts': 152, 'failures': 52, 'lockouts': 2})
+        self.assertEqual([(row['ip_address'], row['failures'], row['accounts']) for row in context['top_ips']],
+                         [('10.0.0.9', 45, 2), ('10.0.0.8', 7, 1)])
+        self.assertEqual([(row['email'], row['failures'], row['ips']) for row in context['top_accounts']],
+                         [('emp@example.com', 47, 2), ('x@example.com', 5, 1)])
+        self.assertEqual([streak.user for streak in context['streaks']], [self.emp])
+
+        context = self.client.get(reverse('admin_panel:login_analytics'), {'days': 7}).context
+        self.assertEqual(context['top_ips'][0]['ip_address'], '10.0.0.7')
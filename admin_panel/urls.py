@@ -8,6 +8,7 @@ urlpatterns = [
     path('profile/', views.admin_profile, name='admin_profile'),
     path('create-employee/', views.create_employee, name='create_employee'),
     path('employees/', views.employee_list, name='employee_list'),
+    path('employees/import/', views.import_employees, name='import_employees'),
     path('employee/<int:user_id>/', views.employee_detail, name='employee_detail'),
     path('employee/<int:user_id>/edit/', views.edit_employee, name='edit_employee'),
     path('employee/<int:user_id>/delete/', views.delete_employee, name='delete_employee'),
@@ -18,5 +19,11 @@ urlpatterns = [
     path('employee/<int:user_id>/login-history/', views.employee_login_history, name='employee_login_history'),
     path('employees/bulk-action/', views.bulk_action, name='bulk_action'),
     path('employees/export-csv/', views.export_employees_csv, name='export_employees_csv'),
+    path('exports/<str:kind>/start/', views.start_export, name='start_export'),
+    path('exports/<int:job_id>/', views.export_job, name='export_job'),
+    path('exports/<int:job_id>/progress/', views.export_progress, name='export_progress'),
+    path('exports/<int:job_id>/download/', views.download_export, name='download_export'),
+    path('notifications/broadcast/', views.broadcast_notification, name='broadcast_notification'),
     path('audit-logs/', views.audit_logs, name='audit_logs'),
+    path('login-analytics/', views.login_analytics, name='login_analytics'),
 ]
@@ -2,21 +2,39 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import get_user_model, authenticate, login, logout
 from django.contrib import messages
-from django.db.models import Sum, Count, Q
-from django.core.mail import send_mail
 from django.conf import settings
+from django.db import IntegrityError, transaction
 from django.utils import timezone
-from django.http import HttpResponse, JsonResponse
+from django.http import FileResponse, Http404, JsonResponse
+from django.urls import reverse
 
-from .models import OTP, LoginAttempt, AuditLog, NotificationLog
+from .models import OTP, LoginAttempt, NotificationLog, ExportJob
 from .forms import EmployeeCreationForm, EmployeeEditForm, ChangePasswordForm
+from .audit import action_choices, log_audit, flush_audit_log
+from .ratelimit import username_limiter, ip_limiter
+from .identifiers import make_username, make_employee_id, make_temp_password
+from .emails import welcome_email
+from .outbox import delivery_progress, queue_broadcast, queue_email
+from .stats import get_dashboard_stats, bump_version as bump_dashboard_version
+from .importer import CSV_COLUMNS
+from .pagination import paginate_keyset
+from .archive import archive_tail
+from . import login_stats
+from .exports import EMPLOYEE_HEADER, employee_rows, streaming_csv_response
+from .filters import filter_audit_logs, filter_employees
+from .jobs import EXPORT_KINDS, JOB_KINDS, request_export, request_import
+from users.departments import department_name, get_departments, parse_department
 import json
-import secrets
-import string
-import csv
+import math
 
 User = get_user_model()
 
+EMPLOYEES_PER_PAGE = 50
+AUDIT_LOGS_PER_PAGE = 50
+LOGIN_HISTORY_PER_PAGE = 50
+# windows offered by the login analytics report, in days
+LOGIN_ANALYTICS_WINDOWS = (1, 7, 30, 90)
+
 # get ip address
 def get_client_ip(request):
     x_forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
@@ -26,47 +44,6 @@ def get_client_ip(request):
         ip = request.META.get('REMOTE_ADDR')
     return ip
 
-# make employee id
-def make_employee_id(first_name, last_name, date_of_joining):
-    year = date_of_joining.year if date_of_joining else timezone.now().year
-    first = first_name.lower()
-    
-    if last_name:
-        last = last_name.lower()
-        base_id = f"{first}.{last}_{year}"
-    else:
-        base_id = f"{first}.ems_{year}"
-    
-    emp_id = base_id
-    counter = 1
-    while User.objects.filter(employee_id=emp_id).exists():
-        if last_name:
-            emp_id = f"{first}.{last}_{year}_{counter}"
-        else:
-            emp_id = f"{first}.ems_{year}_{counter}"
-        counter += 1
-    
-    return emp_id
-
-# make temp password
-def make_temp_password(length=10):
-    chars = string.ascii_letters + string.digits
-    return ''.join(secrets.choice(chars) for _ in range(length))
-
-# make username
-def make_username(first_name, last_name):
-    if last_name:
-        base = f"{first_name.lower()}.{last_name.lower()}"
-    else:
-        base = f"{first_name.lower()}.ems"
-    
-    username = base
-    counter = 1
-    while User.objects.filter(username=username).exists():
-        username = f"{base}{counter}"
-        counter += 1
-    return username
-
 def user_login(request):
     if request.user.is_authenticated:
         if request.user.must_change_password:
@@ -81,65 +58,84 @@ def user_login(request):
     if request.method == 'POST':
         username = request.POST.get('username')
         password = request.POST.get('password')
+        ip = get_client_ip(request)
         
-        try:
-            user = User.objects.get(username=username)
-            
-            if user.account_locked:
+        # reject from the cache before authenticate() spends time hashing
+        if ip_limiter.is_limited(ip):
+            messages.error(request, 'Too many failed login attempts. Please try again later.')
+            return render(request, 'users/login.html')
+        if username_limiter.is_limited(username):
+            messages.error(request, 'Your account is locked. Please contact admin.')
+            return redirect('login')
+        
+        auth_user = authenticate(request, username=username, password=password)
+        
+        if auth_user:
+            if auth_user.account_locked:
                 messages.error(request, 'Your account is locked. Please contact admin.')
                 return redirect('login')
             
-            auth_user = authenticate(request, username=username, password=password)
+            login(request, auth_user)
+            username_limiter.reset(username)
             
-            if auth_user:
-                login(request, auth_user)
-                user.failed_login_attempts = 0
-                user.save()
-                
-                LoginAttempt.objects.create(
-                    user=user,
-                    email=user.email,
-                    ip_address=get_client_ip(request),
-                    success=True
-                )
-                
-                AuditLog.objects.create(
-                    user=user,
-                    action='User Login',
-                    details='Login successful',
-                    ip_address=get_client_ip(request)
-                )
-                
-                if user.must_change_password:
-                    messages.info(request, 'You must change your temporary password.')
-                    return redirect('change_password_required')
-                
-                if user.role == 'Admin':
-                    return redirect('admin_panel:admin_dashboard')
-                elif user.role == 'HR':
-                    return redirect('hr_module:hr_dashboard')
-                else:
-                    return redirect('employee:dashboard')
+            LoginAttempt.objects.create(
+                user=auth_user,
+                email=auth_user.email,
+                ip_address=ip,
+                success=True
+            )
+            
+            log_audit(
+                user=auth_user,
+                action='User Login',
+                details='Login successful',
+                ip_address=ip
+            )
+            
+            if auth_user.must_change_password:
+                messages.info(request, 'You must change your temporary password.')
+                return redirect('change_password_required')
+            
+            if auth_user.role == 'Admin':
+                return redirect('admin_panel:admin_dashboard')
+            elif auth_user.role == 'HR':
+                return redirect('hr_module:hr_dashboard')
             else:
-                user.failed_login_attempts += 1
-                if user.failed_login_attempts >= 5:
-                    user.account_locked = True
-                    messages.error(request, 'Account locked due to too many failed attempts.')
-                user.save()
-                
-                LoginAttempt.objects.create(
+                return redirect('employee:dashboard')
+        
+        ip_limiter.hit(ip)
+        failures = username_limiter.hit(username)
+        user = User.objects.filter(username=username).only('id', 'email').first()
+        
+        if user:
+            attempt = LoginAttempt.objects.create(
+                user=user,
+                email=user.email,
+                ip_address=ip,
+                success=False
+            )
+            
+            # only touch the user row when the threshold is crossed
+            if failures >= username_limiter.limit:
+                User.objects.filter(id=user.id).update(
+                    account_locked=True,
+                    failed_login_attempts=math.ceil(failures)
+                )
+                bump_dashboard_version()
+                login_stats.record_lockout(attempt)
+                log_audit(
                     user=user,
-                    email=user.email,
-                    ip_address=get_client_ip(request),
-                    success=False
+                    action='Account Locked',
+                    details=f'Locked after {math.ceil(failures)} failed login attempts',
+                    ip_address=ip
                 )
-                
-                messages.error(request, f'Invalid credentials. {5 - user.failed_login_attempts} attempts remaining.')
-        
-        except User.DoesNotExist:
+                messages.error(request, 'Account locked due to too many failed attempts.')
+            
+            messages.error(request, f'Invalid credentials. {username_limiter.remaining(failures)} attempts remaining.')
+        else:
             LoginAttempt.objects.create(
                 email=username,
-                ip_address=get_client_ip(request),
+                ip_address=ip,
                 success=False
             )
             messages.error(request, 'Invalid credentials.')
@@ -159,17 +155,11 @@ def change_password_required(request):
     if request.method == 'POST':
         if 'send_otp' in request.POST:
             otp = OTP.objects.create(user=request.user)
-            send_mail(
+            queue_email(
+                request.user,
+                'OTP',
                 'Your OTP Code for Password Change',
                 f'Your OTP code is: {otp.otp_code}. Valid for 5 minutes.',
-                settings.EMAIL_HOST_USER,
-                [request.user.email],
-                fail_silently=True,
-            )
-            NotificationLog.objects.create(
-                user=request.user,
-                notification_type='OTP',
-                subject='OTP Code for Password Change',
                 message=f'OTP sent: {otp.otp_code}'
             )
             messages.success(request, 'OTP sent to your email.')
@@ -199,7 +189,7 @@ def change_password_required(request):
                     request.user.temp_password = None
                     request.user.save()
                     
-                    AuditLog.objects.create(
+                    log_audit(
                         user=request.user,
                         action='Password Changed',
                         details='Password changed',
@@ -220,7 +210,7 @@ def change_password_required(request):
 
 def user_logout(request):
     if request.user.is_authenticated:
-        AuditLog.objects.create(
+        log_audit(
             user=request.user,
             action='User Logout',
             details='Logout',
@@ -236,26 +226,18 @@ def admin_dashboard(request):
         messages.error(request, 'Unauthorized access.')
         return redirect('login')
     
-    # getting counts
-    total_emp = User.objects.filter(role='Employee').count()
-    active_emp = User.objects.filter(role='Employee', is_active=True).count()
-    total_hr = User.objects.filter(role='HR').count()
-    total_sal = User.objects.filter(role='Employee').aggregate(Sum('salary'))['salary__sum'] or 0
-    
-    # chart data
-    depts = list(User.objects.filter(role='Employee').values('department').annotate(count=Count('id')))
-    dept_data = json.dumps(depts)
-    
-    recent_emp = User.objects.filter(role__in=['Employee', 'HR']).order_by('-date_joined')[:5]
+    # counts, salary total, chart data and recent joiners - cached until a user changes
+    stats = get_dashboard_stats()
+    dept_data = json.dumps(stats['departments'])
     
     return render(request, 'admin_panel/dashboard.html', {
-        'total_employees': total_emp,
-        'active_employees': active_emp,
-        'inactive_employees': total_emp - active_emp,
-        'total_hr': total_hr,
-        'total_salary': total_sal,
+        'total_employees': stats['total_employees'],
+        'active_employees': stats['active_employees'],
+        'inactive_employees': stats['total_employees'] - stats['active_employees'],
+        'total_hr': stats['total_hr'],
+        'total_salary': stats['total_salary'],
         'departments': dept_data,
-        'recent_employees': recent_emp,
+        'recent_employees': stats['recent_employees'],
     })
 
 @login_required
@@ -269,66 +251,43 @@ def create_employee(request):
         if form.is_valid():
             user = form.save(commit=False)
             
-            # make username
-            username = make_username(user.first_name, user.last_name or '')
-            user.username = username
-            
-            # make employee id
-            user.employee_id = make_employee_id(user.first_name, user.last_name or '', user.date_of_joining)
-            
             # temp password for first time
             temp_pass = make_temp_password()
             user.set_password(temp_pass)
             user.temp_password = temp_pass
             user.must_change_password = True
             
-            user.save()
+            # make username and employee id, retrying if a concurrent
+            # create took the same values before we saved
+            for attempt in range(3):
+                username = make_username(user.first_name, user.last_name or '')
+                user.username = username
+                user.employee_id = make_employee_id(user.first_name, user.last_name or '', user.date_of_joining)
+                try:
+                    with transaction.atomic():
+                        user.save()
+                    break
+                except IntegrityError:
+                    if attempt == 2:
+                        raise
             
-            AuditLog.objects.create(
+            log_audit(
                 user=request.user,
                 action='Employee Created',
                 details=f'Created employee {user.username}',
                 ip_address=get_client_ip(request)
             )
             
-            email_body = f"""Welcome to EMS!
-
-Your account has been created successfully.
-
-Login Credentials:
-Employee ID: {user.employee_id}
-Username: {username}
-Temporary Password: {temp_pass}
-
-Please login at: http://127.0.0.1:8000/
-
-IMPORTANT: You will be required to change your password on first login.
-An OTP will be sent to this email for password verification.
-
-Name: {user.get_full_name()}
-Email: {user.email}
-Department: {user.department}
-Role: {user.role}
-
-Best regards,
-EMS Admin Team"""
-            
-            send_mail(
-                'Welcome to EMS - Your Login Credentials',
+            subject, email_body = welcome_email(user, temp_pass)
+            queue_email(
+                user,
+                'Account Creation',
+                subject,
                 email_body,
-                settings.EMAIL_HOST_USER,
-                [user.email],
-                fail_silently=False,
-            )
-            
-            NotificationLog.objects.create(
-                user=user,
-                notification_type='Account Creation',
-                subject='Welcome to EMS - Login Credentials',
                 message=f'Temporary credentials sent. Username: {username}'
             )
             
-            messages.success(request, f'Employee created! Username: {username} | Temporary password sent to {user.email}')
+            messages.success(request, f'Employee created! Username: {username} | Temporary password will be emailed to {user.email}')
             return redirect('admin_panel:employee_list')
     else:
         form = EmployeeCreationForm()
@@ -336,55 +295,53 @@ EMS Admin Team"""
     return render(request, 'admin_panel/create_employee.html', {'form': form})
 
 @login_required
-def employee_list(request):
+def import_employees(request):
     if request.user.role != 'Admin':
         messages.error(request, 'Unauthorized access.')
         return redirect('login')
     
-    emps = User.objects.filter(role__in=['Employee', 'HR'])
-    
-    # search part
-    search = request.GET.get('search', '')
-    if search:
-        emps = emps.filter(
-            Q(first_name__icontains=search) |
-            Q(last_name__icontains=search) |
-            Q(email__icontains=search) |
-            Q(employee_id__icontains=search)
-        )
-    
-    # filter by role
-    role_filter = request.GET.get('role', '')
-    if role_filter:
-        emps = emps.filter(role=role_filter)
+    if request.method == 'POST':
+        upload = request.FILES.get('csv_file')
+        if not upload:
+            messages.error(request, 'Please choose a CSV file to import.')
+        else:
+            # hashing the passwords takes far longer than a request may, the export worker imports it
+            job = request_import(upload, request.user, ip_address=get_client_ip(request))
+            return redirect('admin_panel:export_job', job_id=job.pk)
     
-    # filter by department
-    dept_filter = request.GET.get('department', '')
-    if dept_filter:
-        emps = emps.filter(department=dept_filter)
+    return render(request, 'admin_panel/import_employees.html', {
+        'columns': CSV_COLUMNS,
+    })
+
+@login_required
+def employee_list(request):
+    if request.user.role != 'Admin':
+        messages.error(request, 'Unauthorized access.')
+        return redirect('login')
     
-    # filter by status
-    status = request.GET.get('status', '')
-    if status == 'active':
-        emps = emps.filter(is_active=True, account_locked=False)
-    elif status == 'inactive':
-        emps = emps.filter(is_active=False)
-    elif status == 'locked':
-        emps = emps.filter(account_locked=True)
+    emps, filters = filter_employees(request.GET)
     
-    # get departments
-    depts = User.objects.filter(role__in=['Employee', 'HR']).values_list('department', flat=True).distinct()
-    depts = [d for d in depts if d]
+    # newest first, one page at a time
+    page = paginate_keyset(
+        emps, ('-date_joined', '-id'),
+        after=request.GET.get('after'), before=request.GET.get('before'),
+        per_page=EMPLOYEES_PER_PAGE,
+    )
     
-    emps = emps.order_by('-date_joined')
+    # filters to carry over in the page links
+    params = request.GET.copy()
+    params.pop('after', None)
+    params.pop('before', None)
     
     return render(request, 'admin_panel/employee_list.html', {
-        'employees': emps,
-        'departments': depts,
-        'search_query': search,
-        'role_filter': role_filter,
-        'department_filter': dept_filter,
-        'status_filter': status,
+        'employees': page,
+        'page': page,
+        'filter_params': params.urlencode(),
+        'departments': get_departments(),
+        'search_query': filters['search'],
+        'role_filter': filters['role'],
+        'department_filter': parse_department(filters['department']),
+        'status_filter': filters['status'],
     })
 
 @login_required
@@ -394,6 +351,8 @@ def employee_detail(request, user_id):
         return redirect('login')
     
     emp = get_object_or_404(User, id=user_id)
+    # recent failures live in the rate limiter, the column is only written on lockout
+    emp.failed_login_attempts = max(emp.failed_login_attempts, math.ceil(username_limiter.count(emp.username)))
     
     return render(request, 'admin_panel/employee_detail.html', {'employee': emp})
 
@@ -410,7 +369,7 @@ def edit_employee(request, user_id):
         if form.is_valid():
             form.save()
             
-            AuditLog.objects.create(
+            log_audit(
                 user=request.user,
                 action='Employee Updated',
                 details=f'Updated {emp.email}',
@@ -436,7 +395,7 @@ def toggle_employee_status(request, user_id):
     
     status = 'activated' if emp.is_active else 'deactivated'
     
-    AuditLog.objects.create(
+    log_audit(
         user=request.user,
         action=f'Employee {status}',
         details=f'{status} {emp.email}',
@@ -456,8 +415,9 @@ def unlock_account(request, user_id):
     emp.account_locked = False
     emp.failed_login_attempts = 0
     emp.save()
+    username_limiter.reset(emp.username)
     
-    AuditLog.objects.create(
+    log_audit(
         user=request.user,
         action='Account Unlocked',
         details=f'Unlocked {emp.email}',
@@ -483,7 +443,7 @@ def delete_employee(request, user_id):
         emp_email = emp.email
         emp_name = emp.get_full_name()
         
-        AuditLog.objects.create(
+        log_audit(
             user=request.user,
             action='Employee Deleted',
             details=f'Deleted {emp_name}',
@@ -527,29 +487,22 @@ You will be required to change this password on first login.
 Best regards,
 EMS Admin Team"""
     
-    send_mail(
+    queue_email(
+        emp,
+        'Password Reset',
         'EMS - Password Reset',
         email_body,
-        settings.EMAIL_HOST_USER,
-        [emp.email],
-        fail_silently=False,
-    )
-    
-    NotificationLog.objects.create(
-        user=emp,
-        notification_type='Password Reset',
-        subject='Password Reset by Admin',
         message='Temporary password sent via email'
     )
     
-    AuditLog.objects.create(
+    log_audit(
         user=request.user,
         action='Password Reset',
         details=f'Reset password for {emp.email}',
         ip_address=get_client_ip(request)
     )
     
-    messages.success(request, f'Password reset! Temporary password sent to {emp.email}')
+    messages.success(request, f'Password reset! Temporary password will be emailed to {emp.email}')
     return redirect('admin_panel:employee_detail', user_id=emp.id)
 
 @login_required
@@ -570,7 +523,8 @@ def bulk_action(request):
         
         if action == 'activate':
             emps.update(is_active=True)
-            AuditLog.objects.create(
+            bump_dashboard_version()
+            log_audit(
                 user=request.user,
                 action='Bulk Activate',
                 details=f'Activated {count} employees',
@@ -580,7 +534,8 @@ def bulk_action(request):
         
         elif action == 'deactivate':
             emps.update(is_active=False)
-            AuditLog.objects.create(
+            bump_dashboard_version()
+            log_audit(
                 user=request.user,
                 action='Bulk Deactivate',
                 details=f'Deactivated {count} employees',
@@ -591,7 +546,7 @@ def bulk_action(request):
         elif action == 'delete':
             emp_names = ', '.join([e.get_full_name() for e in emps])
             emps.delete()
-            AuditLog.objects.create(
+            log_audit(
                 user=request.user,
                 action='Bulk Delete',
                 details=f'Deleted {count} employees',
@@ -600,8 +555,11 @@ def bulk_action(request):
             return JsonResponse({'success': True, 'message': f'{count} employees deleted'})
         
         elif action == 'unlock':
+            for username in emps.values_list('username', flat=True):
+                username_limiter.reset(username)
             emps.update(account_locked=False, failed_login_attempts=0)
-            AuditLog.objects.create(
+            bump_dashboard_version()
+            log_audit(
                 user=request.user,
                 action='Bulk Unlock',
                 details=f'Unlocked {count} accounts',
@@ -617,38 +575,108 @@ def export_employees_csv(request):
         messages.error(request, 'Unauthorized access.')
         return redirect('login')
     
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="employees_{timezone.now().strftime("%Y%m%d_%H%M%S")}.csv"'
-    
-    writer = csv.writer(response)
-    writer.writerow(['Employee ID', 'First Name', 'Last Name', 'Email', 'Phone', 'Role', 
-                     'Department', 'Salary', 'Date of Joining', 'Status', 'Account Locked'])
-    
-    emps = User.objects.filter(role__in=['Employee', 'HR']).order_by('employee_id')
-    
-    for emp in emps:
-        writer.writerow([
-            emp.employee_id or 'N/A',
-            emp.first_name,
-            emp.last_name,
-            emp.email,
-            emp.phone or 'N/A',
-            emp.role,
-            emp.department or 'N/A',
-            emp.salary or 0,
-            emp.date_of_joining.strftime('%Y-%m-%d') if emp.date_of_joining else 'N/A',
-            'Active' if emp.is_active else 'Inactive',
-            'Yes' if emp.account_locked else 'No'
-        ])
-    
-    AuditLog.objects.create(
+    # same filters as the employee list, streamed with only the exported columns
+    emps, filters = filter_employees(request.GET)
+    
+    labels = dict(filters, department=department_name(filters['department']))
+    applied = ', '.join(f'{key}={value}' for key, value in labels.items() if value)
+    ip_address = get_client_ip(request)
+    
+    def finished(count):
+        log_audit(
+            user=request.user,
+            action='Export Employees',
+            details=f'Exported {count} employees' + (f' ({applied})' if applied else ''),
+            ip_address=ip_address,
+        )
+    
+    return streaming_csv_response(
+        f'employees_{timezone.now().strftime("%Y%m%d_%H%M%S")}.csv',
+        EMPLOYEE_HEADER,
+        employee_rows(emps),
+        on_complete=finished,
+    )
+
+# Background exports - queued here, generated by `manage.py run_export_jobs`
+@login_required
+def start_export(request, kind):
+    export = EXPORT_KINDS.get(kind)
+    if export is None or request.user.role not in export.roles:
+        messages.error(request, 'Unauthorized access.')
+        return redirect('login')
+    
+    if request.method != 'POST':
+        return redirect(export.return_url)
+    
+    try:
+        job, reused = request_export(kind, request.POST, request.user)
+    except ValueError as e:
+        messages.error(request, str(e))
+        return redirect(export.return_url)
+    
+    log_audit(
         user=request.user,
-        action='Export Employees',
-        details=f'Exported {emps.count()} employees',
+        action='Export Requested',
+        details=f'{job.get_kind_display()} export #{job.pk} {"reused" if reused else "queued"} ({job.params})',
         ip_address=get_client_ip(request)
     )
+    return redirect('admin_panel:export_job', job_id=job.pk)
+
+def _export_job(request, job_id, *fields):
+    """The job if the user's role may read exports of its kind, else None"""
+    jobs = ExportJob.objects.only('kind', *fields) if fields else ExportJob.objects.all()
+    job = get_object_or_404(jobs, id=job_id)
+    return job if request.user.role in JOB_KINDS[job.kind].roles else None
+
+@login_required
+def export_job(request, job_id):
+    job = _export_job(request, job_id)
+    if job is None:
+        messages.error(request, 'Unauthorized access.')
+        return redirect('login')
     
-    return response
+    template = 'admin_panel/import_job.html' if job.kind == 'employee_import' else 'admin_panel/export_job.html'
+    return render(request, template, {
+        'job': job,
+        'return_url': JOB_KINDS[job.kind].return_url,
+    })
+
+@login_required
+def export_progress(request, job_id):
+    # polled by the export page - one small query
+    job = _export_job(request, job_id, 'status', 'rows_done', 'rows_total', 'error')
+    if job is None:
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+    
+    return JsonResponse({
+        'status': job.status,
+        'rows_done': job.rows_done,
+        'rows_total': job.rows_total,
+        'progress': job.progress,
+        'error': job.error,
+    })
+
+@login_required
+def download_export(request, job_id):
+    job = _export_job(request, job_id)
+    if job is None:
+        messages.error(request, 'Unauthorized access.')
+        return redirect('login')
+    if job.status != 'Completed' or not job.file:
+        raise Http404('Export not ready')
+    
+    try:
+        handle = job.file.open('rb')
+    except FileNotFoundError:
+        raise Http404('Export file missing')
+    
+    log_audit(
+        user=request.user,
+        action='Download Export',
+        details=f'{job.get_kind_display()} export #{job.pk} ({job.rows_done} rows)',
+        ip_address=get_client_ip(request)
+    )
+    return FileResponse(handle, as_attachment=True, filename=JOB_KINDS[job.kind].filename(job.params))
 
 @login_required
 def send_notification(request, user_id):
@@ -663,35 +691,75 @@ def send_notification(request, user_id):
         message = request.POST.get('message')
         
         if subject and message:
-            send_mail(
-                subject,
-                message,
-                settings.EMAIL_HOST_USER,
-                [emp.email],
-                fail_silently=False,
-            )
+            queue_email(emp, 'Admin Notice', subject, message)
             
-            NotificationLog.objects.create(
-                user=emp,
-                notification_type='Admin Notice',
-                subject=subject,
-                message=message
-            )
-            
-            AuditLog.objects.create(
+            log_audit(
                 user=request.user,
                 action='Send Notification',
                 details=f'Sent to {emp.email}',
                 ip_address=get_client_ip(request)
             )
             
-            messages.success(request, 'Notification sent successfully!')
+            messages.success(request, 'Notification queued for delivery!')
             return redirect('admin_panel:employee_detail', user_id=emp.id)
         else:
             messages.error(request, 'Subject and message are required!')
     
     return render(request, 'admin_panel/send_notification.html', {'employee': emp})
 
+@login_required
+def broadcast_notification(request):
+    if request.user.role != 'Admin':
+        messages.error(request, 'Unauthorized access.')
+        return redirect('login')
+    
+    role_filter = request.POST.get('role', '')
+    dept_filter = parse_department(request.POST.get('department', ''))
+    
+    if request.method == 'POST':
+        subject = request.POST.get('subject')
+        message = request.POST.get('message')
+        
+        if subject and message:
+            recipients = User.objects.filter(role__in=['Employee', 'HR'], is_active=True)
+            if role_filter:
+                recipients = recipients.filter(role=role_filter)
+            if dept_filter:
+                recipients = recipients.filter(department_id=dept_filter)
+            recipients = list(recipients.only('id', 'email'))
+            
+            if recipients:
+                # the outbox worker delivers them - no SMTP in the request
+                broadcast_id = queue_broadcast(recipients, 'Broadcast', subject, message)
+                
+                log_audit(
+                    user=request.user,
+                    action='Broadcast Notification',
+                    details=f'Queued "{subject}" for {len(recipients)} users '
+                            f'(role: {role_filter or "All"}, department: {department_name(dept_filter) or "All"})',
+                    ip_address=get_client_ip(request)
+                )
+                
+                messages.success(request, f'Notification queued for {len(recipients)} users.')
+                return redirect(f"{reverse('admin_panel:broadcast_notification')}?broadcast={broadcast_id}")
+            messages.error(request, 'No active users match the selected filters.')
+        else:
+            messages.error(request, 'Subject and message are required!')
+    
+    # delivery progress of the broadcast just queued
+    progress = error = None
+    broadcast_id = request.GET.get('broadcast', '')
+    if broadcast_id:
+        progress, error = delivery_progress(broadcast_id)
+    
+    return render(request, 'admin_panel/broadcast_notification.html', {
+        'departments': get_departments(),
+        'role_filter': role_filter,
+        'department_filter': dept_filter,
+        'progress': progress,
+        'progress_error': error,
+    })
+
 @login_required
 def employee_login_history(request, user_id):
     if request.user.role != 'Admin':
@@ -699,22 +767,69 @@ def employee_login_history(request, user_id):
         return redirect('login')
     
     emp = get_object_or_404(User, id=user_id)
-    login_hist = LoginAttempt.objects.filter(user=emp).order_by('-timestamp')[:50]
+    
+    # newest first; older pages continue into the archived months
+    page = paginate_keyset(
+        LoginAttempt.objects.filter(user=emp), ('-timestamp', '-id'),
+        after=request.GET.get('after'), before=request.GET.get('before'),
+        per_page=LOGIN_HISTORY_PER_PAGE,
+        archive=archive_tail(LoginAttempt, {'user_id': emp.id}),
+    )
     
     return render(request, 'admin_panel/employee_login_history.html', {
         'employee': emp,
-        'login_attempts': login_hist
+        'login_attempts': page,
+        'page': page,
     })
 
+@login_required
+def login_analytics(request):
+    if request.user.role != 'Admin':
+        messages.error(request, 'Unauthorized access.')
+        return redirect('login')
+    
+    try:
+        days = int(request.GET.get('days', 7))
+    except ValueError:
+        days = 7
+    if days not in LOGIN_ANALYTICS_WINDOWS:
+        days = 7
+    
+    # read from the hourly rollups, never from LoginAttempt
+    context = login_stats.report(days)
+    context.update({'days': days, 'windows': LOGIN_ANALYTICS_WINDOWS})
+    return render(request, 'admin_panel/login_analytics.html', context)
+
 @login_required
 def audit_logs(request):
     if request.user.role != 'Admin':
         messages.error(request, 'Unauthorized access.')
         return redirect('login')
     
-    logs = AuditLog.objects.all().order_by('-timestamp')[:100]
+    # make sure entries queued by this process show up
+    flush_audit_log()
+    logs, filters, archived = filter_audit_logs(request.GET)
+    
+    # newest first, one page at a time; older pages continue into the archived months
+    page = paginate_keyset(
+        logs.select_related('user'), ('-timestamp', '-id'),
+        after=request.GET.get('after'), before=request.GET.get('before'),
+        per_page=AUDIT_LOGS_PER_PAGE,
+        archive=archived,
+    )
     
-    return render(request, 'admin_panel/audit_logs.html', {'logs': logs})
+    # filters to carry over in the page links
+    params = request.GET.copy()
+    params.pop('after', None)
+    params.pop('before', None)
+    
+    return render(request, 'admin_panel/audit_logs.html', {
+        'logs': page,
+        'page': page,
+        'filter_params': params.urlencode(),
+        'filters': filters,
+        'actions': action_choices(),
+    })
 
 def hr_dashboard(request):
     return render(request, 'hr_module/dashboard.html')
@@ -737,7 +852,7 @@ def admin_profile(request):
             
             # Log the action
             ip = get_client_ip(request)
-            AuditLog.objects.create(
+            log_audit(
                 user=request.user,
                 action='Profile Updated',
                 details=f'Admin {request.user.username} updated their profile',
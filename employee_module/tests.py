@@ -1,3 +1,43 @@
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.urls import reverse
+
+from hr_module.models import Attendance, LeaveBalance, Task
+
+User = get_user_model()
+
+
+class EmployeeDashboardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.emp = User.objects.create(username='emp', email='emp@example.com', role='Employee')
+        other = User.objects.create(username='other', email='other@example.com', role='Employee')
+        today = date.today()
+        for status, due in [
+            ('Pending', today + timedelta(days=1)),
+            ('Pending', today - timedelta(days=1)),
+            ('In Progress', today - timedelta(days=2)),
+            ('Completed', today - timedelta(days=3)),
+            ('Cancelled', today - timedelta(days=4)),
+        ]:
+            Task.objects.create(assigned_to=cls.emp, title=status, description='-', status=status, due_date=due)
+        Task.objects.create(assigned_to=other, title='Other', description='-', due_date=today - timedelta(days=1))
+        for day, status in enumerate(['Present', 'Present', 'Absent', 'Half Day'], start=1):
+            Attendance.objects.create(user=cls.emp, date=date(2024, 3, day), status=status)
+
+    def test_counts(self):
+        self.client.force_login(self.emp)
+        context = self.client.get(reverse('employee:dashboard')).context
+        self.assertEqual(
+            [context[name] for name in ('total_tasks', 'pending_tasks', 'completed_tasks', 'overdue_tasks')],
+            [5, 2, 1, 2],
+        )
+        self.assertEqual((context['present_days'], context['absent_days']), (2, 1))
 
-# Create your tests here.
+    def test_new_employee_gets_a_leave_balance(self):
+        self.client.force_login(self.emp)
+        context = self.client.get(reverse('employee:dashboard')).context
+        self.assertEqual(LeaveBalance.objects.get(user=self.emp), context['leave_balance'])
+        self.assertEqual(context['total_leaves'], 12 + 12 + context['leave_balance'].earned_leave)
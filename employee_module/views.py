@@ -6,7 +6,7 @@ from hr_module.models import Task, Attendance, Leave, LeaveBalance
 from django.contrib import messages
 from django.contrib.auth import get_user_model
 from functools import wraps
-from django.db.models import Q
+from django.db.models import Count, Q
 
 User = get_user_model()
 
@@ -38,44 +38,35 @@ def employee_dashboard(request):
         user=user, date=today
     ).first()
 
-    # Calculate task statistics
-    total_tasks = Task.objects.filter(assigned_to=user).count()
-    pending_tasks = Task.objects.filter(
-        assigned_to=user, status='Pending'
-    ).count()
-    
-    completed_tasks = Task.objects.filter(
-        assigned_to=user, status='Completed'
-    ).count()
-
-    # Find overdue tasks (due date passed but not completed)
-    overdue_tasks = Task.objects.filter(
-        assigned_to=user,
-        due_date__lt=today
-    ).exclude(status__in=['Completed', 'Cancelled']).count()
+    # Calculate task statistics in one pass over the employee's tasks
+    task_stats = Task.objects.filter(assigned_to=user).aggregate(
+        total=Count('id'),
+        pending=Count('id', filter=Q(status='Pending')),
+        completed=Count('id', filter=Q(status='Completed')),
+        # overdue = due date passed but not completed
+        overdue=Count('id', filter=Q(due_date__lt=today) & ~Q(status__in=['Completed', 'Cancelled'])),
+    )
+    total_tasks = task_stats['total']
+    pending_tasks = task_stats['pending']
+    completed_tasks = task_stats['completed']
+    overdue_tasks = task_stats['overdue']
 
     # Get recent leave applications (last 5)
     recent_leaves = Leave.objects.filter(
         user=user
     ).order_by('-applied_at')[:5]
 
-    # Get or create leave balance for current year
-    try:
-        leave_balance_obj = LeaveBalance.objects.get(user=user, year=today.year)
-        total_leaves = leave_balance_obj.sick_leave + leave_balance_obj.casual_leave + leave_balance_obj.earned_leave
-    except LeaveBalance.DoesNotExist:
-        # Create leave balance if it doesn't exist (for new employees)
-        leave_balance_obj = LeaveBalance.objects.create(user=user, year=today.year)
-        total_leaves = 39  # Default: 12 sick + 12 casual + 15 earned
+    # Get or create leave balance for current year (new employees have none yet)
+    leave_balance_obj, _ = LeaveBalance.objects.get_or_create(user=user, year=today.year)
+    total_leaves = leave_balance_obj.sick_leave + leave_balance_obj.casual_leave + leave_balance_obj.earned_leave
 
     # Calculate attendance statistics
-    present_days = Attendance.objects.filter(
-        user=user, status='Present'
-    ).count()
-
-    absent_days = Attendance.objects.filter(
-        user=user, status='Absent'
-    ).count()
+    attendance_stats = Attendance.objects.filter(user=user).aggregate(
+        present=Count('id', filter=Q(status='Present')),
+        absent=Count('id', filter=Q(status='Absent')),
+    )
+    present_days = attendance_stats['present']
+    absent_days = attendance_stats['absent']
 
     # Prepare context data for template
     context = {
@@ -105,7 +96,7 @@ def employee_tasks(request):
     status_filter = request.GET.get('status', 'all')
     
     # Fetch all tasks assigned to current logged-in employee
-    tasks = Task.objects.filter(assigned_to=request.user).order_by('-created_at')
+    tasks = Task.objects.filter(assigned_to=request.user).select_related('assigned_by').order_by('-created_at')
     
     # Apply status filter if selected
     if status_filter != 'all':
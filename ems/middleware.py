@@ -0,0 +1,76 @@
+"""
+Development query inspector.
+
+Records every SQL statement run while a request is handled and flags
+statements that repeat with the same shape (same SQL, different parameters),
+the usual sign of an N+1 loop over a queryset. Findings are logged to the
+'ems.queries' logger and the total is returned in an X-Query-Count header.
+
+Enabled by QUERY_INSPECTOR_ENABLED (defaults to DEBUG). With
+QUERY_INSPECTOR_RAISE the request fails with NPlusOneError instead, which is
+how the query budget tests use it.
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('ems.queries')
+
+# IN (%s, %s, %s) -> IN (...), so lists of different lengths share a shape
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+
+
+class NPlusOneError(Exception):
+    pass
+
+
+def query_shape(sql):
+    return _IN_LIST.sub('IN (...)', sql)
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.queries = []  # (sql, seconds)
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - started))
+
+    def repeated(self, threshold):
+        """Shapes run at least `threshold` times, most frequent first"""
+        counts = Counter(query_shape(sql) for sql, _ in self.queries)
+        return [(shape, count) for shape, count in counts.most_common() if count >= threshold]
+
+
+class QueryInspectorMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, 'QUERY_INSPECTOR_ENABLED', settings.DEBUG):
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+
+        threshold = getattr(settings, 'QUERY_INSPECTOR_THRESHOLD', 5)
+        repeated = recorder.repeated(threshold)
+        response['X-Query-Count'] = str(len(recorder.queries))
+        if repeated:
+            details = '\n'.join(f'  {count}x {shape[:300]}' for shape, count in repeated)
+            message = f'Possible N+1 on {request.method} {request.path}: {len(recorder.queries)} queries\n{details}'
+            if getattr(settings, 'QUERY_INSPECTOR_RAISE', False):
+                raise NPlusOneError(message)
+            logger.warning(message)
+        return response
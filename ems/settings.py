@@ -59,6 +59,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'ems.middleware.QueryInspectorMiddleware',
 ]
 
 ROOT_URLCONF = 'ems.urls'
@@ -148,5 +149,72 @@ EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', '')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
 DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', f'EMS <{EMAIL_HOST_USER}>')
 
+# Email outbox (admin_panel/outbox.py)
+# A failed email is retried after EMAIL_RETRY_DELAY seconds, doubling per attempt;
+# one claimed by a worker that died is sent again after EMAIL_SENDING_TIMEOUT seconds
+EMAIL_RETRY_DELAY = int(os.getenv('EMAIL_RETRY_DELAY', '60'))
+EMAIL_SENDING_TIMEOUT = int(os.getenv('EMAIL_SENDING_TIMEOUT', '600'))
+
+# Cache
+# LocMemCache is per process - point this at Redis/Memcached when running several workers
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'ems-cache'),
+    }
+}
+
+# Query inspector (development) - flags SQL repeated QUERY_INSPECTOR_THRESHOLD
+# times in one request as a likely N+1, see ems/middleware.py
+QUERY_INSPECTOR_ENABLED = os.getenv('QUERY_INSPECTOR_ENABLED', str(DEBUG)) == 'True'
+QUERY_INSPECTOR_THRESHOLD = int(os.getenv('QUERY_INSPECTOR_THRESHOLD', '5'))
+QUERY_INSPECTOR_RAISE = False
+
+# Admin dashboard statistics are cached until a user is created, edited or deleted
+DASHBOARD_CACHE_TIMEOUT = 3600
+
+# Employee attendance report statistics are cached until that employee's attendance changes
+ATTENDANCE_REPORT_CACHE_TIMEOUT = 3600
+
+# Background exports (admin_panel/jobs.py) are written to MEDIA_ROOT/exports/ by
+# `manage.py run_export_jobs`; unfinished jobs older than this are requeued on request,
+# and jobs Running for longer are failed by the worker
+EXPORT_JOB_STALE_AFTER = int(os.getenv('EXPORT_JOB_STALE_AFTER', '3600'))
+# Employee CSV uploads are imported by the same worker; temporary passwords are
+# hashed in a pool of this many processes (unset: one per CPU)
+EMPLOYEE_IMPORT_WORKERS = int(os.environ['EMPLOYEE_IMPORT_WORKERS']) if os.getenv('EMPLOYEE_IMPORT_WORKERS') else None
+
+# Memory-mapped employee x day attendance matrices, one folder per year (hr_module/cube.py).
+# Years are built by `manage.py build_attendance_cube`; attendance writes keep built years current
+ATTENDANCE_CUBE_ROOT = os.getenv('ATTENDANCE_CUBE_ROOT', str(BASE_DIR / 'attendance_cube'))
+
+# Log retention (admin_panel/retention.py, run by `manage.py archive_logs`): rows older
+# than their table's hot days move to gzip JSONL archives, one file per month, which
+# are deleted after LOG_ARCHIVE_KEEP_MONTHS (0 keeps them forever)
+LOG_ARCHIVE_ROOT = os.getenv('LOG_ARCHIVE_ROOT', str(BASE_DIR / 'log_archive'))
+AUDIT_LOG_HOT_DAYS = int(os.getenv('AUDIT_LOG_HOT_DAYS', '365'))
+LOGIN_ATTEMPT_HOT_DAYS = int(os.getenv('LOGIN_ATTEMPT_HOT_DAYS', '180'))
+NOTIFICATION_LOG_HOT_DAYS = int(os.getenv('NOTIFICATION_LOG_HOT_DAYS', '90'))
+LOG_ARCHIVE_KEEP_MONTHS = int(os.getenv('LOG_ARCHIVE_KEEP_MONTHS', '0'))
+
+# Login rate limiting (sliding windows, in seconds)
+# An account is locked once LOGIN_MAX_FAILED_ATTEMPTS failures land inside the window
+LOGIN_MAX_FAILED_ATTEMPTS = int(os.getenv('LOGIN_MAX_FAILED_ATTEMPTS', '5'))
+LOGIN_FAILURE_WINDOW = int(os.getenv('LOGIN_FAILURE_WINDOW', '900'))
+LOGIN_IP_MAX_FAILED_ATTEMPTS = int(os.getenv('LOGIN_IP_MAX_FAILED_ATTEMPTS', '30'))
+LOGIN_IP_FAILURE_WINDOW = int(os.getenv('LOGIN_IP_FAILURE_WINDOW', '300'))
+
+# Bulk attendance posts one status field per employee
+DATA_UPLOAD_MAX_NUMBER_FIELDS = int(os.getenv('DATA_UPLOAD_MAX_NUMBER_FIELDS', '20000'))
+
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'admin_dashboard'
+
+# Audit log buffering
+# Audit entries are queued in memory and written in batches
+AUDIT_LOG_BUFFER_SIZE = int(os.getenv('AUDIT_LOG_BUFFER_SIZE', '50'))
+AUDIT_LOG_FLUSH_INTERVAL = float(os.getenv('AUDIT_LOG_FLUSH_INTERVAL', '5'))
+
+# Action codes offered by the audit log filter are cached this long (a new action
+# written by this process clears them at once)
+AUDIT_ACTIONS_CACHE_TIMEOUT = 3600
@@ -0,0 +1,21 @@
+"""
+Test helpers shared by the apps' test suites.
+"""
+import re
+
+
+class QueryPlanAssertions:
+    """
+    EXPLAIN QUERY PLAN checks for TestCase classes (SQLite only). A plan line
+    like "SCAN hr_module_task" (no USING INDEX) means the whole table is read.
+    """
+
+    def assertIndexed(self, queryset, table):
+        plan = queryset.explain()
+        scans = [line for line in plan.splitlines() if re.search(rf'\bSCAN {table}\s*$', line)]
+        self.assertFalse(scans, f'full scan of {table}:\n{plan}')
+
+    def assertNotSorted(self, queryset):
+        # rows come out of an index in order instead of being sorted afterwards
+        plan = queryset.explain()
+        self.assertNotIn('TEMP B-TREE', plan, f'sorted after reading:\n{plan}')
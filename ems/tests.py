@@ -0,0 +1,284 @@
+import tempfile
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver, reverse
+from django.http import HttpResponse
+
+from admin_panel import login_stats
+from admin_panel.models import AuditLog, ExportJob, LoginAttempt
+from hr_module import summary
+from hr_module.models import Attendance, Leave, Task
+from users import departments
+from users.models import Department
+
+from .middleware import NPlusOneError, QueryInspectorMiddleware
+
+User = get_user_model()
+
+EMPLOYEES = 100
+
+# url name -> (who requests it, url kwargs, maximum queries)
+# Budgets are per request and must not depend on the number of rows. Pages that
+# log an action include writing it (savepoint, insert, audit log version bump,
+# release - the audit log is unbuffered here).
+BUDGETS = {
+    'admin_panel:admin_dashboard': ('admin', {}, 5),
+    'admin_panel:admin_profile': ('admin', {}, 2),
+    'admin_panel:create_employee': ('admin', {}, 2),
+    'admin_panel:employee_list': ('admin', {}, 3),
+    'admin_panel:import_employees': ('admin', {}, 2),
+    'admin_panel:employee_detail': ('admin', {'user_id': 'emp'}, 3),
+    'admin_panel:edit_employee': ('admin', {'user_id': 'emp'}, 3),
+    'admin_panel:delete_employee': ('admin', {'user_id': 'emp'}, 3),
+    'admin_panel:send_notification': ('admin', {'user_id': 'emp'}, 3),
+    'admin_panel:employee_login_history': ('admin', {'user_id': 'emp'}, 4),
+    'admin_panel:bulk_action': ('admin', {}, 2),
+    'admin_panel:export_employees_csv': ('admin', {}, 3),
+    'admin_panel:broadcast_notification': ('admin', {}, 2),
+    'admin_panel:audit_logs': ('admin', {}, 4),
+    'admin_panel:login_analytics': ('admin', {}, 6),
+    'admin_panel:start_export': ('admin', {'kind': 'export_kind'}, 2),
+    'admin_panel:export_job': ('admin', {'job_id': 'export_job'}, 3),
+    'admin_panel:export_progress': ('admin', {'job_id': 'export_job'}, 3),
+    'admin_panel:download_export': ('admin', {'job_id': 'export_job'}, 7),
+    'hr_module:hr_dashboard': ('hr', {}, 11),
+    'hr_module:hr_profile': ('hr', {}, 2),
+    'hr_module:employee_search': ('hr', {}, 2),
+    'hr_module:attendance_list': ('hr', {}, 3),
+    'hr_module:attendance_grid': ('hr', {}, 5),
+    'hr_module:export_attendance_grid': ('hr', {}, 8),
+    'hr_module:mark_attendance': ('hr', {}, 3),
+    'hr_module:bulk_mark_attendance': ('hr', {}, 4),
+    'hr_module:edit_attendance': ('hr', {'attendance_id': 'attendance'}, 5),
+    'hr_module:employee_attendance_report': ('hr', {'user_id': 'emp'}, 7),
+    'hr_module:export_attendance_csv': ('hr', {}, 3),
+    'hr_module:leave_requests': ('hr', {}, 3),
+    'hr_module:leave_detail': ('hr', {'leave_id': 'leave'}, 4),
+    'hr_module:apply_leave': ('hr', {}, 3),
+    'hr_module:task_list': ('hr', {}, 3),
+    'hr_module:create_task': ('hr', {}, 3),
+    'hr_module:task_detail': ('hr', {'task_id': 'task'}, 5),
+    'hr_module:delete_task': ('hr', {'task_id': 'task'}, 4),
+    'employee:dashboard': ('emp', {}, 10),
+    'employee:employee_profile': ('emp', {}, 2),
+    'employee:tasks': ('emp', {}, 3),
+    'employee:update_task_status': ('emp', {'task_id': 'emp_task'}, 3),
+    'employee:reject_task': ('emp', {'task_id': 'emp_task'}, 3),
+    'employee:attendance': ('emp', {}, 5),
+    'employee:mark_attendance': ('emp', {}, 2),
+    'employee:leave': ('emp', {}, 4),
+    'employee:apply_leave': ('emp', {}, 2),
+    # state changing GET links, requested last
+    'admin_panel:unlock_account': ('admin', {'user_id': 'emp'}, 10),
+    'admin_panel:reset_employee_password': ('admin', {'user_id': 'emp'}, 11),
+    'admin_panel:toggle_employee_status': ('admin', {'user_id': 'spare'}, 10),
+    'hr_module:verify_attendance': ('hr', {'attendance_id': 'attendance'}, 9),
+    'employee:accept_task': ('emp', {'task_id': 'emp_task'}, 4),
+}
+
+# django admin changelists of our models
+ADMIN_CHANGELISTS = {
+    'admin:hr_module_attendance_changelist': 8,
+    'admin:hr_module_leave_changelist': 7,
+    'admin:hr_module_task_changelist': 7,
+    'admin:hr_module_leavebalance_changelist': 6,
+    'admin:admin_panel_loginattempt_changelist': 5,
+    'admin:admin_panel_auditlog_changelist': 5,
+    'admin:admin_panel_notificationlog_changelist': 6,
+    'admin:admin_panel_exportjob_changelist': 5,
+}
+
+
+class URLCoverageTests(SimpleTestCase):
+    def test_every_url_has_a_budget(self):
+        resolver = get_resolver()
+        names = set()
+        for namespace in ('admin_panel', 'hr_module', 'employee'):
+            _, sub_resolver = resolver.namespace_dict[namespace]
+            names.update(f'{namespace}:{p.name}' for p in sub_resolver.url_patterns if p.name)
+        self.assertEqual(names - BUDGETS.keys(), set())
+
+
+@override_settings(QUERY_INSPECTOR_ENABLED=True, QUERY_INSPECTOR_RAISE=True)
+class QueryBudgetTests(TestCase):
+    """
+    Every page of admin_panel, hr_module and employee_module stays within
+    its query budget at ROWS attendance/leave/task/log rows, and the query
+    inspector raises on any N+1 shape.
+    """
+    ROWS = 1000
+
+    @classmethod
+    def setUpClass(cls):
+        # before super() so setUpTestData writes its export file there too
+        cube_root = cls.enterClassContext(tempfile.TemporaryDirectory())
+        media_root = cls.enterClassContext(tempfile.TemporaryDirectory())
+        archive_root = cls.enterClassContext(tempfile.TemporaryDirectory())
+        # an unbuffered audit log: every page pays for its own entries and none is left over
+        cls.enterClassContext(override_settings(
+            ATTENDANCE_CUBE_ROOT=cube_root, MEDIA_ROOT=media_root, LOG_ARCHIVE_ROOT=archive_root,
+            AUDIT_LOG_BUFFER_SIZE=1,
+        ))
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        today = date.today()
+        rows = cls.ROWS
+        # no passwords - hashing would dominate the run time
+        cls.admin = User.objects.create(
+            username='admin', email='admin@example.com', role='Admin', is_staff=True, is_superuser=True
+        )
+        depts = [Department.objects.create(name=name) for name in ('IT', 'Sales', 'Finance', 'HR')]
+        it = depts[0]
+        cls.hr = User.objects.create(username='hr', email='hr@example.com', role='HR', department=depts[3])
+        cls.emp = User.objects.create(username='emp', email='emp@example.com', role='Employee', department=it)
+        cls.spare = User.objects.create(username='spare', email='spare@example.com', role='Employee', department=it)
+        staff = [cls.emp] + User.objects.bulk_create([
+            User(username=f'user{i}', email=f'user{i}@example.com', first_name='User', last_name=str(i),
+                 role='Employee', department=depts[i % 3])
+            for i in range(EMPLOYEES - 1)
+        ])
+
+        days = rows // EMPLOYEES
+        Attendance.objects.bulk_create([
+            Attendance(user=user, date=today - timedelta(days=d), marked_by=cls.hr,
+                       status=['Present', 'Absent', 'Half Day'][d % 3])
+            for user in staff for d in range(days)
+        ], batch_size=1000)
+        Leave.objects.bulk_create([
+            Leave(user=staff[i % EMPLOYEES], leave_type='Casual', reason='family',
+                  start_date=today + timedelta(days=i), end_date=today + timedelta(days=i + 1),
+                  status=['Pending', 'Approved', 'Rejected'][i % 3], approved_by=cls.hr if i % 3 else None)
+            for i in range(rows)
+        ], batch_size=1000)
+        Task.objects.bulk_create([
+            Task(assigned_to=staff[i % EMPLOYEES], assigned_by=cls.hr, title=f'Task {i}', description='details',
+                 status=['Pending', 'In Progress', 'Completed'][i % 3], due_date=today + timedelta(days=i % 30 - 15))
+            for i in range(rows)
+        ], batch_size=1000)
+        AuditLog.objects.bulk_create([
+            AuditLog(user=staff[i % EMPLOYEES], action='Login', ip_address='10.0.0.1') for i in range(rows)
+        ], batch_size=1000)
+        LoginAttempt.objects.bulk_create([
+            LoginAttempt(user=staff[i % EMPLOYEES], email=staff[i % EMPLOYEES].email, success=i % 5 != 0)
+            for i in range(rows)
+        ], batch_size=1000)
+        login_stats.rebuild()
+        summary.rebuild()
+        export_job = ExportJob.objects.create(kind='employees', status='Completed', requested_by=cls.admin)
+        export_job.file.save('employees.csv', ContentFile(b'Employee ID\n'))
+
+        cls.objects = {
+            'emp': cls.emp.pk,
+            'spare': cls.spare.pk,
+            'attendance': Attendance.objects.filter(user=cls.emp).first().pk,
+            'leave': Leave.objects.filter(user=cls.emp, status='Pending').first().pk,
+            'task': Task.objects.filter(assigned_to=cls.spare).first().pk
+            if Task.objects.filter(assigned_to=cls.spare).exists()
+            else Task.objects.create(assigned_to=cls.spare, assigned_by=cls.hr, title='Spare', description='-',
+                                     due_date=today).pk,
+            'emp_task': Task.objects.filter(assigned_to=cls.emp, status='Pending').first().pk,
+            'export_kind': 'employees',
+            'export_job': export_job.pk,
+        }
+
+    def request(self, role, url):
+        self.client.force_login({'admin': self.admin, 'hr': self.hr, 'emp': self.emp}[role])
+        # the department list is loaded once per process, not per request
+        departments.get_departments()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        if hasattr(response, 'streaming_content'):
+            b''.join(response.streaming_content)
+        return response, len(queries)
+
+    def test_app_pages(self):
+        for name, (role, kwargs, budget) in BUDGETS.items():
+            with self.subTest(url=name):
+                url = reverse(name, kwargs={key: self.objects[value] for key, value in kwargs.items()})
+                response, count = self.request(role, url)
+                self.assertLess(response.status_code, 400)
+                # the session/user lookup of force_login is included
+                self.assertLessEqual(count, budget, f'{name} ran {count} queries')
+
+    def test_admin_changelists(self):
+        for name, budget in ADMIN_CHANGELISTS.items():
+            with self.subTest(url=name):
+                response, count = self.request('admin', reverse(name))
+                self.assertEqual(response.status_code, 200)
+                self.assertLessEqual(count, budget, f'{name} ran {count} queries')
+
+
+class QueryBudget10kTests(QueryBudgetTests):
+    ROWS = 10000
+
+
+class QueryInspectorMiddlewareTests(TestCase):
+    def run_view(self, view):
+        middleware = QueryInspectorMiddleware(view)
+        return middleware(RequestFactory().get('/'))
+
+    @override_settings(QUERY_INSPECTOR_ENABLED=True, QUERY_INSPECTOR_RAISE=True, QUERY_INSPECTOR_THRESHOLD=3)
+    def test_repeated_shape_raises(self):
+        users = User.objects.bulk_create([User(username=f'u{i}', email=f'u{i}@example.com') for i in range(3)])
+
+        def view(request):
+            for user in users:
+                list(User.objects.filter(pk=user.pk))
+            return HttpResponse()
+
+        with self.assertRaises(NPlusOneError):
+            self.run_view(view)
+
+    @override_settings(QUERY_INSPECTOR_ENABLED=True, QUERY_INSPECTOR_RAISE=True, QUERY_INSPECTOR_THRESHOLD=3)
+    def test_in_lists_of_any_length_share_a_shape(self):
+        def view(request):
+            for n in range(1, 4):
+                list(User.objects.filter(pk__in=range(n)))
+            return HttpResponse()
+
+        with self.assertRaises(NPlusOneError):
+            self.run_view(view)
+
+    @override_settings(QUERY_INSPECTOR_ENABLED=True, QUERY_INSPECTOR_RAISE=True, QUERY_INSPECTOR_THRESHOLD=3)
+    def test_counts_queries(self):
+        def view(request):
+            list(User.objects.all())
+            User.objects.count()
+            return HttpResponse()
+
+        self.assertEqual(self.run_view(view)['X-Query-Count'], '2')
+
+    @override_settings(QUERY_INSPECTOR_ENABLED=True, QUERY_INSPECTOR_RAISE=False, QUERY_INSPECTOR_THRESHOLD=2)
+    def test_findings_are_logged_without_raise(self):
+        def view(request):
+            for pk in range(3):
+                list(User.objects.filter(pk=pk))
+            User.objects.count()
+            return HttpResponse()
+
+        with self.assertLogs('ems.queries', 'WARNING') as logs:
+            response = self.run_view(view)
+        self.assertEqual(response['X-Query-Count'], '4')
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn('Possible N+1 on GET /: 4 queries', logs.output[0])
+        self.assertIn('3x SELECT', logs.output[0])
+
+    @override_settings(QUERY_INSPECTOR_ENABLED=True, QUERY_INSPECTOR_RAISE=True, QUERY_INSPECTOR_THRESHOLD=3)
+    def test_below_the_threshold_passes(self):
+        def view(request):
+            for pk in range(2):
+                list(User.objects.filter(pk=pk))
+            return HttpResponse()
+
+        self.assertEqual(self.run_view(view)['X-Query-Count'], '2')
+
+    @override_settings(QUERY_INSPECTOR_ENABLED=False)
+    def test_disabled(self):
+        self.assertFalse(self.run_view(lambda request: HttpResponse()).has_header('X-Query-Count'))
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class HrModuleConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'hr_module'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,96 @@
+"""
+Set-based attendance writes.
+
+upsert_attendance() writes many (user, date) rows with one INSERT ... ON
+CONFLICT DO UPDATE per batch instead of an update_or_create round trip per
+row. bulk_create does not send save signals, so the daily summary deltas are
+worked out from the rows being replaced and recorded here, and the attendance
+cube sync is queued here too.
+
+Approved leaves are written as a whole date range of 'On Leave' rows linked
+to the leave, and those rows are removed again when the approval is withdrawn.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+
+from admin_panel.stats import ATTENDANCE_VERSION, bump_data_version
+
+from .models import Attendance
+from . import cube, summary
+
+BATCH_SIZE = 500
+
+
+def existing_statuses(user_ids, dates):
+    """{(user_id, date): status} of the stored rows among user_ids x dates"""
+    user_ids = list(user_ids)
+    found = {}
+    for start in range(0, len(user_ids), BATCH_SIZE):
+        rows = Attendance.objects.filter(
+            user_id__in=user_ids[start:start + BATCH_SIZE],
+            date__gte=min(dates), date__lte=max(dates),
+        ).values_list('user_id', 'date', 'status')
+        found.update(((user_id, day), status) for user_id, day, status in rows)
+    return found
+
+
+def upsert_attendance(records, update_fields):
+    """
+    Insert or update unsaved Attendance `records` keyed on (user, date).
+    Existing rows only get `update_fields` (and updated_at) overwritten.
+    Returns the number of rows written.
+    """
+    if not records:
+        return 0
+    for record in records:
+        record.date = summary._as_date(record.date)
+
+    with transaction.atomic(), summary.batch():
+        previous = existing_statuses({r.user_id for r in records}, {r.date for r in records})
+        for record in records:
+            old = previous.get((record.user_id, record.date))
+            if old != record.status:
+                if old is not None:
+                    summary.record(record.user_id, record.date, old, -1)
+                summary.record(record.user_id, record.date, record.status, 1)
+
+        Attendance.objects.bulk_create(
+            records,
+            batch_size=BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['user', 'date'],
+            update_fields=list(update_fields) + ['updated_at'],
+        )
+        bump_data_version(ATTENDANCE_VERSION)
+        cube.sync_after_commit({record.date for record in records})
+    return len(records)
+
+
+def leave_note(leave):
+    return f'{leave.leave_type} - Approved'
+
+
+def mark_leave(leave, marked_by):
+    """Upsert an 'On Leave' attendance row for every day of an approved leave"""
+    days = (leave.end_date - leave.start_date).days + 1
+    records = [
+        Attendance(
+            user_id=leave.user_id,
+            date=leave.start_date + timedelta(days=n),
+            status='On Leave',
+            marked_by=marked_by,
+            notes=leave_note(leave),
+            leave_request=leave,
+        )
+        for n in range(days)
+    ]
+    return upsert_attendance(records, update_fields=['status', 'marked_by', 'notes', 'leave_request'])
+
+
+def unmark_leave(leave):
+    """Delete the 'On Leave' rows mark_leave wrote for `leave`"""
+    with transaction.atomic(), summary.batch():
+        # rows re-marked as something else since keep their new status
+        deleted, _ = Attendance.objects.filter(leave_request=leave, status='On Leave').delete()
+    return deleted
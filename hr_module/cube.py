@@ -0,0 +1,389 @@
+"""
+Attendance cube: an employee x day matrix per year in memory-mapped files.
+
+Each build of a year lives in ATTENDANCE_CUBE_ROOT/<year>/v<n>/ as
+  status.bin   uint8  [row x 366]  0 = not marked, else STATUS_CODES
+  minutes.bin  uint16 [row x 366]  worked minutes (check in to check out)
+  meta.json    user id of every row, last sync time, number of marked cells
+and ATTENDANCE_CUBE_ROOT/<year>/current names the live build. A full build
+writes a new v<n> directory and then replaces `current` in one atomic rename,
+so a reader always gets the files and the metadata of the same build.
+
+Reading a cell is an offset computation into the mapped file, so month grids
+and exports never load Attendance rows through the ORM. sync() brings a built
+year up to date in place from the rows whose updated_at moved since the last
+sync, and clears the cells of the rows deleted since. It runs after each
+transaction that writes or deletes attendance (sync_after_commit), which
+names the deleted cells. Full builds only run from `manage.py
+build_attendance_cube`: neither page views nor writes build a year that has
+no cube yet.
+"""
+import calendar
+import json
+import mmap
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Attendance
+
+try:
+    import fcntl
+except ImportError:  # Windows - the in-process lock still applies
+    fcntl = None
+
+DAYS = 366
+MAX_MINUTES = 0xFFFF
+
+STATUS_CODES = {status: code for code, (status, _) in enumerate(Attendance.STATUS_CHOICES, start=1)}
+STATUS_NAMES = {code: status for status, code in STATUS_CODES.items()}
+
+# rows changed in transactions that committed after a sync started
+SYNC_OVERLAP = timedelta(minutes=5)
+
+_lock = threading.Lock()
+
+
+def cube_dir(year):
+    return Path(settings.ATTENDANCE_CUBE_ROOT) / str(year)
+
+
+def _current_build(year):
+    """Directory of the live build of `year`, None if it was never built"""
+    try:
+        name = (cube_dir(year) / 'current').read_text().strip()
+    except FileNotFoundError:
+        return None
+    return cube_dir(year) / name
+
+
+def _builds(year):
+    """Build directories of `year`, oldest first"""
+    directory = cube_dir(year)
+    if not directory.exists():
+        return []
+    builds = [path for path in directory.iterdir() if path.is_dir() and path.name[1:].isdigit()]
+    return sorted(builds, key=lambda path: int(path.name[1:]))
+
+
+def worked_minutes(check_in, check_out):
+    if not check_in or not check_out:
+        return 0
+    start = check_in.hour * 60 + check_in.minute
+    end = check_out.hour * 60 + check_out.minute
+    return min(max(end - start, 0), MAX_MINUTES)
+
+
+@contextmanager
+def _year_lock(year):
+    directory = cube_dir(year)
+    directory.mkdir(parents=True, exist_ok=True)
+    with _lock, open(directory / 'lock', 'a') as handle:
+        if fcntl:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+class AttendanceCube:
+    """One year of the cube. Open read-only unless syncing."""
+
+    def __init__(self, year, writable=False, fresh=False):
+        self.year = year
+        self.writable = writable or fresh
+        # fresh cubes are built in a new directory and published on save
+        self.fresh = fresh
+        self.first_day = date(year, 1, 1).toordinal()
+        self.rows = {}
+        self.synced_at = None
+        self.cells = 0
+        self.capacity = 0
+        self.built = False
+        self._files = []
+        self.status = self.minutes = None
+
+        if fresh:
+            builds = _builds(year)
+            number = int(builds[-1].name[1:]) + 1 if builds else 1
+            self.directory = cube_dir(year) / f'v{number}'
+            self.directory.mkdir(parents=True)
+        else:
+            self.directory = _current_build(year)
+            if self.directory is not None:
+                meta = json.loads((self.directory / 'meta.json').read_text())
+                self.rows = {user_id: index for index, user_id in enumerate(meta['users'])}
+                self.synced_at = datetime.fromisoformat(meta['synced_at']) if meta['synced_at'] else None
+                self.cells = meta['cells']
+                self.capacity = meta['capacity']
+                self.built = True
+        if self.capacity:
+            self._map()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def exists(self):
+        return self.status is not None
+
+    def close(self):
+        if self.status is not None:
+            self._minutes.release()
+        for mapped in (self.status, self.minutes):
+            if mapped is not None:
+                mapped.close()
+        for handle in self._files:
+            handle.close()
+        self._files = []
+        self.status = self.minutes = None
+
+    def _path(self, name):
+        return self.directory / name
+
+    def _map(self):
+        mode = 'r+b' if self.writable else 'rb'
+        access = mmap.ACCESS_WRITE if self.writable else mmap.ACCESS_READ
+        maps = []
+        for name in ('status.bin', 'minutes.bin'):
+            handle = open(self._path(name), mode)
+            self._files.append(handle)
+            maps.append(mmap.mmap(handle.fileno(), 0, access=access))
+        self.status = maps[0]
+        # minutes as a uint16 view over the mapped bytes
+        self.minutes = maps[1]
+        self._minutes = memoryview(self.minutes).cast('H')
+
+    def _grow(self, rows):
+        capacity = max(self.capacity * 2, rows, 256)
+        self.close()
+        for name, width in (('status.bin', 1), ('minutes.bin', 2)):
+            with open(self._path(name), 'ab') as handle:
+                handle.truncate(capacity * DAYS * width)
+        self.capacity = capacity
+        self._map()
+
+    def index(self, day):
+        return day.toordinal() - self.first_day
+
+    # reading
+
+    def get(self, user_id, day):
+        """(status or None, worked minutes) for one cell"""
+        row = self.rows.get(user_id)
+        if row is None or not self.exists:
+            return None, 0
+        offset = row * DAYS + self.index(day)
+        return STATUS_NAMES.get(self.status[offset]), self._minutes[offset]
+
+    def span(self, user_id, start, end):
+        """Status codes and minutes of user_id for the days start..end inclusive"""
+        length = (end - start).days + 1
+        row = self.rows.get(user_id)
+        if row is None or not self.exists:
+            return bytes(length), [0] * length
+        offset = row * DAYS + self.index(start)
+        return self.status[offset:offset + length], self._minutes[offset:offset + length].tolist()
+
+    # writing
+
+    def set(self, user_id, day, status, minutes):
+        row = self.rows.get(user_id)
+        if row is None:
+            row = len(self.rows)
+            if row >= self.capacity:
+                self._grow(row + 1)
+            self.rows[user_id] = row
+        offset = row * DAYS + self.index(day)
+        if self.status[offset] == 0:
+            self.cells += 1
+        self.status[offset] = STATUS_CODES.get(status, 0)
+        self._minutes[offset] = minutes
+
+    def clear(self, user_id, day):
+        row = self.rows.get(user_id)
+        if row is None or not self.exists:
+            return
+        offset = row * DAYS + self.index(day)
+        if self.status[offset]:
+            self.cells -= 1
+        self.status[offset] = 0
+        self._minutes[offset] = 0
+
+    def save(self, synced_at):
+        if self.exists:
+            self.status.flush()
+            self.minutes.flush()
+            # on disk before the metadata or the build is published
+            for handle in self._files:
+                os.fsync(handle.fileno())
+        self.synced_at = synced_at
+        users = sorted(self.rows, key=self.rows.get)
+        meta = {
+            'users': users,
+            'synced_at': synced_at.isoformat(),
+            'cells': self.cells,
+            'capacity': self.capacity,
+        }
+        _write_atomic(self.directory / 'meta.json', json.dumps(meta).encode())
+        if self.fresh:
+            previous = _current_build(self.year)
+            # readers switch to the new files and metadata together; those still
+            # reading the old build keep their mapping until they reopen
+            _write_atomic(cube_dir(self.year) / 'current', self.directory.name.encode())
+            self.fresh = False
+            self.built = True
+            # keep the previous build for readers that just looked up `current`
+            for old in _builds(self.year):
+                if old not in (self.directory, previous):
+                    shutil.rmtree(old, ignore_errors=True)
+
+
+def _write_atomic(path, data):
+    temp = path.with_name(path.name + '.tmp')
+    with open(temp, 'wb') as handle:
+        handle.write(data)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(temp, path)
+
+
+def _year_rows(year):
+    return Attendance.objects.filter(date__gte=date(year, 1, 1), date__lte=date(year, 12, 31))
+
+
+def _load(cube, rows):
+    written = 0
+    for user_id, day, status, check_in, check_out in rows.values_list(
+        'user_id', 'date', 'status', 'check_in_time', 'check_out_time'
+    ).iterator(chunk_size=5000):
+        cube.set(user_id, day, status, worked_minutes(check_in, check_out))
+        written += 1
+    return written
+
+
+def _clear(cube, cells):
+    """Clear the cells of deleted rows. Returns the number cleared."""
+    cells = set(cells)
+    if not cells:
+        return 0
+    # a row written again since its delete was synced by its own writer
+    user_ids = sorted({user_id for user_id, _ in cells})
+    days = [day for _, day in cells]
+    for start in range(0, len(user_ids), 500):
+        cells -= set(Attendance.objects.filter(
+            user_id__in=user_ids[start:start + 500], date__gte=min(days), date__lte=max(days),
+        ).values_list('user_id', 'date'))
+    for user_id, day in cells:
+        cube.clear(user_id, day)
+    return len(cells)
+
+
+def sync(year, full=False, cleared=(), build=True):
+    """
+    Bring one year of the cube up to date, clearing the (user id, day) cells
+    in `cleared` whose rows were deleted. Returns (mode, rows written) where
+    mode is 'full', 'incremental', or 'skipped' for a year that has no cube
+    when build is False.
+    """
+    with _year_lock(year):
+        started = timezone.now()
+        rows = _year_rows(year)
+        if not full:
+            with AttendanceCube(year, writable=True) as cube:
+                if cube.built:
+                    written = _clear(cube, cleared)
+                    written += _load(cube, rows.filter(updated_at__gte=cube.synced_at - SYNC_OVERLAP))
+                    cube.save(started)
+                    return 'incremental', written
+            if not build:
+                return 'skipped', 0
+
+        with AttendanceCube(year, fresh=True) as cube:
+            written = _load(cube, rows)
+            cube.save(started)
+        return 'full', written
+
+
+def open_year(year, refresh=True):
+    """
+    Read-only cube for `year`, synced first unless refresh is False. Pages
+    pass refresh=False: attendance writes sync the cube after they commit
+    (sync_after_commit), and a year never built stays empty (cube.built is
+    False) until `manage.py build_attendance_cube` builds it.
+    """
+    if refresh:
+        sync(year)
+    return AttendanceCube(year)
+
+
+class _YearSync:
+    """on_commit callback syncing the years written in one transaction"""
+
+    def __init__(self):
+        self.years = set()
+        self.cleared = set()
+
+    def add(self, days, cleared):
+        self.years |= {day.year for day in days}
+        self.cleared |= set(cleared)
+        self.years |= {day.year for _, day in cleared}
+
+    def __call__(self):
+        for year in sorted(self.years):
+            # only built years - full builds are left to build_attendance_cube
+            sync(year, cleared=[cell for cell in self.cleared if cell[1].year == year], build=False)
+
+
+def sync_after_commit(days, cleared=()):
+    """
+    Sync the cube years of `days` once the current transaction commits,
+    clearing the (user id, day) cells in `cleared` of the rows it deleted.
+    """
+    connection = transaction.get_connection()
+    # one sync per year however many rows the transaction writes. Only join a
+    # callback of this savepoint or an enclosing one - one queued in an inner
+    # savepoint since released can still be rolled back and lose the years.
+    savepoints = set(connection.savepoint_ids)
+    for sids, callback, _ in connection.run_on_commit:
+        if isinstance(callback, _YearSync) and sids <= savepoints:
+            callback.add(days, cleared)
+            return
+    callback = _YearSync()
+    callback.add(days, cleared)
+    # robust: a failed sync leaves the cube for the next one, the write stands
+    transaction.on_commit(callback, robust=True)
+
+
+def month_rows(cube, employees, year, month):
+    """
+    One dict per employee with the day-by-day statuses of the month and
+    present days, marked days, attendance percentage and hours worked.
+    """
+    start = date(year, month, 1)
+    end = date(year, month, calendar.monthrange(year, month)[1])
+    present_code = STATUS_CODES['Present']
+    for employee in employees:
+        codes, minutes = cube.span(employee.id, start, end)
+        marked = len(codes) - codes.count(0)
+        present = codes.count(present_code)
+        yield {
+            'employee': employee,
+            'days': [STATUS_NAMES.get(code) for code in codes],
+            'present': present,
+            'marked': marked,
+            'percentage': round(present / marked * 100, 2) if marked else 0,
+            'hours': round(sum(minutes) / 60, 2),
+        }
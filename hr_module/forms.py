@@ -1,10 +1,36 @@
 from django import forms
 from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.utils.html import format_html
 from .models import Attendance, Leave, Task
+from . import picker
 from datetime import date
 
 User = get_user_model()
 
+# Type-ahead employee picker - renders no <option> list, the form field only
+# validates the submitted id against its queryset
+class EmployeePickerWidget(forms.Widget):
+    class Media:
+        js = ('js/employee_picker.js',)
+    
+    def render(self, name, value, attrs=None, renderer=None):
+        attrs = self.build_attrs(self.attrs, attrs)
+        input_id = attrs.get('id', f'id_{name}')
+        return format_html(
+            '<div class="employee-picker" data-url="{}">'
+            '<input type="hidden" name="{}" id="{}" value="{}">'
+            '<input type="text" class="form-control" list="{}_options" value="{}" autocomplete="off" '
+            'placeholder="Type a name, username or employee ID"{}>'
+            '<datalist id="{}_options"></datalist>'
+            '</div>',
+            reverse('hr_module:employee_search'),
+            name, input_id, '' if value is None else value,
+            input_id, picker.label(value) if value else '',
+            ' required' if self.is_required else '',
+            input_id,
+        )
+
 # Attendance form for marking attendance and editing existing records
 class AttendanceForm(forms.ModelForm):
     class Meta:
@@ -15,13 +41,13 @@ class AttendanceForm(forms.ModelForm):
             'check_in_time': forms.TimeInput(attrs={'type': 'time', 'class': 'form-control'}),
             'check_out_time': forms.TimeInput(attrs={'type': 'time', 'class': 'form-control'}),
             'notes': forms.Textarea(attrs={'rows': 3, 'class': 'form-control'}),
-            'user': forms.Select(attrs={'class': 'form-select'}),
+            'user': EmployeePickerWidget(),
             'status': forms.Select(attrs={'class': 'form-select'}),
         }
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.fields['user'].queryset = User.objects.filter(role__in=['Employee', 'HR'], is_active=True)
+        self.fields['user'].queryset = picker.employee_choices()
         self.fields['date'].initial = date.today()
 
 # Bulk Attendance form
@@ -44,13 +70,13 @@ class LeaveForm(forms.ModelForm):
             'start_date': forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}),
             'end_date': forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}),
             'reason': forms.Textarea(attrs={'rows': 4, 'class': 'form-control'}),
-            'user': forms.Select(attrs={'class': 'form-select'}),
+            'user': EmployeePickerWidget(),
             'leave_type': forms.Select(attrs={'class': 'form-select'}),
         }
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.fields['user'].queryset = User.objects.filter(role__in=['Employee', 'HR'], is_active=True)
+        self.fields['user'].queryset = picker.employee_choices()
     
     def clean(self):
         cleaned_data = super().clean()
@@ -82,7 +108,7 @@ class TaskForm(forms.ModelForm):
         model = Task
         fields = ['assigned_to', 'title', 'description', 'priority', 'due_date', 'attachment_file']
         widgets = {
-            'assigned_to': forms.Select(attrs={'class': 'form-select'}),
+            'assigned_to': EmployeePickerWidget(),
             'title': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Enter task title'}),
             'description': forms.Textarea(attrs={'rows': 4, 'class': 'form-control', 'placeholder': 'Enter task description'}),
             'priority': forms.Select(attrs={'class': 'form-select'}),
@@ -92,7 +118,7 @@ class TaskForm(forms.ModelForm):
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.fields['assigned_to'].queryset = User.objects.filter(role__in=['Employee', 'HR'], is_active=True)
+        self.fields['assigned_to'].queryset = picker.employee_choices()
         self.fields['attachment_file'].required = False
         self.fields['attachment_file'].help_text = 'Upload any reference documents (PDF, Word, Excel, PowerPoint, etc.)'
     
@@ -0,0 +1,24 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from hr_module.cube import sync
+
+
+class Command(BaseCommand):
+    help = 'Build the memory-mapped attendance cube, or bring a built year up to date'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--year', type=int, action='append',
+                            help='Year to sync, may be repeated (default: current year)')
+        parser.add_argument('--full', action='store_true',
+                            help='Rebuild from scratch instead of syncing changed rows')
+
+    def handle(self, *args, **options):
+        for year in options['year'] or [date.today().year]:
+            started = time.monotonic()
+            mode, written = sync(year, full=options['full'])
+            self.stdout.write(self.style.SUCCESS(
+                f'{year}: {mode} sync, {written} rows written in {time.monotonic() - started:.2f}s'
+            ))
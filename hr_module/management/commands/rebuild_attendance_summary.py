@@ -0,0 +1,23 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from hr_module.summary import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Regenerate DailyAttendanceSummary and EmployeeMonthlyAttendance from the Attendance history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='start', help='First date to rebuild (YYYY-MM-DD)')
+        parser.add_argument('--to', dest='end', help='Last date to rebuild (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        try:
+            start = date.fromisoformat(options['start']) if options['start'] else None
+            end = date.fromisoformat(options['end']) if options['end'] else None
+        except ValueError as e:
+            raise CommandError(f'Invalid date: {e}')
+
+        cells = rebuild(start, end)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {cells} summary rows'))
@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from hr_module.search import get_backend
+
+
+class Command(BaseCommand):
+    help = 'Regenerate the task full-text search index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000,
+                            help='Tasks indexed per batch (default 5000)')
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        started = time.monotonic()
+        total = backend.rebuild(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {total} tasks with {type(backend).__name__} in {time.monotonic() - started:.1f}s'
+        ))
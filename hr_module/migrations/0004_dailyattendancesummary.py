@@ -0,0 +1,44 @@
+# Generated by Django 5.2.11 on 2026-10-18 03:33
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_daily_summary(apps, schema_editor):
+    # departments are still free text on the user here
+    Attendance = apps.get_model('hr_module', 'Attendance')
+    DailyAttendanceSummary = apps.get_model('hr_module', 'DailyAttendanceSummary')
+    rows = Attendance.objects.values('date', 'user__department', 'status').annotate(total=Count('id')).order_by()
+    DailyAttendanceSummary.objects.bulk_create([
+        DailyAttendanceSummary(
+            date=row['date'], department=row['user__department'] or '', status=row['status'], count=row['total']
+        )
+        for row in rows.iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hr_module', '0003_task_attachment_file_alter_task_submission_file'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyAttendanceSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('department', models.CharField(blank=True, max_length=100)),
+                ('status', models.CharField(choices=[('Present', 'Present'), ('Absent', 'Absent'), ('Half Day', 'Half Day'), ('On Leave', 'On Leave'), ('Holiday', 'Holiday')], max_length=20)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-date', 'department'],
+                'unique_together': {('date', 'department', 'status')},
+            },
+        ),
+        migrations.RunPython(fill_daily_summary, migrations.RunPython.noop),
+    ]
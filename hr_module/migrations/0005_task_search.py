@@ -0,0 +1,37 @@
+from django.db import migrations
+from django.db.utils import OperationalError
+
+
+def create_search_index(apps, schema_editor):
+    # FTS5 is SQLite only; other databases use the unindexed search backend
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    try:
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS hr_module_task_search "
+            "USING fts5(title, description, assignee, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+    except OperationalError:
+        # SQLite built without FTS5
+        return
+    schema_editor.execute(
+        "INSERT INTO hr_module_task_search (rowid, title, description, assignee) "
+        "SELECT t.id, t.title, t.description, TRIM(u.first_name || ' ' || u.last_name) "
+        "FROM hr_module_task t JOIN users_customuser u ON u.id = t.assigned_to_id"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS hr_module_task_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hr_module', '0004_dailyattendancesummary'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.11 on 2026-10-18 03:41
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hr_module', '0005_task_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['date', 'status'], name='attendance_date_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leave',
+            index=models.Index(fields=['status', 'applied_at'], name='leave_status_applied_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leave',
+            index=models.Index(fields=['user', 'start_date', 'end_date'], name='leave_user_dates_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['assigned_to', 'status', 'due_date'], name='task_assignee_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['assigned_by', 'created_at'], name='task_assigner_created_idx'),
+        ),
+    ]
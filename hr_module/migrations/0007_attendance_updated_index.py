@@ -0,0 +1,19 @@
+# Generated by Django 5.2.11 on 2026-10-18 03:52
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hr_module', '0006_hot_query_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['updated_at'], name='attendance_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.11 on 2026-10-18 03:57
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncMonth
+
+
+def fill_monthly_attendance(apps, schema_editor):
+    Attendance = apps.get_model('hr_module', 'Attendance')
+    EmployeeMonthlyAttendance = apps.get_model('hr_module', 'EmployeeMonthlyAttendance')
+    rows = Attendance.objects.annotate(month=TruncMonth('date')).values('user_id', 'month', 'status').annotate(
+        total=Count('id')
+    ).order_by()
+    EmployeeMonthlyAttendance.objects.bulk_create([
+        EmployeeMonthlyAttendance(user_id=row['user_id'], month=row['month'], status=row['status'], count=row['total'])
+        for row in rows.iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hr_module', '0007_attendance_updated_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmployeeMonthlyAttendance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('status', models.CharField(choices=[('Present', 'Present'), ('Absent', 'Absent'), ('Half Day', 'Half Day'), ('On Leave', 'On Leave'), ('Holiday', 'Holiday')], max_length=20)),
+                ('count', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_attendance', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-month'],
+                'unique_together': {('user', 'month', 'status')},
+            },
+        ),
+        migrations.RunPython(fill_monthly_attendance, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.11 on 2026-10-18 05:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def link_leave_days(apps, schema_editor):
+    # rows marked for approved leaves so far only carry the '<type> - Approved' note
+    Attendance = apps.get_model('hr_module', 'Attendance')
+    Leave = apps.get_model('hr_module', 'Leave')
+    for leave in Leave.objects.filter(status='Approved').order_by('id').iterator():
+        Attendance.objects.filter(
+            user_id=leave.user_id,
+            date__gte=leave.start_date,
+            date__lte=leave.end_date,
+            status='On Leave',
+            notes=f'{leave.leave_type} - Approved',
+        ).update(leave_request=leave)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hr_module', '0008_employeemonthlyattendance'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendance',
+            name='leave_request',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='attendance_days', to='hr_module.leave'),
+        ),
+        migrations.RunPython(link_leave_days, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.11 on 2026-10-18 05:55
+
+from collections import Counter
+
+import django.db.models.deletion
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+def key_on_department_ids(apps, schema_editor):
+    # rows are labelled with the department names users 0004 settled on;
+    # names no department has any more are counted under no department
+    Department = apps.get_model('users', 'Department')
+    DailyAttendanceSummary = apps.get_model('hr_module', 'DailyAttendanceSummary')
+    ids = {name.casefold(): pk for pk, name in Department.objects.values_list('id', 'name')}
+    cells = Counter()
+    for day, name, status, count in DailyAttendanceSummary.objects.values_list('date', 'department', 'status', 'count'):
+        cells[(day, ids.get(' '.join(name.split()).casefold()), status)] += count
+    DailyAttendanceSummary.objects.all().delete()
+    DailyAttendanceSummary.objects.bulk_create([
+        DailyAttendanceSummary(date=day, department='', department_ref_id=department_id, status=status, count=total)
+        for (day, department_id, status), total in cells.items()
+    ], batch_size=1000)
+
+
+def restore_department_names(apps, schema_editor):
+    Department = apps.get_model('users', 'Department')
+    DailyAttendanceSummary = apps.get_model('hr_module', 'DailyAttendanceSummary')
+    for department in Department.objects.all():
+        DailyAttendanceSummary.objects.filter(department_ref=department).update(department=department.name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hr_module', '0009_attendance_leave_request'),
+        ('users', '0004_department'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='dailyattendancesummary',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='dailyattendancesummary',
+            name='department_ref',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='users.department'),
+        ),
+        migrations.RunPython(key_on_department_ids, restore_department_names),
+        migrations.RemoveField(
+            model_name='dailyattendancesummary',
+            name='department',
+        ),
+        migrations.RenameField(
+            model_name='dailyattendancesummary',
+            old_name='department_ref',
+            new_name='department',
+        ),
+        migrations.AddConstraint(
+            model_name='dailyattendancesummary',
+            constraint=models.UniqueConstraint(models.F('date'), django.db.models.functions.comparison.Coalesce('department', models.Value(0)), models.F('status'), name='attendance_summary_cell_unique'),
+        ),
+    ]
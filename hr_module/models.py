@@ -1,8 +1,12 @@
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.conf import settings
 from django.utils import timezone
 from datetime import datetime, time
 
+# Attendance columns the CSV export shows besides user, date and status (see exports.attendance_rows)
+EXPORTED_FIELDS = ('check_in_time', 'check_out_time', 'notes')
+
 # Attendance model to track daily attendance of employees
 class Attendance(models.Model):
     STATUS_CHOICES = (
@@ -22,16 +26,35 @@ class Attendance(models.Model):
     marked_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name='marked_attendances')
     is_verified = models.BooleanField(default=False)
     verified_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='verified_attendances')
+    # the approved leave this 'On Leave' row was written for
+    leave_request = models.ForeignKey('Leave', on_delete=models.SET_NULL, null=True, blank=True, related_name='attendance_days')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         unique_together = ['user', 'date']
         ordering = ['-date']
+        indexes = [
+            models.Index(fields=['date', 'status'], name='attendance_date_status_idx'),
+            # incremental attendance cube sync
+            models.Index(fields=['updated_at'], name='attendance_updated_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.date} - {self.status}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # remember the loaded state so saves can adjust the daily summary
+        loaded = dict(zip(field_names, values))
+        if {'user_id', 'date', 'status'} <= loaded.keys():
+            instance._summary_key = (loaded['user_id'], loaded['date'], loaded['status'])
+        # and whether a save changes what the attendance export shows
+        if loaded.keys() >= set(EXPORTED_FIELDS):
+            instance._exported = tuple(loaded[field] for field in EXPORTED_FIELDS)
+        return instance
+    
     def get_working_hours(self):
         if self.check_in_time and self.check_out_time:
             check_in = datetime.combine(datetime.today(), self.check_in_time)
@@ -41,6 +64,42 @@ class Attendance(models.Model):
             return round(hours, 2)
         return 0
 
+# Attendance counts per day, department and status (HR dashboard)
+# Maintained incrementally by hr_module.summary, rebuild with `manage.py rebuild_attendance_summary`
+# Keyed on the department id, so a rename moves nothing; names are joined when shown
+class DailyAttendanceSummary(models.Model):
+    date = models.DateField()
+    # null counts employees without a department
+    department = models.ForeignKey('users.Department', on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    status = models.CharField(max_length=20, choices=Attendance.STATUS_CHOICES)
+    count = models.IntegerField(default=0)
+    
+    class Meta:
+        constraints = [
+            # one cell per day, department and status - no department included
+            models.UniqueConstraint(
+                'date', Coalesce('department', models.Value(0)), 'status', name='attendance_summary_cell_unique'
+            ),
+        ]
+        ordering = ['-date', 'department']
+    
+    def __str__(self):
+        return f"{self.date} - {self.department_id or 'Not Assigned'} - {self.status}: {self.count}"
+
+# Attendance counts per employee, month and status - kept in step with Attendance by summary.py
+class EmployeeMonthlyAttendance(models.Model):
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='monthly_attendance')
+    month = models.DateField()  # first day of the month
+    status = models.CharField(max_length=20, choices=Attendance.STATUS_CHOICES)
+    count = models.IntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['user', 'month', 'status']
+        ordering = ['-month']
+    
+    def __str__(self):
+        return f"{self.user_id} - {self.month:%Y-%m} - {self.status}: {self.count}"
+
 # Leave model
 class Leave(models.Model):
     LEAVE_TYPE_CHOICES = (
@@ -72,6 +131,10 @@ class Leave(models.Model):
     
     class Meta:
         ordering = ['-applied_at']
+        indexes = [
+            models.Index(fields=['status', 'applied_at'], name='leave_status_applied_idx'),
+            models.Index(fields=['user', 'start_date', 'end_date'], name='leave_user_dates_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.leave_type} ({self.start_date} to {self.end_date})"
@@ -121,6 +184,10 @@ class Task(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['assigned_to', 'status', 'due_date'], name='task_assignee_status_idx'),
+            models.Index(fields=['assigned_by', 'created_at'], name='task_assigner_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.title} - {self.assigned_to.username}"
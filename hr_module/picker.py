@@ -0,0 +1,87 @@
+"""
+In-memory prefix index behind the employee picker.
+
+Every active Employee/HR user is listed under the lowercased first name,
+last name, full name, username and employee ID in one sorted list, so a
+type-ahead lookup is a bisect to the first key starting with the query and a
+scan while keys keep matching. The index is built once per process and
+rebuilt when the users data version (admin_panel.stats, bumped on user
+changes) moves on. That version is read from the database on every lookup,
+so a change made through one process reaches the index of every other one.
+"""
+import threading
+from bisect import bisect_left
+
+from django.contrib.auth import get_user_model
+
+from admin_panel.stats import data_version
+
+MAX_RESULTS = 20
+
+_lock = threading.Lock()
+_index = None
+
+
+def employee_choices():
+    """Users the HR forms may pick"""
+    return get_user_model().objects.filter(role__in=['Employee', 'HR'], is_active=True)
+
+
+class EmployeeIndex:
+    def __init__(self, version, rows):
+        self.version = version
+        self.labels = {}
+        entries = set()
+        for user_id, first_name, last_name, username, employee_id, department in rows:
+            name = f'{first_name} {last_name}'.strip() or username
+            self.labels[user_id] = ' - '.join(part for part in (name, employee_id, department) if part)
+            for key in (first_name, last_name, name, username, employee_id):
+                if key:
+                    entries.add((key.lower(), user_id))
+        entries = sorted(entries)
+        self.keys = [key for key, _ in entries]
+        self.ids = [user_id for _, user_id in entries]
+
+    def search(self, query, limit=MAX_RESULTS):
+        """[(user id, label)] of users with a key starting with `query`"""
+        query = ' '.join(query.lower().split())
+        if not query:
+            return []
+        results = []
+        seen = set()
+        position = bisect_left(self.keys, query)
+        while position < len(self.keys) and self.keys[position].startswith(query) and len(results) < limit:
+            user_id = self.ids[position]
+            if user_id not in seen:
+                seen.add(user_id)
+                results.append((user_id, self.labels[user_id]))
+            position += 1
+        return results
+
+
+def get_index():
+    global _index
+    version = data_version()
+    index = _index
+    if index is None or index.version != version:
+        with _lock:
+            if _index is None or _index.version != version:
+                rows = employee_choices().values_list(
+                    'id', 'first_name', 'last_name', 'username', 'employee_id', 'department__name'
+                ).iterator(chunk_size=5000)
+                _index = EmployeeIndex(version, rows)
+            index = _index
+    return index
+
+
+def search(query, limit=MAX_RESULTS):
+    if not query.strip():
+        return []
+    return get_index().search(query, limit)
+
+
+def label(user_id):
+    try:
+        return get_index().labels.get(int(user_id), '')
+    except (TypeError, ValueError):
+        return ''
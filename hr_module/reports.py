@@ -0,0 +1,115 @@
+"""
+Cached employee attendance report statistics.
+
+The status counts of a (user, start, end) range are read from the
+EmployeeMonthlyAttendance rollup for every whole month inside the range and
+from Attendance only for the partial months at either end, each in one
+GROUP BY status query - so a multi-year range costs O(months), not O(days).
+
+Results are cached under a per-user version that summary.apply() replaces
+whenever that user's attendance changes, plus a global version replaced by
+summary rebuilds.
+"""
+import uuid
+from collections import Counter
+from datetime import timedelta
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+
+from .models import Attendance, EmployeeMonthlyAttendance
+
+VERSION_KEY = 'attendance_report:version'
+
+
+def _user_version_key(user_id):
+    return f'attendance_report:version:{user_id}'
+
+
+def _fresh_version():
+    # unique, so a version lost from the cache can never match old entries
+    return uuid.uuid4().hex
+
+
+def get_version(user_id):
+    keys = [VERSION_KEY, _user_version_key(user_id)]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _fresh_version(), timeout=None)
+            versions[key] = cache.get(key)
+    return '.'.join(versions[key] for key in keys)
+
+
+def bump_report_versions(user_ids):
+    """Invalidate the cached reports of `user_ids`, or of everyone when None"""
+    if user_ids is None:
+        cache.set(VERSION_KEY, _fresh_version(), timeout=None)
+    elif user_ids:
+        version = _fresh_version()
+        cache.set_many({_user_version_key(user_id): version for user_id in user_ids}, timeout=None)
+
+
+def next_month(day):
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _day_counts(user_id, days):
+    return dict(
+        Attendance.objects.filter(days, user_id=user_id).values_list('status').annotate(total=Count('id')).order_by()
+    )
+
+
+def status_counts(user_id, start=None, end=None):
+    """Counter of attendance statuses of `user_id` between start and end inclusive"""
+    # whole months of the range are first_month <= month < end_month
+    first_month = start if start is None or start.day == 1 else next_month(start)
+    if end is None:
+        end_month = None
+    else:
+        end_month = next_month(end) if (end + timedelta(days=1)).day == 1 else end.replace(day=1)
+
+    if first_month and end_month and first_month >= end_month:
+        # no whole month in the range
+        return Counter(_day_counts(user_id, Q(date__gte=start, date__lte=end)))
+
+    rollups = EmployeeMonthlyAttendance.objects.filter(user_id=user_id)
+    if first_month:
+        rollups = rollups.filter(month__gte=first_month)
+    if end_month:
+        rollups = rollups.filter(month__lt=end_month)
+    counts = Counter(dict(rollups.values_list('status').annotate(total=Sum('count')).order_by()))
+
+    # the partial months at either end, in one query
+    edges = []
+    if start and start < first_month:
+        edges.append(Q(date__gte=start, date__lt=first_month))
+    if end and end_month <= end:
+        edges.append(Q(date__gte=end_month, date__lte=end))
+    if edges:
+        counts.update(_day_counts(user_id, reduce(or_, edges)))
+    return counts
+
+
+def attendance_stats(user_id, start=None, end=None):
+    """The statistics shown on the employee attendance report, cached"""
+    key = 'attendance_report:{}:{}:{}:{}'.format(
+        get_version(user_id), user_id, start.isoformat() if start else '', end.isoformat() if end else ''
+    )
+    stats = cache.get(key)
+    if stats is None:
+        counts = status_counts(user_id, start, end)
+        total = sum(counts.values())
+        stats = {
+            'total_days': total,
+            'present_days': counts['Present'],
+            'absent_days': counts['Absent'],
+            'leave_days': counts['On Leave'],
+            'half_days': counts['Half Day'],
+            'attendance_percentage': round(counts['Present'] / total * 100, 2) if total > 0 else 0,
+        }
+        cache.set(key, stats, timeout=getattr(settings, 'ATTENDANCE_REPORT_CACHE_TIMEOUT', 3600))
+    return stats
@@ -0,0 +1,153 @@
+"""
+Task search.
+
+On SQLite tasks are indexed in an FTS5 virtual table (created by migration
+0005) holding the title, description and assignee name of every task, keyed
+by the task id. Searches are prefix matches on every word typed and results
+are ordered by bm25 rank, title hits weighing most. The index is kept up to
+date by the Task signal handlers in signals.py; `manage.py rebuild_task_search`
+regenerates it.
+
+Other databases, or SQLite builds without FTS5, fall back to the plain
+`icontains` search. Set TASK_SEARCH_BACKEND to a dotted class path to plug
+in something else.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+from .models import Task
+
+FTS_TABLE = 'hr_module_task_search'
+
+# title, description, assignee
+RANK_WEIGHTS = (10.0, 1.0, 5.0)
+
+# the User fields the assignee column is made of
+ASSIGNEE_FIELDS = ('first_name', 'last_name')
+
+_backend = None
+
+
+def search_terms(query):
+    return re.findall(r'\w+', query.lower())
+
+
+class DatabaseSearchBackend:
+    """Unindexed fallback: every term must appear in one of the fields"""
+
+    def index(self, tasks, replace=True):
+        pass
+
+    def remove(self, task_ids):
+        pass
+
+    def index_assignee(self, user):
+        pass
+
+    def rebuild(self, chunk_size=5000):
+        return 0
+
+    def search(self, queryset, query):
+        for term in search_terms(query):
+            queryset = queryset.filter(
+                Q(title__icontains=term) |
+                Q(description__icontains=term) |
+                Q(assigned_to__first_name__icontains=term) |
+                Q(assigned_to__last_name__icontains=term)
+            )
+        return queryset
+
+
+class SqliteFTSBackend:
+
+    def _assignee(self, task):
+        user = task.assigned_to
+        return f'{user.first_name} {user.last_name}'.strip()
+
+    def index(self, tasks, replace=True):
+        rows = [(task.pk, task.title, task.description, self._assignee(task)) for task in tasks]
+        if not rows:
+            return
+        with connection.cursor() as cursor:
+            if replace:
+                cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(row[0],) for row in rows])
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, title, description, assignee) VALUES (%s, %s, %s, %s)',
+                rows,
+            )
+
+    def remove(self, task_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(pk,) for pk in task_ids])
+
+    def index_assignee(self, user):
+        # the assignee name is part of every task row of theirs
+        tasks = list(Task.objects.filter(assigned_to=user).only('id', 'title', 'description'))
+        for task in tasks:
+            task.assigned_to = user
+        self.index(tasks)
+
+    def rebuild(self, chunk_size=5000):
+        total = 0
+        last_id = 0
+        tasks = Task.objects.select_related('assigned_to').only(
+            'id', 'title', 'description', 'assigned_to__first_name', 'assigned_to__last_name'
+        ).order_by('id')
+        # one transaction: searches see the old index until the new one is complete
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            while True:
+                chunk = list(tasks.filter(id__gt=last_id)[:chunk_size])
+                if not chunk:
+                    break
+                self.index(chunk, replace=False)
+                total += len(chunk)
+                last_id = chunk[-1].pk
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+        return total
+
+    def search(self, queryset, query):
+        terms = search_terms(query)
+        if not terms:
+            return queryset
+        # "term"* is a prefix match, terms separated by spaces must all match
+        match = ' '.join(f'"{term}"*' for term in terms)
+        weights = ', '.join(str(w) for w in RANK_WEIGHTS)
+        matches = RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match])
+        # ranked per matching task only, through the index's rowid lookup
+        rank = RawSQL(
+            f'SELECT bm25({FTS_TABLE}, {weights}) FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s AND rowid = {Task._meta.db_table}.id',
+            [match],
+            output_field=FloatField(),
+        )
+        return queryset.filter(pk__in=matches).annotate(search_rank=rank).order_by('search_rank')
+
+
+def fts_available():
+    return connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        path = getattr(settings, 'TASK_SEARCH_BACKEND', None)
+        if path:
+            _backend = import_string(path)()
+        elif fts_available():
+            _backend = SqliteFTSBackend()
+        else:
+            _backend = DatabaseSearchBackend()
+    return _backend
+
+
+def search_tasks(queryset, query):
+    """Filter a Task queryset down to matches for `query`, best first"""
+    return get_backend().search(queryset, query)
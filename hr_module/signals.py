@@ -0,0 +1,133 @@
+import threading
+
+from django.contrib.auth import get_user_model
+from django.db.models import Count
+from django.db.models.signals import pre_delete, pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from admin_panel.stats import ATTENDANCE_VERSION, bump_data_version
+from users.models import Department
+
+from .models import EXPORTED_FIELDS, Attendance, Task
+from . import cube, summary
+from .search import ASSIGNEE_FIELDS, get_backend as search_backend
+
+User = get_user_model()
+
+# users whose delete is in progress - their attendance was taken out of the summary up front
+_deleting = threading.local()
+
+
+def _remember_department(attendance):
+    # skip the lookup when the user is already loaded
+    if Attendance.user.is_cached(attendance):
+        summary.remember_department(attendance.user_id, attendance.user.department_id)
+
+
+# keep DailyAttendanceSummary, the attendance cube and the attendance export
+# version in step with single-row attendance changes
+@receiver(pre_save, sender=Attendance, dispatch_uid='hr_module.attendance_pre_save')
+def attendance_pre_save(sender, instance, raw=False, **kwargs):
+    # instances not loaded through the ORM have no snapshot of the stored row
+    if raw or instance.pk is None or hasattr(instance, '_summary_key'):
+        return
+    stored = Attendance.objects.filter(pk=instance.pk).values_list('user_id', 'date', 'status', *EXPORTED_FIELDS).first()
+    instance._summary_key = stored and stored[:3]
+    instance._exported = stored and stored[3:]
+
+
+@receiver(post_save, sender=Attendance, dispatch_uid='hr_module.attendance_saved')
+def attendance_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    old = None if created else getattr(instance, '_summary_key', None)
+    new = (instance.user_id, summary._as_date(instance.date), instance.status)
+    if old != new:
+        with summary.batch():
+            _remember_department(instance)
+            if old:
+                summary.record(*old, -1)
+            summary.record(*new, 1)
+    instance._summary_key = new
+    # edits the export does not show (e.g. verification) keep exports reusable
+    exported = tuple(getattr(instance, field) for field in EXPORTED_FIELDS)
+    if old != new or exported != getattr(instance, '_exported', None):
+        bump_data_version(ATTENDANCE_VERSION)
+    instance._exported = exported
+    # a row moved to another user or day leaves its old cell behind
+    moved = [old[:2]] if old and old[:2] != new[:2] else []
+    cube.sync_after_commit([new[1]], cleared=moved)
+
+
+@receiver(post_delete, sender=Attendance, dispatch_uid='hr_module.attendance_deleted')
+def attendance_deleted(sender, instance, **kwargs):
+    if instance.user_id in getattr(_deleting, 'users', ()):
+        return
+    key = getattr(instance, '_summary_key', None) or (instance.user_id, instance.date, instance.status)
+    with summary.batch():
+        _remember_department(instance)
+        summary.record(*key, -1)
+    bump_data_version(ATTENDANCE_VERSION)
+    cube.sync_after_commit([], cleared=[(key[0], summary._as_date(key[1]))])
+
+
+# deleting a user cascades to its attendance: subtract it with one aggregate
+# instead of one summary update per row
+@receiver(pre_delete, sender=User, dispatch_uid='hr_module.user_pre_delete')
+def user_pre_delete(sender, instance, **kwargs):
+    counts = list(Attendance.objects.filter(user_id=instance.pk).values_list('date', 'status').annotate(
+        total=Count('id')
+    ).order_by())
+    with summary.batch():
+        summary.remember_department(instance.pk, instance.department_id)
+        for day, status, total in counts:
+            summary.record(instance.pk, day, status, -total)
+    if counts:
+        bump_data_version(ATTENDANCE_VERSION)
+    cube.sync_after_commit([], cleared=[(instance.pk, day) for day, _, _ in counts])
+    if not hasattr(_deleting, 'users'):
+        _deleting.users = set()
+    _deleting.users.add(instance.pk)
+
+
+@receiver(post_delete, sender=User, dispatch_uid='hr_module.user_deleted')
+def user_deleted(sender, instance, **kwargs):
+    getattr(_deleting, 'users', set()).discard(instance.pk)
+
+
+# a deleted department's employees are left without one - so are their counts;
+# its own summary rows go with the cascade
+@receiver(pre_delete, sender=Department, dispatch_uid='hr_module.department_pre_delete')
+def department_pre_delete(sender, instance, **kwargs):
+    summary.forget_department(instance.pk)
+
+
+# keep the task search index in step with tasks and assignee names
+@receiver(post_save, sender=Task, dispatch_uid='hr_module.task_saved')
+def task_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search_backend().index([instance])
+
+
+@receiver(post_delete, sender=Task, dispatch_uid='hr_module.task_deleted')
+def task_deleted(sender, instance, **kwargs):
+    search_backend().remove([instance.pk])
+
+
+@receiver(pre_save, sender=User, dispatch_uid='hr_module.assignee_pre_save')
+def assignee_pre_save(sender, instance, update_fields=None, raw=False, **kwargs):
+    instance._stored_assignee = None
+    if raw or instance.pk is None:
+        return
+    if update_fields is not None and not set(ASSIGNEE_FIELDS) & set(update_fields):
+        return
+    instance._stored_assignee = User.objects.filter(pk=instance.pk).values_list(*ASSIGNEE_FIELDS).first()
+
+
+@receiver(post_save, sender=User, dispatch_uid='hr_module.assignee_saved')
+def assignee_saved(sender, instance, created, raw=False, **kwargs):
+    # only a changed name touches the user's task rows in the index
+    old = getattr(instance, '_stored_assignee', None)
+    if old and old != tuple(getattr(instance, field) for field in ASSIGNEE_FIELDS):
+        search_backend().index_assignee(instance)
+    instance._stored_assignee = None
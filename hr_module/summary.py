@@ -0,0 +1,202 @@
+"""
+Incrementally maintained DailyAttendanceSummary and EmployeeMonthlyAttendance
+counts.
+
+Every Attendance change becomes -1 for its old (user, date, status) and +1
+for the new one. The signal handlers in signals.py cover save() and delete();
+bulk writes that skip signals call record() themselves. Inside a batch()
+block deltas are merged and applied once on exit: one department id lookup
+for all users involved and, per table, one lookup of the touched cells, one
+UPDATE per distinct delta and one INSERT for new cells. The cached attendance
+reports of every user involved are invalidated at the same time.
+
+The daily summary is keyed on the department id (None for no department), so
+renaming a department changes nothing here; deleting one moves its counts to
+no department, like its employees.
+"""
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import date, datetime
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import TruncMonth
+
+from .models import Attendance, DailyAttendanceSummary, EmployeeMonthlyAttendance
+from .reports import bump_report_versions, next_month
+
+_state = threading.local()
+
+SUMMARY_FIELDS = ('date', 'department_id', 'status')
+
+
+def _as_date(value):
+    # views sometimes assign 'YYYY-MM-DD' strings to Attendance.date
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value))
+
+
+@contextmanager
+def batch():
+    if getattr(_state, 'pending', None) is not None:
+        # nested - the outermost block applies everything
+        yield
+        return
+    _state.pending = Counter()
+    _state.departments = {}
+    try:
+        yield
+        pending, departments = _state.pending, _state.departments
+    finally:
+        _state.pending = None
+        _state.departments = None
+    apply(pending, departments)
+
+
+def remember_department(user_id, department_id):
+    """Department id to use for a user already loaded, or whose row may be gone when the batch is applied"""
+    departments = getattr(_state, 'departments', None)
+    if departments is not None:
+        departments[user_id] = department_id
+
+
+def record(user_id, day, status, delta):
+    with batch():
+        _state.pending[(user_id, _as_date(day), status)] += delta
+
+
+def apply(pending, departments=None):
+    departments = dict(departments or {})
+    missing = {user_id for user_id, _, _ in pending} - departments.keys()
+    if missing:
+        User = get_user_model()
+        departments.update(User.objects.filter(id__in=missing).values_list('id', 'department_id'))
+
+    cells = Counter()
+    months = Counter()
+    for (user_id, day, status), delta in pending.items():
+        cells[(day, departments.get(user_id), status)] += delta
+        months[(user_id, day.replace(day=1), status)] += delta
+
+    _apply_counts(DailyAttendanceSummary, SUMMARY_FIELDS, cells)
+    # a user deleted meanwhile only leaves negative deltas - there is no row to create
+    _apply_counts(EmployeeMonthlyAttendance, ('user_id', 'month', 'status'), months, create_negative=False)
+    bump_report_versions({user_id for user_id, _, _ in pending})
+
+
+def _apply_counts(model, fields, cells, create_negative=True):
+    """Add the deltas of `cells` ({key tuple: delta}) to the count column of `model`"""
+    cells = {key: delta for key, delta in cells.items() if delta}
+    if not cells:
+        return
+
+    lookup = Q()
+    for i, field in enumerate(fields):
+        values = {key[i] for key in cells}
+        condition = Q(**{f'{field}__in': values - {None}})
+        if None in values:
+            # IN never matches NULL
+            condition |= Q(**{f'{field}__isnull': True})
+        lookup &= condition
+    existing = dict(
+        (tuple(values), pk) for pk, *values in model.objects.filter(lookup).values_list('pk', *fields)
+    )
+
+    # one UPDATE per distinct delta, usually just +1/-1
+    by_delta = defaultdict(list)
+    missing = []
+    for key, delta in cells.items():
+        if key in existing:
+            by_delta[delta].append(existing[key])
+        elif delta > 0 or create_negative:
+            missing.append(key)
+    for delta, pks in by_delta.items():
+        model.objects.filter(pk__in=pks).update(count=F('count') + delta)
+
+    if missing:
+        try:
+            with transaction.atomic():
+                model.objects.bulk_create([
+                    model(count=cells[key], **dict(zip(fields, key))) for key in missing
+                ])
+        except IntegrityError:
+            # another request created some of these cells meanwhile
+            for key in missing:
+                _add(model, dict(zip(fields, key)), cells[key])
+
+
+def _add(model, lookup, delta):
+    updated = model.objects.filter(**lookup).update(count=F('count') + delta)
+    if not updated:
+        with transaction.atomic():
+            row, created = model.objects.get_or_create(**lookup, defaults={'count': delta})
+        if not created:
+            model.objects.filter(pk=row.pk).update(count=F('count') + delta)
+
+
+def forget_department(department_id):
+    """Move the counts of a department that is being deleted to no department"""
+    cells = Counter({
+        (day, None, status): count
+        for day, status, count in DailyAttendanceSummary.objects.filter(department_id=department_id).values_list(
+            'date', 'status', 'count'
+        )
+    })
+    _apply_counts(DailyAttendanceSummary, SUMMARY_FIELDS, cells)
+
+
+def rebuild(start=None, end=None):
+    """Recompute the summary from Attendance, optionally for a date range only"""
+    attendances = Attendance.objects.all()
+    summaries = DailyAttendanceSummary.objects.all()
+    if start:
+        attendances = attendances.filter(date__gte=start)
+        summaries = summaries.filter(date__gte=start)
+    if end:
+        attendances = attendances.filter(date__lte=end)
+        summaries = summaries.filter(date__lte=end)
+
+    rows = attendances.values('date', 'user__department_id', 'status').annotate(total=Count('id')).order_by()
+
+    with transaction.atomic():
+        summaries.delete()
+        created = DailyAttendanceSummary.objects.bulk_create([
+            DailyAttendanceSummary(
+                date=row['date'], department_id=row['user__department_id'], status=row['status'], count=row['total']
+            )
+            for row in rows.iterator()
+        ], batch_size=1000)
+        rebuild_monthly(start, end)
+    return len(created)
+
+
+def rebuild_monthly(start=None, end=None):
+    """Recompute EmployeeMonthlyAttendance for the whole months overlapping start..end"""
+    attendances = Attendance.objects.all()
+    rollups = EmployeeMonthlyAttendance.objects.all()
+    if start:
+        start = _as_date(start).replace(day=1)
+        attendances = attendances.filter(date__gte=start)
+        rollups = rollups.filter(month__gte=start)
+    if end:
+        end = _as_date(end).replace(day=1)
+        attendances = attendances.filter(date__lt=next_month(end))
+        rollups = rollups.filter(month__lte=end)
+
+    rows = attendances.annotate(month=TruncMonth('date')).values('user_id', 'month', 'status').annotate(
+        total=Count('id')
+    ).order_by()
+    with transaction.atomic():
+        rollups.delete()
+        created = EmployeeMonthlyAttendance.objects.bulk_create([
+            EmployeeMonthlyAttendance(user_id=row['user_id'], month=row['month'], status=row['status'], count=row['total'])
+            for row in rows.iterator()
+        ], batch_size=1000)
+    bump_report_versions(None)
+    return len(created)
+
@@ -1,3 +1,553 @@
-from django.test import TestCase
+import tempfile
+import unittest
+from datetime import date, time, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import Count, Q
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from admin_panel.stats import USERS_VERSION, bump_data_version
+from ems.testing import QueryPlanAssertions
+from users.models import Department
+
+from . import cube, picker, reports, summary
+from .bulk import mark_leave, unmark_leave, upsert_attendance
+from .exports import attendance_queryset
+from .models import Attendance, DailyAttendanceSummary, EmployeeMonthlyAttendance, Leave, Task
+from .search import search_tasks
+
+User = get_user_model()
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN output is SQLite specific')
+class QueryPlanTests(QueryPlanAssertions, TestCase):
+    """The hot hr/employee view queries must be answered from an index"""
+
+    @classmethod
+    def setUpTestData(cls):
+        # no passwords - hashing dominates the run time otherwise
+        cls.hr = User.objects.create(username='hr', email='hr@example.com', role='HR')
+        it = Department.objects.create(name='IT')
+        cls.employees = User.objects.bulk_create([
+            User(username=f'emp{i}', email=f'emp{i}@example.com', role='Employee', department=it)
+            for i in range(20)
+        ])
+        today = date.today()
+        attendances, leaves, tasks = [], [], []
+        for i, emp in enumerate(cls.employees):
+            for day in range(30):
+                attendances.append(Attendance(
+                    user=emp, date=today - timedelta(days=day),
+                    status=['Present', 'Absent', 'On Leave'][(i + day) % 3],
+                ))
+            for n in range(5):
+                start = today + timedelta(days=10 * n)
+                leaves.append(Leave(
+                    user=emp, leave_type='Casual', start_date=start, end_date=start + timedelta(days=2),
+                    reason='trip', status=['Pending', 'Approved', 'Rejected'][n % 3],
+                ))
+            for n in range(20):
+                tasks.append(Task(
+                    assigned_to=emp, assigned_by=cls.hr, title=f'task {n}', description='work',
+                    status=['Pending', 'In Progress', 'Completed'][n % 3], due_date=today + timedelta(days=n - 10),
+                ))
+        # bulk_create skips the summary/search signals, which are not under test here
+        Attendance.objects.bulk_create(attendances)
+        Leave.objects.bulk_create(leaves)
+        Task.objects.bulk_create(tasks)
+
+    def test_attendance_by_date_and_status(self):
+        # hr attendance_list with a status filter
+        qs = Attendance.objects.filter(date=date.today(), status='Present')
+        self.assertIndexed(qs, 'hr_module_attendance')
+
+    def test_attendance_export_range(self):
+        # export_attendance_csv and the attendance export job, with and without a department
+        start = date.today() - timedelta(days=7)
+        department = self.employees[0].department_id
+        for args in ((start, date.today()), (start, date.today(), department)):
+            with self.subTest(department=len(args) == 3):
+                self.assertIndexed(attendance_queryset(*args), 'hr_module_attendance')
+
+    def test_pending_leaves_newest_first(self):
+        # hr_dashboard recent leave requests
+        qs = Leave.objects.filter(status='Pending').order_by('-applied_at')[:5]
+        self.assertIndexed(qs, 'hr_module_leave')
+
+    def test_leave_requests_by_status(self):
+        qs = Leave.objects.filter(status='Approved')
+        self.assertIndexed(qs, 'hr_module_leave')
+
+    def test_overlapping_leave_check(self):
+        # employee apply_leave overlap check
+        emp = self.employees[0]
+        qs = Leave.objects.filter(user=emp, status__in=['Pending', 'Approved']).filter(
+            Q(start_date__lte=date.today() + timedelta(days=5)) & Q(end_date__gte=date.today())
+        )
+        self.assertIndexed(qs, 'hr_module_leave')
+
+    def test_employee_task_counts(self):
+        # employee_dashboard task aggregate
+        qs = Task.objects.filter(assigned_to=self.employees[0], status='Pending', due_date__lt=date.today())
+        self.assertIndexed(qs, 'hr_module_task')
+
+    def test_hr_task_list(self):
+        qs = Task.objects.filter(assigned_by=self.hr).order_by('-created_at')
+        self.assertIndexed(qs, 'hr_module_task')
+
+
+@override_settings(AUDIT_LOG_BUFFER_SIZE=1)
+class AttendanceCubeTests(TestCase):
+    def setUp(self):
+        # every test starts without cube files
+        cube_root = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(ATTENDANCE_CUBE_ROOT=cube_root))
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.year = date.today().year
+        cls.employees = User.objects.bulk_create([
+            User(username=f'emp{i}', email=f'emp{i}@example.com', role='Employee') for i in range(3)
+        ])
+        # bulk_create: no cube sync queued behind the tests' own writes
+        Attendance.objects.bulk_create([
+            Attendance(
+                user=emp, date=date(cls.year, 1, day), status=['Present', 'Absent', 'Half Day'][(i + day) % 3],
+                check_in_time=time(9, 0), check_out_time=time(17, 30),
+            )
+            for i, emp in enumerate(cls.employees) for day in range(1, 11)
+        ])
+
+    def assertMatchesDatabase(self):
+        with cube.open_year(self.year, refresh=False) as year:
+            for user_id, day, status in Attendance.objects.values_list('user_id', 'date', 'status'):
+                self.assertEqual(year.get(user_id, day)[0], status)
+            self.assertEqual(year.cells, Attendance.objects.count())
+
+    def test_sync_is_incremental_after_the_first_build(self):
+        self.assertEqual(cube.sync(self.year)[0], 'full')
+        record = Attendance.objects.filter(user=self.employees[0]).first()
+        record.status = 'Holiday'
+        record.save()
+        self.assertEqual(cube.sync(self.year)[0], 'incremental')
+        self.assertMatchesDatabase()
+
+    def test_deletes_clear_their_cells_without_a_rebuild(self):
+        cube.sync(self.year)
+        gone = Attendance.objects.filter(user=self.employees[1]).first()
+        moved = Attendance.objects.filter(user=self.employees[2]).first()
+        with mock.patch('hr_module.cube.AttendanceCube', wraps=cube.AttendanceCube) as opened:
+            with self.captureOnCommitCallbacks(execute=True):
+                # an insert and a delete in one go leave the number of rows as it was
+                gone.delete()
+                Attendance.objects.create(user=self.employees[1], date=date(self.year, 2, 1), status='Present')
+                moved.date = date(self.year, 3, 1)
+                moved.save()
+        self.assertNotIn(True, [call.kwargs.get('fresh') for call in opened.call_args_list])
+        self.assertMatchesDatabase()
+
+    def test_user_delete_clears_its_row(self):
+        cube.sync(self.year)
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.get(pk=self.employees[0].pk).delete()
+        self.assertMatchesDatabase()
+
+    def test_writes_leave_an_unbuilt_year_to_the_build_command(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Attendance.objects.create(user=self.employees[0], date=date(self.year, 2, 1), status='Present')
+        with cube.open_year(self.year, refresh=False) as year:
+            self.assertFalse(year.built)
+        self.assertEqual(cube.sync(self.year), ('full', 31))
+        self.assertMatchesDatabase()
+
+    def test_full_build_publishes_files_and_metadata_together(self):
+        cube.sync(self.year)
+        with cube.open_year(self.year, refresh=False) as before:
+            self.assertEqual(before.directory.name, 'v1')
+            Attendance.objects.filter(user=self.employees[0]).delete()
+            cube.sync(self.year, full=True)
+            # an open reader keeps the build it started with
+            self.assertEqual(before.get(self.employees[0].id, date(self.year, 1, 1))[0], 'Absent')
+        cube.sync(self.year, full=True)
+        self.assertEqual((cube.cube_dir(self.year) / 'current').read_text(), 'v3')
+        # the previous build is kept for readers that just looked it up, older ones go
+        self.assertEqual([path.name for path in cube._builds(self.year)], ['v2', 'v3'])
+        self.assertMatchesDatabase()
+
+    def test_pages_do_not_sync(self):
+        hr = User.objects.create(username='hr', email='hr@example.com', role='HR')
+        self.client.force_login(hr)
+        cube.sync(self.year)
+        with mock.patch('hr_module.cube.sync') as sync:
+            self.client.get(reverse('hr_module:attendance_grid'), {'year': self.year, 'month': 1})
+            self.client.get(reverse('hr_module:export_attendance_grid'), {'year': self.year, 'month': 1})
+        sync.assert_not_called()
+
+    def test_month_rows(self):
+        with cube.open_year(self.year) as year:
+            row = next(cube.month_rows(year, self.employees[:1], self.year, 1))
+        self.assertEqual(row['marked'], 10)
+        self.assertEqual(row['days'][10], None)
+        self.assertEqual(row['hours'], 85.0)
+        self.assertEqual(row['present'], row['days'].count('Present'))
+
+
+class AttendanceReportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.employee = User.objects.create(username='emp', email='emp@example.com', role='Employee')
+        # saved one by one so the monthly rollup is maintained by the signals
+        cls.first = date(2024, 1, 10)
+        for day in range(120):
+            Attendance.objects.create(
+                user=cls.employee, date=cls.first + timedelta(days=day),
+                status=['Present', 'Absent', 'Half Day', 'On Leave'][day % 4],
+            )
+
+    def direct_counts(self, start, end):
+        rows = Attendance.objects.filter(user=self.employee, date__gte=start, date__lte=end)
+        return dict(rows.values_list('status').annotate(total=Count('id')).order_by())
+
+    def test_counts_match_attendance_for_whole_and_partial_months(self):
+        ranges = [
+            (date(2024, 1, 1), date(2024, 12, 31)),
+            (date(2024, 2, 1), date(2024, 3, 31)),
+            (date(2024, 1, 15), date(2024, 4, 20)),
+            (date(2024, 2, 3), date(2024, 2, 17)),
+            (date(2024, 2, 20), date(2024, 3, 5)),
+        ]
+        for start, end in ranges:
+            with self.subTest(start=start, end=end):
+                self.assertEqual(dict(reports.status_counts(self.employee.id, start, end)), self.direct_counts(start, end))
+
+    def test_cached_stats_follow_attendance_changes(self):
+        before = reports.attendance_stats(self.employee.id)
+        with self.assertNumQueries(0):
+            reports.attendance_stats(self.employee.id)
+
+        record = Attendance.objects.filter(user=self.employee, status='Absent').first()
+        record.status = 'Present'
+        record.save()
+        after = reports.attendance_stats(self.employee.id)
+        self.assertEqual(after['present_days'], before['present_days'] + 1)
+        self.assertEqual(after['absent_days'], before['absent_days'] - 1)
+
+
+@override_settings(AUDIT_LOG_BUFFER_SIZE=1)
+class AttendanceExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.hr = User.objects.create(username='hr', email='hr@example.com', role='HR')
+        cls.it = Department.objects.create(name='IT')
+        it = User.objects.create(username='it', email='it@example.com', first_name='Ann', last_name='Lee', department=cls.it)
+        sales = User.objects.create(username='sales', email='sales@example.com',
+                                    department=Department.objects.create(name='Sales'))
+        for day in range(1, 6):
+            for user in (it, sales):
+                Attendance.objects.create(
+                    user=user, date=date(2024, 3, day), status='Present',
+                    check_in_time=time(9, 0), check_out_time=time(17, 30) if day != 3 else None,
+                )
+
+    def export(self, **params):
+        self.client.force_login(self.hr)
+        response = self.client.get(reverse('hr_module:export_attendance_csv'), params)
+        return b''.join(response.streaming_content).decode().splitlines()
+
+    def test_range_and_department(self):
+        lines = self.export(start_date='2024-03-02', end_date='2024-03-04', department=self.it.pk)
+        self.assertEqual(lines[1:], [
+            'Ann Lee,it@example.com,IT,2024-03-02,Present,09:00:00,17:30:00,8.5,',
+            'Ann Lee,it@example.com,IT,2024-03-03,Present,09:00:00,N/A,N/A,',
+            'Ann Lee,it@example.com,IT,2024-03-04,Present,09:00:00,17:30:00,8.5,',
+        ])
+
+    def test_single_day(self):
+        self.assertEqual(len(self.export(date='2024-03-05')), 3)
+
+
+class AttendanceSummaryTests(TestCase):
+    def test_deleting_a_user_takes_its_attendance_out_in_one_go(self):
+        it = Department.objects.create(name='IT')
+        gone, kept = [
+            User.objects.create(username=name, email=f'{name}@example.com', role='Employee', department=it)
+            for name in ('gone', 'kept')
+        ]
+        for day in range(200):
+            Attendance.objects.create(user=gone, date=date(2024, 1, 1) + timedelta(days=day),
+                                      status=['Present', 'Absent'][day % 2])
+        Attendance.objects.create(user=kept, date=date(2024, 1, 1), status='Present')
+
+        with CaptureQueriesContext(connection) as queries:
+            gone.delete()
+        # not one summary update per attendance row
+        self.assertLess(len(queries), 50)
+        self.assertEqual(
+            list(DailyAttendanceSummary.objects.filter(count__gt=0).values_list('date', 'department', 'status', 'count')),
+            [(date(2024, 1, 1), it.pk, 'Present', 1)],
+        )
+        self.assertEqual(list(EmployeeMonthlyAttendance.objects.values_list('user_id', 'count')), [(kept.id, 1)])
+
+        # single deletes still count
+        Attendance.objects.get().delete()
+        self.assertFalse(DailyAttendanceSummary.objects.filter(count__gt=0).exists())
+
+
+@override_settings(AUDIT_LOG_BUFFER_SIZE=1)
+class BulkAttendanceTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        it = Department.objects.create(name='IT')
+        cls.hr = User.objects.create(username='hr', email='hr@example.com', role='HR')
+        cls.ann, cls.bob = [
+            User.objects.create(username=name, email=f'{name}@example.com', role='Employee', department=it)
+            for name in ('ann', 'bob')
+        ]
+
+    def summary(self):
+        return sorted(DailyAttendanceSummary.objects.filter(count__gt=0).values_list('date', 'status', 'count'))
+
+    def statuses(self):
+        return sorted(Attendance.objects.values_list('user__username', 'date', 'status', 'notes'))
+
+    def leave(self, start, end, leave_type='Casual Leave'):
+        return Leave.objects.create(user=self.ann, leave_type=leave_type, start_date=start, end_date=end,
+                                    reason='trip', status='Approved')
+
+    def test_upsert_inserts_new_rows_and_updates_the_given_fields(self):
+        day = date(2024, 3, 1)
+        Attendance.objects.create(user=self.ann, date=day, status='Present', notes='kept')
+        written = upsert_attendance([
+            Attendance(user=self.ann, date=day, status='Absent', marked_by=self.hr, notes='ignored'),
+            Attendance(user=self.bob, date=day, status='Present', marked_by=self.hr),
+        ], update_fields=['status', 'marked_by'])
+        self.assertEqual(written, 2)
+        self.assertEqual(self.statuses(), [('ann', day, 'Absent', 'kept'), ('bob', day, 'Present', None)])
+        self.assertEqual(self.summary(), [(day, 'Absent', 1), (day, 'Present', 1)])
+
+    def test_bulk_mark_view(self):
+        self.client.force_login(self.hr)
+        Attendance.objects.create(user=self.ann, date=date(2024, 3, 1), status='Absent')
+        self.client.post(reverse('hr_module:bulk_mark_attendance'), {
+            'date': '2024-03-01', f'status_{self.ann.pk}': 'Present', f'status_{self.bob.pk}': 'Present',
+        })
+        self.assertEqual(list(Attendance.objects.values_list('status', flat=True).distinct()), ['Present'])
+        self.assertEqual(self.summary(), [(date(2024, 3, 1), 'Present', 2)])
+
+    def test_unmark_removes_only_the_rows_of_that_leave(self):
+        first = self.leave(date(2024, 3, 1), date(2024, 3, 3))
+        mark_leave(first, self.hr)
+        # a later leave of the same type takes over the last day, HR re-marks the second one
+        second = self.leave(date(2024, 3, 3), date(2024, 3, 4))
+        mark_leave(second, self.hr)
+        edited = Attendance.objects.get(date=date(2024, 3, 2))
+        edited.status = 'Present'
+        edited.save()
+
+        self.assertEqual(unmark_leave(first), 1)
+        self.assertEqual(
+            list(Attendance.objects.order_by('date').values_list('date', 'status', 'leave_request')),
+            [(date(2024, 3, 2), 'Present', first.pk),
+             (date(2024, 3, 3), 'On Leave', second.pk), (date(2024, 3, 4), 'On Leave', second.pk)],
+        )
+        self.assertEqual(self.summary(), [
+            (date(2024, 3, 2), 'Present', 1), (date(2024, 3, 3), 'On Leave', 1), (date(2024, 3, 4), 'On Leave', 1),
+        ])
+
+
+class SummaryMigrationTests(TransactionTestCase):
+    # departments are still free text then
+    before = [('hr_module', '0003_task_attachment_file_alter_task_submission_file'), ('users', '0003_customuser_search_text')]
+    after = [('hr_module', '0004_dailyattendancesummary'), ('users', '0003_customuser_search_text')]
+
+    def setUp(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.before)
+        self.old_apps = executor.loader.project_state(self.before).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_existing_attendance_is_summarized(self):
+        OldUser = self.old_apps.get_model('users', 'CustomUser')
+        OldAttendance = self.old_apps.get_model('hr_module', 'Attendance')
+        it = OldUser.objects.create(username='it', email='it@example.com', department='IT')
+        none = OldUser.objects.create(username='none', email='none@example.com')
+        for user, status in [(it, 'Present'), (it, 'Absent'), (none, 'Present')]:
+            OldAttendance.objects.create(user=user, date=date(2024, 3, 1 if status == 'Present' else 2), status=status)
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.after)
+        apps = executor.loader.project_state(self.after).apps
+
+        Summary = apps.get_model('hr_module', 'DailyAttendanceSummary')
+        self.assertEqual(
+            sorted(Summary.objects.values_list('date', 'department', 'status', 'count')),
+            [(date(2024, 3, 1), '', 'Present', 1), (date(2024, 3, 1), 'IT', 'Present', 1),
+             (date(2024, 3, 2), 'IT', 'Absent', 1)],
+        )
+
+
+class SummaryDepartmentIdMigrationTests(TransactionTestCase):
+    before = [('hr_module', '0009_attendance_leave_request'), ('users', '0004_department')]
+    after = [('hr_module', '0010_dailyattendancesummary_department_id'), ('users', '0004_department')]
+
+    def setUp(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.before)
+        self.old_apps = executor.loader.project_state(self.before).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_names_become_department_ids(self):
+        it = self.old_apps.get_model('users', 'Department').objects.create(name='IT')
+        OldSummary = self.old_apps.get_model('hr_module', 'DailyAttendanceSummary')
+        day = date(2024, 3, 1)
+        OldSummary.objects.bulk_create([
+            OldSummary(date=day, department=department, status='Present', count=count)
+            for department, count in [('IT', 3), ('', 2), ('Closed', 1)]
+        ])
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.after)
+        apps = executor.loader.project_state(self.after).apps
+
+        Summary = apps.get_model('hr_module', 'DailyAttendanceSummary')
+        # a name without a department joins the no department count
+        self.assertEqual(
+            dict(Summary.objects.values_list('department', 'count')), {None: 3, it.pk: 3}
+        )
+
+
+@override_settings(AUDIT_LOG_BUFFER_SIZE=1)
+class DepartmentSummaryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.hr = User.objects.create(username='hr', email='hr@example.com', role='HR')
+        cls.it = Department.objects.create(name='IT')
+        cls.emp = User.objects.create(username='emp', email='emp@example.com', role='Employee', department=cls.it)
+        cls.other = User.objects.create(username='other', email='other@example.com', role='Employee')
+
+    def test_rename_keeps_the_history_together(self):
+        today = date.today()
+        Attendance.objects.create(user=self.emp, date=today - timedelta(days=1), status='Present')
+        self.it.name = 'Engineering'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.it.save()
+        Attendance.objects.create(user=self.emp, date=today, status='Present')
+        incremental = sorted(DailyAttendanceSummary.objects.values_list('date', 'department', 'status', 'count'))
+        self.assertEqual({row[1] for row in incremental}, {self.it.pk})
+        # a rebuild agrees with the incremental counts
+        summary.rebuild()
+        self.assertEqual(
+            sorted(DailyAttendanceSummary.objects.values_list('date', 'department', 'status', 'count')), incremental
+        )
+        self.client.force_login(self.hr)
+        self.assertEqual(self.client.get(reverse('hr_module:hr_dashboard')).context['dept_labels'], '["Engineering"]')
+
+    def test_deleted_department_counts_as_none(self):
+        day = date(2024, 3, 1)
+        Attendance.objects.create(user=self.emp, date=day, status='Present')
+        Attendance.objects.create(user=self.other, date=day, status='Present')
+        self.it.delete()
+        self.assertEqual(list(DailyAttendanceSummary.objects.values_list('department', 'count')), [(None, 2)])
+        # the employee's next day goes to the same cell as its history
+        Attendance.objects.create(user=User.objects.get(pk=self.emp.pk), date=day + timedelta(days=1), status='Absent')
+        self.assertEqual(
+            sorted(DailyAttendanceSummary.objects.values_list('department', 'status', 'count')),
+            [(None, 'Absent', 1), (None, 'Present', 2)],
+        )
+
+
+class TaskSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ann = User.objects.create(username='annl', email='ann@example.com', role='Employee',
+                                      first_name='Ann', last_name='Lee')
+        Task.objects.create(assigned_to=cls.ann, title='Quarterly report', description='Numbers',
+                            due_date=date(2024, 3, 1))
+
+    def titles(self, query):
+        return list(search_tasks(Task.objects.all(), query).values_list('title', flat=True))
+
+    def test_best_matches_come_first(self):
+        # a title match outweighs a description match
+        Task.objects.create(assigned_to=self.ann, title='Budget', description='Quarterly numbers',
+                            due_date=date(2024, 3, 1))
+        self.assertEqual(self.titles('quarterly'), ['Quarterly report', 'Budget'])
+        self.assertEqual(self.titles('budget numbers'), ['Budget'])
+
+    def test_renamed_assignee_is_reindexed(self):
+        self.assertEqual(self.titles('lee report'), ['Quarterly report'])
+        self.ann.last_name = 'Smith'
+        self.ann.save()
+        self.assertEqual(self.titles('smith'), ['Quarterly report'])
+        self.assertEqual(self.titles('lee'), [])
+
+    @unittest.skipUnless(connection.vendor == 'sqlite', 'the index is SQLite specific')
+    def test_other_user_changes_leave_the_index_alone(self):
+        self.ann.last_login = timezone.now()
+        self.ann.email = 'ann.lee@example.com'
+        with CaptureQueriesContext(connection) as ctx:
+            self.ann.save()
+        self.assertFalse([q for q in ctx.captured_queries if 'hr_module_task' in q['sql']])
+        with CaptureQueriesContext(connection) as ctx:
+            self.ann.save(update_fields=['last_login'])
+        self.assertFalse([q for q in ctx.captured_queries if 'hr_module_task' in q['sql']])
+
+
+class EmployeePickerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.hr = User.objects.create(username='hr', email='hr@example.com', role='HR', first_name='Helen', last_name='Ross')
+        cls.ann = User.objects.create(username='annl', email='ann@example.com', role='Employee',
+                                      first_name='Ann', last_name='Lee', employee_id='EMP001',
+                                      department=Department.objects.create(name='IT'))
+        cls.andy = User.objects.create(username='andy', email='andy@example.com', role='Employee',
+                                       first_name='Andy', last_name='Annan', employee_id='EMP002')
+        User.objects.create(username='gone', email='gone@example.com', role='Employee', first_name='Anna', is_active=False)
+
+    def setUp(self):
+        # the index outlives test transactions (and their version bumps), start from this test's users
+        picker._index = None
+
+    def ids(self, query):
+        return [user_id for user_id, _ in picker.search(query)]
+
+    def test_prefix_matches_any_key_once(self):
+        # ordered by the matching key: 'andy' < 'ann'
+        self.assertEqual(self.ids('an'), [self.andy.pk, self.ann.pk])
+        self.assertEqual(self.ids('ann lee'), [self.ann.pk])
+        self.assertEqual(self.ids('EMP002'), [self.andy.pk])
+        self.assertEqual(self.ids('annl'), [self.ann.pk])
+        self.assertEqual(picker.label(self.ann.pk), 'Ann Lee - EMP001 - IT')
+
+    def test_index_follows_user_changes(self):
+        self.assertEqual(self.ids('zed'), [])
+        self.andy.first_name = 'Zed'
+        self.andy.save()
+        self.assertEqual(self.ids('zed'), [self.andy.pk])
+
+    def test_index_follows_changes_made_by_other_processes(self):
+        self.assertEqual(self.ids('zed'), [])
+        # saved through another process: only the database version moves, not this one's cache
+        User.objects.filter(pk=self.andy.pk).update(first_name='Zed')
+        bump_data_version(USERS_VERSION)
+        self.assertEqual(self.ids('zed'), [self.andy.pk])
+
+    def test_endpoint(self):
+        self.client.force_login(self.hr)
+        response = self.client.get(reverse('hr_module:employee_search'), {'q': 'lee'})
+        self.assertEqual(response.json(), {'results': [{'id': self.ann.pk, 'label': 'Ann Lee - EMP001 - IT'}]})
+
+        self.client.force_login(self.ann)
+        self.assertEqual(self.client.get(reverse('hr_module:employee_search'), {'q': 'lee'}).status_code, 403)
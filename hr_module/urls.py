@@ -6,6 +6,7 @@ app_name = 'hr_module'
 urlpatterns = [
     path('dashboard/', views.hr_dashboard, name='hr_dashboard'),
     path('profile/', views.hr_profile, name='hr_profile'),
+    path('employees/search/', views.employee_search, name='employee_search'),
     
     # Attendance URLs
     path('attendance/', views.attendance_list, name='attendance_list'),
@@ -15,6 +16,8 @@ urlpatterns = [
     path('attendance/<int:attendance_id>/verify/', views.verify_attendance, name='verify_attendance'),
     path('attendance/report/<int:user_id>/', views.employee_attendance_report, name='employee_attendance_report'),
     path('attendance/export/', views.export_attendance_csv, name='export_attendance_csv'),
+    path('attendance/grid/', views.attendance_grid, name='attendance_grid'),
+    path('attendance/grid/export/', views.export_attendance_grid, name='export_attendance_grid'),
     
     # Leave
     path('leaves/', views.leave_requests, name='leave_requests'),
@@ -2,19 +2,33 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import get_user_model
 from django.contrib import messages
+from django.core.paginator import Paginator
+from django.db import transaction
 from django.db.models import Count, Q, Sum
 from django.utils import timezone
 from django.http import JsonResponse, HttpResponse
-from datetime import date, timedelta, datetime
+from datetime import date, datetime
+import calendar
 import csv
 import json
 
-from .models import Attendance, Leave, Task, LeaveBalance
+from .models import Attendance, Leave, Task, LeaveBalance, DailyAttendanceSummary
+from .search import search_tasks
+from .reports import attendance_stats
+from .exports import ATTENDANCE_HEADER, attendance_range, attendance_rows
+from .bulk import upsert_attendance, mark_leave, unmark_leave
+from . import cube as attendance_cube
+from . import picker
 from .forms import AttendanceForm, BulkAttendanceForm, LeaveForm, LeaveApprovalForm, TaskForm, TaskStatusForm
-from admin_panel.models import AuditLog
+from admin_panel.audit import log_audit
+from admin_panel.exports import streaming_csv_response
+from admin_panel.filters import parse_day
+from users.departments import department_name, get_departments, parse_department
 
 User = get_user_model()
 
+REPORT_ROWS_PER_PAGE = 50
+
 # Helper function to parse date from string in various formats
 def parse_date(date_string):
     """Parse date from string in various formats, return YYYY-MM-DD string"""
@@ -41,7 +55,7 @@ def parse_date(date_string):
 # Helper function to log actions
 def log_action(user, action, details, request):
     ip = request.META.get('REMOTE_ADDR')
-    AuditLog.objects.create(user=user, action=action, details=details, ip_address=ip)
+    log_audit(user, action, details, ip)
 
 # HR dashboard
 @login_required
@@ -54,24 +68,37 @@ def hr_dashboard(request):
     total_employees = User.objects.filter(role='Employee', is_active=True).count()
     today = date.today()
     
-    # Attendance stats for today
-    present_today = Attendance.objects.filter(date=today, status='Present').count()
-    absent_today = Attendance.objects.filter(date=today, status='Absent').count()
-    on_leave_today = Attendance.objects.filter(date=today, status='On Leave').count()
+    # Attendance stats for today, from the incrementally maintained summary
+    today_summary = DailyAttendanceSummary.objects.filter(date=today, count__gt=0)
+    status_counts = {
+        row['status']: row['total']
+        for row in today_summary.values('status').annotate(total=Sum('count'))
+    }
+    present_today = status_counts.get('Present', 0)
+    absent_today = status_counts.get('Absent', 0)
+    on_leave_today = status_counts.get('On Leave', 0)
     
     # Leave requests
-    pending_leaves = Leave.objects.filter(status='Pending').count()
-    approved_leaves = Leave.objects.filter(status='Approved', start_date__lte=today, end_date__gte=today).count()
+    leave_stats = Leave.objects.aggregate(
+        pending=Count('id', filter=Q(status='Pending')),
+        approved_today=Count('id', filter=Q(status='Approved', start_date__lte=today, end_date__gte=today)),
+    )
+    pending_leaves = leave_stats['pending']
+    approved_leaves = leave_stats['approved_today']
     
     # Tasks
-    pending_tasks = Task.objects.filter(status='Pending').count()
-    overdue_tasks = Task.objects.filter(status__in=['Pending', 'In Progress'], due_date__lt=today).count()
+    task_stats = Task.objects.aggregate(
+        pending=Count('id', filter=Q(status='Pending')),
+        overdue=Count('id', filter=Q(status__in=['Pending', 'In Progress'], due_date__lt=today)),
+    )
+    pending_tasks = task_stats['pending']
+    overdue_tasks = task_stats['overdue']
     
     # Recent leave requests
-    recent_leaves = Leave.objects.filter(status='Pending').order_by('-applied_at')[:5]
+    recent_leaves = Leave.objects.filter(status='Pending').select_related('user').order_by('-applied_at')[:5]
     
     # Recent tasks
-    recent_tasks = Task.objects.filter(assigned_by=request.user).order_by('-created_at')[:5]
+    recent_tasks = Task.objects.filter(assigned_by=request.user).select_related('assigned_to').order_by('-created_at')[:5]
     
     # Pending attendance verifications (employee self-marked, awaiting HR)
     pending_attendance = Attendance.objects.filter(
@@ -81,10 +108,14 @@ def hr_dashboard(request):
         is_verified=False, marked_by__role='Employee'
     ).count()
     
-    # Department wise attendance (for chart)
-    departments = User.objects.filter(role='Employee', is_active=True).values('department').annotate(count=Count('id'))
-    dept_labels = [d['department'] or 'Not Assigned' for d in departments]
-    dept_counts = [d['count'] for d in departments]
+    # Department wise attendance today (for chart)
+    # labelled from the cached department list, so a renamed department shows its new name
+    departments = sorted(
+        (department_name(department_id) or 'Not Assigned', count)
+        for department_id, count in today_summary.filter(status='Present').values_list('department_id', 'count')
+    )
+    dept_labels = [label for label, _ in departments]
+    dept_counts = [count for _, count in departments]
     
     context = {
         'total_employees': total_employees,
@@ -115,7 +146,7 @@ def attendance_list(request):
     # Filters
     date_filter = request.GET.get('date', '')
     status_filter = request.GET.get('status', '')
-    department_filter = request.GET.get('department', '')
+    department_filter = parse_department(request.GET.get('department', ''))
     search = request.GET.get('search', '')
     
     attendances = Attendance.objects.select_related('user', 'marked_by').all()
@@ -131,7 +162,7 @@ def attendance_list(request):
         attendances = attendances.filter(status=status_filter)
     
     if department_filter:
-        attendances = attendances.filter(user__department=department_filter)
+        attendances = attendances.filter(user__department_id=department_filter)
     
     if search:
         attendances = attendances.filter(
@@ -140,12 +171,9 @@ def attendance_list(request):
             Q(user__email__icontains=search)
         )
     
-    # Get all departments for filter
-    departments = User.objects.filter(role__in=['Employee', 'HR']).values_list('department', flat=True).distinct()
-    
     context = {
         'attendances': attendances,
-        'departments': departments,
+        'departments': get_departments(),
         'date_filter': date_filter if date_filter else date.today().strftime('%Y-%m-%d'),
         'status_filter': status_filter,
         'department_filter': department_filter,
@@ -235,25 +263,24 @@ def bulk_mark_attendance(request):
     if request.method == 'POST':
         attendance_date_str = request.POST.get('date')
         attendance_date = parse_date(attendance_date_str)
-        department = request.POST.get('department', '')
+        department = parse_department(request.POST.get('department', ''))
         
         employees = User.objects.filter(role__in=['Employee', 'HR'], is_active=True)
         if department:
-            employees = employees.filter(department=department)
+            employees = employees.filter(department_id=department)
         
-        marked_count = 0
-        for emp in employees:
-            status = request.POST.get(f'status_{emp.id}')
+        # one upsert for everyone instead of a query pair per employee
+        records = []
+        for emp_id in employees.values_list('id', flat=True):
+            status = request.POST.get(f'status_{emp_id}')
             if status:
-                Attendance.objects.update_or_create(
-                    user=emp,
+                records.append(Attendance(
+                    user_id=emp_id,
                     date=attendance_date,
-                    defaults={
-                        'status': status,
-                        'marked_by': request.user
-                    }
-                )
-                marked_count += 1
+                    status=status,
+                    marked_by=request.user,
+                ))
+        marked_count = upsert_attendance(records, update_fields=['status', 'marked_by'])
         
         log_action(request.user, 'Bulk Mark Attendance', 
                   f"Marked attendance for {marked_count} employees on {attendance_date}", 
@@ -266,16 +293,16 @@ def bulk_mark_attendance(request):
         form = BulkAttendanceForm()
         attendance_date_str = request.GET.get('date', '')
         attendance_date = parse_date(attendance_date_str)
-        department = request.GET.get('department', '')
+        department = parse_department(request.GET.get('department', ''))
         
         employees = User.objects.filter(role__in=['Employee', 'HR'], is_active=True)
         if department:
-            employees = employees.filter(department=department)
+            employees = employees.filter(department_id=department)
         
         # Get existing attendance for the date
         existing_attendance = {}
-        for att in Attendance.objects.filter(date=attendance_date, user__in=employees):
-            existing_attendance[att.user.id] = att.status
+        for att in Attendance.objects.filter(date=attendance_date, user__in=employees).only('user_id', 'status'):
+            existing_attendance[att.user_id] = att.status
         
         employees_data = []
         for emp in employees:
@@ -284,14 +311,12 @@ def bulk_mark_attendance(request):
                 'current_status': existing_attendance.get(emp.id, 'Absent')
             })
         
-        departments = User.objects.filter(role__in=['Employee', 'HR']).values_list('department', flat=True).distinct()
-        
         context = {
             'form': form,
             'employees_data': employees_data,
             'attendance_date': attendance_date,
             'department': department,
-            'departments': departments,
+            'departments': get_departments(),
         }
         return render(request, 'hr_module/bulk_mark_attendance.html', context)
 
@@ -334,28 +359,21 @@ def leave_detail(request, leave_id):
         return redirect('login')
     
     leave = get_object_or_404(Leave, id=leave_id)
+    was_approved = leave.status == 'Approved'
     
     if request.method == 'POST':
         form = LeaveApprovalForm(request.POST, instance=leave)
         if form.is_valid():
-            leave = form.save(commit=False)
-            leave.approved_by = request.user
-            leave.save()
-            
-            # Mark attendance as on leave if approved
-            if leave.status == 'Approved':
-                current_date = leave.start_date
-                while current_date <= leave.end_date:
-                    Attendance.objects.update_or_create(
-                        user=leave.user,
-                        date=current_date,
-                        defaults={
-                            'status': 'On Leave',
-                            'marked_by': request.user,
-                            'notes': f'{leave.leave_type} - Approved'
-                        }
-                    )
-                    current_date += timedelta(days=1)
+            with transaction.atomic():
+                leave = form.save(commit=False)
+                leave.approved_by = request.user
+                leave.save()
+                
+                # Mark attendance as on leave if approved, undo it if the approval is withdrawn
+                if leave.status == 'Approved':
+                    mark_leave(leave, request.user)
+                elif was_approved:
+                    unmark_leave(leave)
             
             log_action(request.user, 'Leave Approval', 
                       f"{leave.status} leave request for {leave.user.username} from {leave.start_date} to {leave.end_date}", 
@@ -419,12 +437,8 @@ def task_list(request):
         tasks = tasks.filter(priority=priority_filter)
     
     if search:
-        tasks = tasks.filter(
-            Q(title__icontains=search) |
-            Q(description__icontains=search) |
-            Q(assigned_to__first_name__icontains=search) |
-            Q(assigned_to__last_name__icontains=search)
-        )
+        # full-text index, best matches first
+        tasks = search_tasks(tasks, search)
     
     context = {
         'tasks': tasks,
@@ -526,75 +540,149 @@ def employee_attendance_report(request, user_id):
     
     employee = get_object_or_404(User, id=user_id)
     
-    # Date range filter
-    start_date = request.GET.get('start_date', '')
-    end_date = request.GET.get('end_date', '')
+    # Date range filter - invalid dates are ignored
+    start = parse_day(request.GET.get('start_date', ''))
+    end = parse_day(request.GET.get('end_date', ''))
     
-    attendances = Attendance.objects.filter(user=employee)
+    attendances = Attendance.objects.filter(user=employee).only(
+        'id', 'user_id', 'date', 'status', 'check_in_time', 'check_out_time', 'notes'
+    )
+    if start:
+        attendances = attendances.filter(date__gte=start)
+    if end:
+        attendances = attendances.filter(date__lte=end)
     
-    if start_date:
-        attendances = attendances.filter(date__gte=start_date)
-    if end_date:
-        attendances = attendances.filter(date__lte=end_date)
+    # Statistics from the monthly rollup, cached until the employee's attendance changes
+    stats = attendance_stats(employee.id, start, end)
     
-    # Statistics
-    total_days = attendances.count()
-    present_days = attendances.filter(status='Present').count()
-    absent_days = attendances.filter(status='Absent').count()
-    leave_days = attendances.filter(status='On Leave').count()
-    half_days = attendances.filter(status='Half Day').count()
-    
-    attendance_percentage = (present_days / total_days * 100) if total_days > 0 else 0
+    page = Paginator(attendances, REPORT_ROWS_PER_PAGE).get_page(request.GET.get('page'))
     
     context = {
         'employee': employee,
-        'attendances': attendances,
-        'total_days': total_days,
-        'present_days': present_days,
-        'absent_days': absent_days,
-        'leave_days': leave_days,
-        'half_days': half_days,
-        'attendance_percentage': round(attendance_percentage, 2),
-        'start_date': start_date,
-        'end_date': end_date,
+        'attendances': page,
+        'page': page,
+        'start_date': start.isoformat() if start else '',
+        'end_date': end.isoformat() if end else '',
+        **stats,
     }
     
     return render(request, 'hr_module/employee_attendance_report.html', context)
 
-# Export attendance to CSV
+# Employee picker type-ahead (hr_module/picker.py)
 @login_required
-def export_attendance_csv(request):
+def employee_search(request):
+    if request.user.role != 'HR':
+        return JsonResponse({'results': []}, status=403)
+    
+    results = picker.search(request.GET.get('q', ''))
+    return JsonResponse({'results': [{'id': user_id, 'label': label} for user_id, label in results]})
+
+# Month grid helpers - the grid reads the attendance cube, not Attendance rows
+def _grid_params(request):
+    today = date.today()
+    try:
+        year = int(request.GET.get('year', today.year))
+        month = int(request.GET.get('month', today.month))
+    except ValueError:
+        year, month = today.year, today.month
+    if not 1 <= month <= 12 or not 2000 <= year <= today.year + 1:
+        year, month = today.year, today.month
+    return year, month, parse_department(request.GET.get('department', ''))
+
+def _grid_employees(department):
+    employees = User.objects.filter(role='Employee', is_active=True).only(
+        'id', 'username', 'first_name', 'last_name', 'employee_id', 'department'
+    ).order_by('first_name', 'last_name', 'id')
+    if department:
+        employees = employees.filter(department_id=department)
+    return employees
+
+# Attendance month grid (employee x day)
+@login_required
+def attendance_grid(request):
+    if request.user.role != 'HR':
+        messages.error(request, 'You do not have permission to access this page.')
+        return redirect('login')
+    
+    year, month, department = _grid_params(request)
+    paginator = Paginator(_grid_employees(department), 50)
+    page = paginator.get_page(request.GET.get('page'))
+    
+    with attendance_cube.open_year(year, refresh=False) as cube:
+        rows = list(attendance_cube.month_rows(cube, page.object_list, year, month))
+        cube_built = cube.built
+    
+    context = {
+        'rows': rows,
+        'cube_built': cube_built,
+        'page': page,
+        'day_numbers': range(1, calendar.monthrange(year, month)[1] + 1),
+        'year': year,
+        'month': month,
+        'month_name': calendar.month_name[month],
+        'months': [(n, calendar.month_name[n]) for n in range(1, 13)],
+        'department': department,
+        'departments': get_departments(),
+    }
+    return render(request, 'hr_module/attendance_grid.html', context)
+
+# Export the month grid to CSV
+@login_required
+def export_attendance_grid(request):
     if request.user.role != 'HR':
         messages.error(request, 'You do not have permission.')
         return redirect('login')
     
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="attendance_report.csv"'
+    year, month, department = _grid_params(request)
+    days = calendar.monthrange(year, month)[1]
     
+    response = HttpResponse(content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="attendance_{year}_{month:02d}.csv"'
     writer = csv.writer(response)
-    writer.writerow(['Employee Name', 'Email', 'Department', 'Date', 'Status', 'Check In', 'Check Out', 'Working Hours', 'Notes'])
-    
-    date_filter_str = request.GET.get('date', '')
-    date_filter = parse_date(date_filter_str)
-    attendances = Attendance.objects.filter(date=date_filter).select_related('user')
-    
-    for att in attendances:
-        writer.writerow([
-            f"{att.user.first_name} {att.user.last_name}",
-            att.user.email,
-            att.user.department or 'N/A',
-            att.date,
-            att.status,
-            att.check_in_time or 'N/A',
-            att.check_out_time or 'N/A',
-            att.get_working_hours() or 'N/A',
-            att.notes or ''
-        ])
-    
-    log_action(request.user, 'Export Attendance', f"Exported attendance for {date_filter}", request)
-    
+    writer.writerow(['Employee ID', 'Name', 'Department'] + [str(d) for d in range(1, days + 1)]
+                    + ['Present Days', 'Marked Days', 'Attendance %', 'Hours Worked'])
+    
+    with attendance_cube.open_year(year, refresh=False) as cube:
+        employees = _grid_employees(department).iterator(chunk_size=2000)
+        for row in attendance_cube.month_rows(cube, employees, year, month):
+            emp = row['employee']
+            writer.writerow(
+                [emp.employee_id or '', emp.get_full_name() or emp.username, department_name(emp.department_id)]
+                + [status or '' for status in row['days']]
+                + [row['present'], row['marked'], row['percentage'], row['hours']]
+            )
+    
+    log_action(request.user, 'Export Attendance Grid', f"Exported attendance grid for {year}-{month:02d}", request)
     return response
 
+# Export attendance to CSV, streamed - ranges of any length use constant memory
+@login_required
+def export_attendance_csv(request):
+    if request.user.role != 'HR':
+        messages.error(request, 'You do not have permission.')
+        return redirect('login')
+    
+    # a single ?date= (the attendance list export) or a start/end range, default today
+    try:
+        start, end, department = attendance_range(request.GET)
+    except ValueError as e:
+        messages.error(request, str(e))
+        return redirect('hr_module:attendance_list')
+    
+    period = start.isoformat() if start == end else f'{start} to {end}'
+    if department:
+        period += f' ({department_name(department)})'
+    
+    def finished(count):
+        log_action(request.user, 'Export Attendance', f"Exported {count} attendance records for {period}", request)
+    
+    return streaming_csv_response(
+        f'attendance_{start:%Y%m%d}_{end:%Y%m%d}.csv',
+        ATTENDANCE_HEADER,
+        attendance_rows(start, end, department),
+        on_complete=finished,
+    )
+
 @login_required
 def hr_profile(request):
     """HR profile view and edit"""
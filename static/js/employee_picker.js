@@ -0,0 +1,47 @@
+// Type-ahead for EmployeePickerWidget: fills a <datalist> from the employee
+// search endpoint and copies the id of the chosen employee into the hidden input.
+(function () {
+    document.querySelectorAll('.employee-picker').forEach(function (picker) {
+        var hidden = picker.querySelector('input[type=hidden]');
+        var text = picker.querySelector('input[type=text]');
+        var list = picker.querySelector('datalist');
+        var timer = null;
+
+        function chosen() {
+            for (var i = 0; i < list.options.length; i++) {
+                if (list.options[i].value === text.value) {
+                    return list.options[i].dataset.id;
+                }
+            }
+            return null;
+        }
+
+        function load() {
+            var url = picker.dataset.url + '?q=' + encodeURIComponent(text.value.trim());
+            fetch(url, {credentials: 'same-origin'})
+                .then(function (response) { return response.json(); })
+                .then(function (data) {
+                    list.innerHTML = '';
+                    data.results.forEach(function (employee) {
+                        var option = document.createElement('option');
+                        option.value = employee.label;
+                        option.dataset.id = employee.id;
+                        list.appendChild(option);
+                    });
+                });
+        }
+
+        text.addEventListener('input', function () {
+            var id = chosen();
+            if (id) {
+                hidden.value = id;
+                return;
+            }
+            hidden.value = '';
+            clearTimeout(timer);
+            if (text.value.trim()) {
+                timer = setTimeout(load, 200);
+            }
+        });
+    });
+})();
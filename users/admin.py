@@ -1,12 +1,12 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.utils.html import format_html
-from .models import CustomUser
+from .models import CustomUser, Department
 
 class CustomUserAdmin(UserAdmin):
     model = CustomUser
     list_display = ['profile_pic_preview', 'email', 'get_display_name', 'role', 'employee_id', 'is_active', 'must_change_password', 'account_locked']
-    list_filter = ['role', 'is_active', 'must_change_password', 'account_locked']
+    list_filter = ['role', 'department', 'is_active', 'must_change_password', 'account_locked']
     fieldsets = (
         (None, {'fields': ('email', 'password')}),
         ('Personal Info', {'fields': ('first_name', 'last_name', 'nickname', 'phone', 'date_of_birth', 'bio', 'address')}),
@@ -41,4 +41,9 @@ class CustomUserAdmin(UserAdmin):
         return full_name if full_name else obj.username
     get_display_name.short_description = 'Name'
 
+class DepartmentAdmin(admin.ModelAdmin):
+    list_display = ['name', 'created_at']
+    search_fields = ['name']
+
 admin.site.register(CustomUser, CustomUserAdmin)
+admin.site.register(Department, DepartmentAdmin)
@@ -0,0 +1,100 @@
+"""
+Cached department lookups.
+
+The (id, name) list behind every department filter and the id -> name map
+used for labels are read once per process and kept until the departments
+version, stored in the shared cache and bumped by the Department signals
+once the change commits, moves on - so list pages and exports never query the departments table.
+
+Names are compared case-insensitively with whitespace collapsed, the same
+normalization migration 0004 applied to the old free-text values.
+"""
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+
+from .models import Department
+
+VERSION_KEY = 'departments:version'
+
+_lock = threading.Lock()
+_directory = None
+
+
+def normalize(name):
+    return ' '.join((name or '').split())
+
+
+def _fresh_version():
+    # time based so a version lost from the cache can never match old lists
+    return int(time.time() * 1000)
+
+
+def get_version():
+    cache.add(VERSION_KEY, _fresh_version(), timeout=None)
+    return cache.get(VERSION_KEY)
+
+
+def bump_version():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, _fresh_version(), timeout=None)
+
+
+class DepartmentDirectory:
+    def __init__(self, version, rows):
+        self.version = version
+        self.choices = sorted(rows, key=lambda row: row[1].casefold())
+        self.names = dict(rows)
+        self.ids = {name.casefold(): department_id for department_id, name in rows}
+
+
+def get_directory():
+    global _directory
+    version = get_version()
+    directory = _directory
+    if directory is None or directory.version != version:
+        with _lock:
+            if _directory is None or _directory.version != version:
+                _directory = DepartmentDirectory(version, list(Department.objects.values_list('id', 'name')))
+            directory = _directory
+    return directory
+
+
+def get_departments():
+    """[(id, name)] of all departments, by name"""
+    return get_directory().choices
+
+
+def parse_department(value):
+    """Department id from a filter parameter, None when missing or invalid"""
+    try:
+        return int(value) if value else None
+    except (TypeError, ValueError):
+        return None
+
+
+def department_name(department_id):
+    """Name of a department id (or filter parameter), '' when unknown"""
+    department_id = parse_department(department_id)
+    return get_directory().names.get(department_id, '') if department_id else ''
+
+
+def get_or_create_department(name):
+    """The Department called `name` (ignoring case and spacing), created if new. None for a blank name."""
+    name = normalize(name)
+    if not name:
+        return None
+    directory = get_directory()
+    department_id = directory.ids.get(name.casefold())
+    if department_id is not None:
+        return Department(id=department_id, name=directory.names[department_id])
+    try:
+        with transaction.atomic():
+            return Department.objects.create(name=name)
+    except IntegrityError:
+        # created by another request meanwhile
+        return Department.objects.get(name__iexact=name)
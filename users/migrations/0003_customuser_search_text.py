@@ -0,0 +1,33 @@
+# Generated by Django 5.2.11 on 2026-10-18 03:36
+
+from django.db import migrations, models
+
+
+def fill_search_text(apps, schema_editor):
+    CustomUser = apps.get_model('users', 'CustomUser')
+    fields = ('first_name', 'last_name', 'email', 'employee_id')
+    users = list(CustomUser.objects.only('id', *fields))
+    for user in users:
+        user.search_text = ' '.join(str(getattr(user, f) or '') for f in fields).lower()
+    CustomUser.objects.bulk_update(users, ['search_text'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0002_customuser_address_customuser_bio_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='search_text',
+            field=models.CharField(blank=True, default='', editable=False, max_length=400),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['date_joined', 'id'], name='user_joined_idx'),
+        ),
+        migrations.RunPython(fill_search_text, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,105 @@
+from collections import Counter, defaultdict
+
+import django.db.models.deletion
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+def relabel_summary(apps, variants, name):
+    # the attendance summary (hr_module 0004) is labelled with the free text -
+    # merge the counts of every spelling under the department name
+    DailyAttendanceSummary = apps.get_model('hr_module', 'DailyAttendanceSummary')
+    rows = DailyAttendanceSummary.objects.filter(department__in=variants)
+    merged = list(rows.values_list('date', 'status').annotate(total=models.Sum('count')).order_by())
+    rows.delete()
+    DailyAttendanceSummary.objects.bulk_create([
+        DailyAttendanceSummary(date=day, department=name, status=status, count=total)
+        for day, status, total in merged
+    ], batch_size=1000)
+
+
+def normalize_departments(apps, schema_editor):
+    # "IT", " it " and "It" become one Department; the most used spelling names it
+    Department = apps.get_model('users', 'Department')
+    CustomUser = apps.get_model('users', 'CustomUser')
+
+    spellings = defaultdict(Counter)
+    rows = CustomUser.objects.exclude(department__isnull=True).values_list('department').annotate(
+        total=models.Count('id')
+    ).order_by()
+    for value, total in rows:
+        name = ' '.join(value.split())
+        if name:
+            spellings[name.casefold()][value] += total
+
+    # summary labels, including spellings no user has any more
+    labels = defaultdict(set)
+    DailyAttendanceSummary = apps.get_model('hr_module', 'DailyAttendanceSummary')
+    for value in DailyAttendanceSummary.objects.values_list('department', flat=True).distinct():
+        labels[' '.join(value.split()).casefold()].add(value)
+
+    for key, variants in spellings.items():
+        names = Counter()
+        for value, total in variants.items():
+            names[' '.join(value.split())] += total
+        name = sorted(names.items(), key=lambda item: (-item[1], item[0]))[0][0]
+        department = Department.objects.create(name=name)
+        CustomUser.objects.filter(department__in=list(variants)).update(department_ref=department)
+        if labels[key] - {name}:
+            relabel_summary(apps, list(labels[key]), name)
+    # whitespace-only departments become no department, counted under ''
+    if labels[''] - {''}:
+        relabel_summary(apps, list(labels['']), '')
+
+
+def restore_department_names(apps, schema_editor):
+    Department = apps.get_model('users', 'Department')
+    CustomUser = apps.get_model('users', 'CustomUser')
+    for department in Department.objects.all():
+        CustomUser.objects.filter(department_ref=department).update(department=department.name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_customuser_search_text'),
+        # its summary backfill reads the free-text departments
+        ('hr_module', '0004_dailyattendancesummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Department',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['name'],
+                'constraints': [
+                    models.UniqueConstraint(django.db.models.functions.text.Lower('name'), name='department_name_ci_unique'),
+                ],
+            },
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='department_ref',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='users.department'),
+        ),
+        migrations.RunPython(normalize_departments, restore_department_names),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='department',
+        ),
+        migrations.RenameField(
+            model_name='customuser',
+            old_name='department_ref',
+            new_name='department',
+        ),
+        migrations.AlterField(
+            model_name='customuser',
+            name='department',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='employees', to='users.department'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations
+from django.db.utils import OperationalError
+
+
+def create_search_index(apps, schema_editor):
+    # FTS5 is SQLite only; other databases search search_text with a scan
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    try:
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS users_customuser_search "
+            "USING fts5(search_text, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+    except OperationalError:
+        # SQLite built without FTS5
+        return
+    schema_editor.execute(
+        "INSERT INTO users_customuser_search (rowid, search_text) SELECT id, search_text FROM users_customuser"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS users_customuser_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_department'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
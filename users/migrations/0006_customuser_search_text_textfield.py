@@ -0,0 +1,18 @@
+# Generated by Django 5.2.11 on 2026-10-18 05:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_customuser_search_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customuser',
+            name='search_text',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+    ]
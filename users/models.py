@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Lower
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 
 # custom user manager
@@ -21,6 +22,20 @@ class CustomUserManager(BaseUserManager):
         extra_fields.setdefault('must_change_password', False)
         return self.create_user(username, email, password, **extra_fields)
 
+# departments employees belong to, looked up through users.departments
+class Department(models.Model):
+    name = models.CharField(max_length=100, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['name']
+        constraints = [
+            models.UniqueConstraint(Lower('name'), name='department_name_ci_unique'),
+        ]
+    
+    def __str__(self):
+        return self.name
+
 # custom user model
 class CustomUser(AbstractUser):
     ROLE_CHOICES = (
@@ -33,7 +48,7 @@ class CustomUser(AbstractUser):
     role = models.CharField(max_length=10, choices=ROLE_CHOICES, default='Employee')
     phone = models.CharField(max_length=15, blank=True, null=True)
     employee_id = models.CharField(max_length=20, unique=True, blank=True, null=True)
-    department = models.CharField(max_length=100, blank=True, null=True)
+    department = models.ForeignKey(Department, on_delete=models.SET_NULL, blank=True, null=True, related_name='employees')
     salary = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
     date_of_joining = models.DateField(blank=True, null=True)
     is_active = models.BooleanField(default=True)
@@ -51,10 +66,43 @@ class CustomUser(AbstractUser):
     emergency_contact_name = models.CharField(max_length=100, blank=True, null=True)
     emergency_contact_phone = models.CharField(max_length=15, blank=True, null=True)
     
+    # lowercased name/email/employee id, so directory search is one column match;
+    # unbounded since the four fields alone can exceed any short varchar limit
+    search_text = models.TextField(blank=True, default='', editable=False)
+    
     objects = CustomUserManager()
     
     USERNAME_FIELD = 'username'
     REQUIRED_FIELDS = ['email']
     
+    SEARCH_FIELDS = ('first_name', 'last_name', 'email', 'employee_id')
+    
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # employee directory is ordered and paginated on these
+            models.Index(fields=['date_joined', 'id'], name='user_joined_idx'),
+        ]
+    
     def __str__(self):
         return self.username
+    
+    @property
+    def department_name(self):
+        # the joined row when loaded, else the cached department list - never a query per user
+        if CustomUser.department.is_cached(self):
+            return self.department.name if self.department else ''
+        from .departments import department_name
+        return department_name(self.department_id)
+    
+    def build_search_text(self):
+        return ' '.join(str(getattr(self, f) or '') for f in self.SEARCH_FIELDS).lower()
+    
+    def save(self, *args, **kwargs):
+        search_text = self.build_search_text()
+        # whether the directory search index needs this row again (signals.py)
+        self._search_text_changed = self._state.adding or search_text != self.search_text
+        self.search_text = search_text
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and set(update_fields) & set(self.SEARCH_FIELDS):
+            kwargs['update_fields'] = set(update_fields) | {'search_text'}
+        super().save(*args, **kwargs)
@@ -0,0 +1,61 @@
+"""
+Employee directory search.
+
+On SQLite every user's search_text (lowercased name, email and employee id)
+is indexed in an FTS5 table created by migration 0005, keyed by the user id.
+A search matches users having every word typed as the start of one of their
+words ("ann lee", "lee@exa", "emp00"), through the index instead of a scan of
+the users table. The index is kept up to date by the User signal handlers in
+signals.py; callers that bulk_create users call index() themselves.
+
+Other databases, or SQLite builds without FTS5, fall back to a substring
+match on search_text.
+"""
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = 'users_customuser_search'
+
+_available = None
+
+
+def search_terms(query):
+    return re.findall(r'\w+', query.lower())
+
+
+def fts_available():
+    global _available
+    if _available is None:
+        _available = connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names()
+    return _available
+
+
+def index(users):
+    """(Re)index the search_text of saved users"""
+    rows = [(user.pk, user.search_text) for user in users]
+    if not rows or not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(row[0],) for row in rows])
+        cursor.executemany(f'INSERT INTO {FTS_TABLE} (rowid, search_text) VALUES (%s, %s)', rows)
+
+
+def remove(user_ids):
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(pk,) for pk in user_ids])
+
+
+def search_users(queryset, query):
+    """Filter a User queryset down to the users matching `query`"""
+    if not fts_available():
+        return queryset.filter(search_text__contains=query.strip().lower())
+    terms = search_terms(query)
+    if not terms:
+        return queryset
+    # "term"* is a prefix match, terms separated by spaces must all match
+    match = ' '.join(f'"{term}"*' for term in terms)
+    return queryset.filter(pk__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match]))
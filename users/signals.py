@@ -0,0 +1,33 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from . import search
+from .departments import bump_version
+from .models import CustomUser, Department
+
+
+# refresh the cached department list in every process - once the change is
+# committed, or another process could cache the old list under the new version
+@receiver(post_save, sender=Department, dispatch_uid='users.department_saved')
+def department_saved(sender, instance, raw=False, **kwargs):
+    transaction.on_commit(bump_version, robust=True)
+
+
+@receiver(post_delete, sender=Department, dispatch_uid='users.department_deleted')
+def department_deleted(sender, instance, **kwargs):
+    transaction.on_commit(bump_version, robust=True)
+
+
+# keep the directory search index in step with search_text
+@receiver(post_save, sender=CustomUser, dispatch_uid='users.user_saved')
+def user_saved(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    if raw:
+        return
+    if getattr(instance, '_search_text_changed', True):
+        search.index([instance])
+
+
+@receiver(post_delete, sender=CustomUser, dispatch_uid='users.user_deleted')
+def user_deleted(sender, instance, **kwargs):
+    search.remove([instance.pk])